@@ -1,8 +1,15 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.sessions.models import Session
-from .models import Categoria, Inventario, Producto, Pedido, DetallePedido
-from import_export.admin import ImportExportModelAdmin
-from .resources import PedidoResource
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import Coalesce
+from .models import Categoria, Inventario, Producto, Pedido, DetallePedido, EventoWompi
+from .inventario import establecer_stock
+from .resources import PedidoResource, diferir_formatos_pesados
+
+# Antes de import_export.admin, que al importarse cargaría openpyxl
+diferir_formatos_pesados()
+from import_export.admin import ImportExportModelAdmin  # noqa: E402
 
 
 
@@ -16,9 +23,43 @@ class ProductoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nombre', 'precio', 'disponible', 'categoria')
      
 
+class InventarioAdminForm(forms.ModelForm):
+    class Meta:
+        model = Inventario
+        fields = ('producto', 'cantidad', 'num_fragmentos')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Siempre se edita la cantidad lógica, aunque el stock esté fragmentado
+        if self.instance.pk:
+            self.initial['cantidad'] = self.instance.disponible
+
+
 @admin.register(Inventario)
 class InventarioAdmin(admin.ModelAdmin):
-    list_display = ('producto', 'cantidad')
+    form = InventarioAdminForm
+    list_display = ('producto', 'disponible', 'num_fragmentos', 'fragmentos_creados')
+
+    def get_queryset(self, request):
+        # Stock lógico y fragmentos de todas las filas en la misma consulta del
+        # listado. La anotación `disponible` ocupa el cached_property del modelo,
+        # que también usa __str__.
+        return super().get_queryset(request).annotate(
+            disponible=Case(
+                When(num_fragmentos=0, then=F('cantidad')),
+                default=Coalesce(Sum('fragmentos__cantidad'), 0),
+            ),
+            fragmentos_creados=Count('fragmentos'),
+        )
+
+    @admin.display(description='fragmentos creados', ordering='fragmentos_creados')
+    def fragmentos_creados(self, obj):
+        # Filas de FragmentoInventario; num_fragmentos es lo configurado
+        return obj.fragmentos_creados
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        establecer_stock(obj, form.cleaned_data['cantidad'])
 
 @admin.register(DetallePedido)
 class DetallePedidoAdmin(admin.ModelAdmin):
@@ -32,3 +73,9 @@ class PedidoAdmin(ImportExportModelAdmin):
     ordering = ('-creado_en',)
     search_fields = ('id', 'nombre_cliente', 'telefono')
 
+
+@admin.register(EventoWompi)
+class EventoWompiAdmin(admin.ModelAdmin):
+    list_display = ('referencia', 'estado', 'transaccion_id', 'recibido_en')
+    ordering = ('-recibido_en',)
+    search_fields = ('referencia', 'transaccion_id')
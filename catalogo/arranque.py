@@ -0,0 +1,91 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+
+# Arranque de los workers: cuánto tarda y cuánta memoria ocupa cargar la
+# aplicación (src.wsgi más el URLconf, que importa las vistas). Lo usan
+# gunicorn.conf.py (calentar en el proceso maestro antes del fork), el
+# comando bench_arranque y las pruebas que vigilan que no crezca.
+
+# Solo se importan al generar o importar reportes (catalogo/exportaciones.py
+# y los formatos diferidos de catalogo/resources.py)
+MODULOS_DIFERIDOS = ("openpyxl", "reportlab", "yaml")
+
+CARGAR_APLICACION = """
+import resource, time
+inicio = time.perf_counter()
+import src.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+segundos = time.perf_counter() - inicio
+# En Linux ru_maxrss sobrevive al exec y arrastra la memoria del proceso
+# padre; VmHWM es el máximo de este programa
+try:
+    with open("/proc/self/status") as estado:
+        rss = next(int(linea.split()[1]) for linea in estado if linea.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(segundos, rss)
+"""
+
+LINEA_IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| +(\S+)")
+
+
+def plantillas_del_proyecto():
+    """Nombres de todas las plantillas de TEMPLATES['DIRS'] (no las del admin)"""
+    nombres = []
+    for directorio in settings.TEMPLATES[0]["DIRS"]:
+        raiz = Path(directorio)
+        nombres += sorted(str(ruta.relative_to(raiz)) for ruta in raiz.rglob("*.html"))
+    return nombres
+
+
+def calentar():
+    """
+    Carga el URLconf (y con él las vistas) y compila todas las plantillas.
+    Llamado en el proceso maestro de gunicorn con preload_app: los workers
+    nacen con todo ya en memoria, compartida por copy-on-write.
+    """
+    from django.db import connections
+    from django.template import engines
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    motor = engines["django"]
+    for nombre in plantillas_del_proyecto():
+        # Sin 'loaders' en TEMPLATES, Django (4.1+) usa el cargador en caché
+        # también con DEBUG=True: la plantilla compilada queda guardada
+        motor.get_template(nombre)
+    # Las conexiones abiertas en el maestro no se deben compartir con los workers
+    connections.close_all()
+
+
+def medir_arranque():
+    """
+    Arranca un intérprete nuevo con `-X importtime` y retorna segundos, RSS
+    máximo en KB y {módulo: microsegundos acumulados} de lo importado.
+    """
+    entorno = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "src.settings")}
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CARGAR_APLICACION],
+        cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True, check=True,
+    )
+    segundos, rss_kb = proceso.stdout.split()
+
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        coincidencia = LINEA_IMPORTTIME.match(linea)
+        if coincidencia:
+            modulos[coincidencia.group(2)] = int(coincidencia.group(1))
+    return {"segundos": float(segundos), "rss_kb": int(rss_kb), "modulos": modulos}
+
+
+def diferidos_cargados(modulos):
+    return sorted(
+        modulo for modulo in modulos
+        if any(modulo == diferido or modulo.startswith(diferido + ".") for diferido in MODULOS_DIFERIDOS)
+    )
@@ -0,0 +1,197 @@
+import hashlib
+import re
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Max
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .cart import get_cart
+from .inventario import astock_por_producto, stock_por_producto
+from .models import Producto
+
+CLAVE_VERSION = "catalogo:version"
+CLAVE_STOCK = "catalogo:stock"
+
+# Marcadores que las plantillas cacheadas dejan donde va el stock en vivo:
+# <!--slot:stock:12--> se reemplaza por catalogo/fragmentos/slot_stock.html
+PATRON_SLOT = re.compile(r"<!--slot:(\w+):(\d+)-->")
+
+
+def cache_compartida():
+    """
+    True si todos los workers ven el mismo cache. Con LocMemCache cada proceso
+    de gunicorn tiene el suyo: un valor que cambia en uno no llega a los demás.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def version_catalogo():
+    """Versión actual del catálogo; cambia cada vez que se modifica un producto"""
+    return cache.get_or_set(CLAVE_VERSION, time.time_ns(), None)
+
+
+def invalidar_catalogo():
+    # Una marca de tiempo (y no un contador) evita reutilizar versiones
+    # si la clave se pierde del cache
+    cache.set(CLAVE_VERSION, time.time_ns(), None)
+
+
+def version_stock():
+    """Versión del stock; cambia con cada compra (los UPDATE con F() no disparan señales)"""
+    return cache.get_or_set(CLAVE_STOCK, time.time_ns(), None)
+
+
+def invalidar_stock():
+    cache.set(CLAVE_STOCK, time.time_ns(), None)
+
+
+def fragmento(nombre, construir):
+    """Retorna el fragmento cacheado para la versión actual, o lo construye"""
+    clave = f"catalogo:{version_catalogo()}:{nombre}"
+    valor = cache.get(clave)
+    if valor is None:
+        valor = construir()
+        cache.set(clave, valor, getattr(settings, "CATALOGO_CACHE_TIMEOUT", 300))
+    return valor
+
+
+def insertar_stock(html):
+    """Rellena los slots de stock del fragmento con una sola consulta de inventario"""
+    slots = PATRON_SLOT.findall(html)
+    if not slots:
+        return mark_safe(html)
+    return _rellenar_slots(html, stock_por_producto({int(producto_id) for _, producto_id in slots}))
+
+
+def _rellenar_slots(html, stock):
+    plantillas = {}
+
+    def reemplazar(match):
+        nombre, producto_id = match.group(1), int(match.group(2))
+        if nombre not in plantillas:
+            plantillas[nombre] = get_template(f"catalogo/fragmentos/slot_{nombre}.html")
+        return plantillas[nombre].render({
+            "producto_id": producto_id,
+            "disponible": stock.get(producto_id, 0),
+        })
+
+    return mark_safe(PATRON_SLOT.sub(reemplazar, html))
+
+
+# =====================
+# GET CONDICIONAL (ETag / Last-Modified)
+# =====================
+# Para @condition en las páginas públicas del catálogo: si el navegador ya
+# tiene la versión actual se responde 304 sin renderizar ni leer productos.
+# Las versiones viven en el cache: si no es compartida, una compra o un cambio
+# atendido por otro worker no cambiaría el ETag de este, que seguiría
+# respondiendo 304 con datos viejos. En ese caso no hay validadores (None) y
+# @condition responde siempre la página completa.
+
+def validadores_activos(producto_id=None):
+    """True si se puede responder 304 (y, en el detalle, si el producto existe)"""
+    if not cache_compartida():
+        return False
+    if producto_id is None:
+        return True
+    # Una versión nueva del catálogo (alta o baja de productos) lo recalcula
+    return fragmento(f"existe:{producto_id}", Producto.objects.filter(id=producto_id).exists)
+
+
+def ultima_modificacion_productos():
+    """Max(Producto.updated_at), calculado una vez por versión del catálogo"""
+    return fragmento("ultima_modificacion", lambda: Producto.objects.aggregate(ultima=Max("updated_at"))["ultima"])
+
+
+def etag_catalogo(request, producto_id=None, *args, **kwargs):
+    if not validadores_activos(producto_id):
+        return None
+    # La página también muestra el número de items del carrito
+    partes = f"{version_catalogo()}:{version_stock()}:{get_cart(request).count()}"
+    return hashlib.md5(partes.encode(), usedforsecurity=False).hexdigest()
+
+
+def modificado_catalogo(request, producto_id=None, *args, **kwargs):
+    if not validadores_activos(producto_id):
+        return None
+    fechas = [
+        # Las versiones son marcas de tiempo en nanosegundos
+        datetime.fromtimestamp(version_catalogo() / 1e9, tz=timezone.utc),
+        datetime.fromtimestamp(version_stock() / 1e9, tz=timezone.utc),
+    ]
+    productos = ultima_modificacion_productos()
+    if productos:
+        fechas.append(productos)
+    return max(fechas)
+
+
+# =====================
+# VERSIONES ASÍNCRONAS (vistas de catalogo/views_async.py)
+# =====================
+
+async def aversion_catalogo():
+    return await cache.aget_or_set(CLAVE_VERSION, time.time_ns(), None)
+
+
+async def aversion_stock():
+    return await cache.aget_or_set(CLAVE_STOCK, time.time_ns(), None)
+
+
+async def afragmento(nombre, construir):
+    """fragmento() con `construir` asíncrono"""
+    clave = f"catalogo:{await aversion_catalogo()}:{nombre}"
+    valor = await cache.aget(clave)
+    if valor is None:
+        valor = await construir()
+        await cache.aset(clave, valor, getattr(settings, "CATALOGO_CACHE_TIMEOUT", 300))
+    return valor
+
+
+async def ainsertar_stock(html):
+    slots = PATRON_SLOT.findall(html)
+    if not slots:
+        return mark_safe(html)
+    return _rellenar_slots(html, await astock_por_producto({int(producto_id) for _, producto_id in slots}))
+
+
+async def avalidadores_activos(producto_id=None):
+    if not cache_compartida():
+        return False
+    if producto_id is None:
+        return True
+    return await afragmento(f"existe:{producto_id}", Producto.objects.filter(id=producto_id).aexists)
+
+
+async def aultima_modificacion_productos():
+    async def construir():
+        return (await Producto.objects.aaggregate(ultima=Max("updated_at")))["ultima"]
+
+    return await afragmento("ultima_modificacion", construir)
+
+
+async def aetag_catalogo(request, producto_id=None, *args, **kwargs):
+    if not await avalidadores_activos(producto_id):
+        return None
+    cart = get_cart(request)
+    await cart.acargar()
+    partes = f"{await aversion_catalogo()}:{await aversion_stock()}:{cart.count()}"
+    return hashlib.md5(partes.encode(), usedforsecurity=False).hexdigest()
+
+
+async def amodificado_catalogo(request, producto_id=None, *args, **kwargs):
+    if not await avalidadores_activos(producto_id):
+        return None
+    fechas = [
+        datetime.fromtimestamp(await aversion_catalogo() / 1e9, tz=timezone.utc),
+        datetime.fromtimestamp(await aversion_stock() / 1e9, tz=timezone.utc),
+    ]
+    productos = await aultima_modificacion_productos()
+    if productos:
+        fechas.append(productos)
+    return max(fechas)
@@ -1,17 +1,133 @@
 from decimal import Decimal
+
+from django.conf import settings
+
+from catalogo.inventario import aprecargar_disponible, disponible_en_carrito, precargar_disponible
 from catalogo.models import Producto
 
-class Cart:
+
+# =====================
+# ALMACENAMIENTO DEL CARRITO
+# =====================
+# Dónde vive el contenido del carrito entre peticiones. Se elige con
+# settings.CARRITO_ALMACENAMIENTO ("sesion" o "cookie").
+
+class AlmacenSesion:
+    """El carrito completo (cantidad y precio) en la sesión de Django"""
+
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get("cart")
 
-        # Si no existe carrito → crear uno vacío
-        if cart is None:
-            cart = {}
-            self.session["cart"] = cart
+    def leer(self):
+        # Sin cookie de sesión esto no consulta la BD: el carrito está vacío
+        return self.session.get("cart", {})
+
+    async def aleer(self):
+        return await self.session.aget("cart", {})
+
+    def existe(self):
+        return "cart" in self.session
+
+    def guardar(self, cart):
+        self.session["cart"] = cart
+        self.session.modified = True
+
+    def responder(self, response):
+        # SessionMiddleware ya se encarga de guardar la sesión
+        pass
+
+
+class AlmacenCookie:
+    """
+    Solo los pares producto:cantidad en una cookie firmada; el precio se toma
+    de la BD al leer. Agregar o quitar productos no escribe en la base de datos.
+    """
+
+    COOKIE = "carrito"
+    SAL = "catalogo.carrito"
+    DURACION = 60 * 60 * 24 * 14
+
+    def __init__(self, request):
+        self.request = request
+        self.cambiado = None
+
+    def leer(self):
+        valor = self.request.get_signed_cookie(self.COOKIE, default="", salt=self.SAL, max_age=self.DURACION)
+        cart = {}
+        # Formato compacto: "12:2|15:1"
+        for par in valor.split("|") if valor else []:
+            producto_id, _, cantidad = par.partition(":")
+            if producto_id.isdigit() and cantidad.isdigit() and int(cantidad) > 0:
+                cart[producto_id] = {"cantidad": int(cantidad)}
+        return cart
+
+    async def aleer(self):
+        # La cookie ya viene en la petición: no hay nada que esperar
+        return self.leer()
+
+    def existe(self):
+        return self.COOKIE in self.request.COOKIES
+
+    def guardar(self, cart):
+        self.cambiado = cart
+
+    def responder(self, response):
+        if self.cambiado is None:
+            return
+        if not self.cambiado:
+            response.delete_cookie(self.COOKIE, samesite="Lax")
+            return
+        valor = "|".join(f"{producto_id}:{datos['cantidad']}" for producto_id, datos in self.cambiado.items())
+        response.set_signed_cookie(
+            self.COOKIE, valor, salt=self.SAL, max_age=self.DURACION,
+            httponly=True, samesite="Lax", secure=self.request.is_secure(),
+        )
+
+
+ALMACENES = {
+    "sesion": AlmacenSesion,
+    "cookie": AlmacenCookie,
+}
+
+# Envío gratis desde este subtotal; por debajo se cobra COSTO_ENVIO
+ENVIO_GRATIS_DESDE = Decimal("60000")
+COSTO_ENVIO = Decimal("11000")
+
+
+def faltante_envio(total):
+    """Cuánto le falta al subtotal para tener envío gratis"""
+    return ENVIO_GRATIS_DESDE - total if total < ENVIO_GRATIS_DESDE else 0
 
-        self.cart = cart
+
+def get_cart(request):
+    """Retorna el carrito de la petición, creándolo una sola vez por request"""
+    cart = getattr(request, "_cart", None)
+    if cart is None:
+        cart = Cart(request)
+        request._cart = cart
+    return cart
+
+
+class Cart:
+    def __init__(self, request):
+        self.almacen = ALMACENES[getattr(settings, "CARRITO_ALMACENAMIENTO", "sesion")](request)
+        # El carrito se lee solo cuando se usa y no se escribe nada hasta la
+        # primera modificación: un visitante que solo navega no crea una fila
+        # en django_session ni recibe cookie
+        self._cart = None
+        # Items ya hidratados desde la BD (se invalidan al modificar el carrito)
+        self._items = None
+
+    @property
+    def cart(self):
+        if self._cart is None:
+            self._cart = self.almacen.leer()
+        return self._cart
+
+    async def acargar(self):
+        """Lee el carrito sin bloquear (vistas async); después `cart` y count() no consultan la BD"""
+        if self._cart is None:
+            self._cart = await self.almacen.aleer()
 
     def add(self, producto, cantidad=1):
         producto_id = str(producto.id)
@@ -43,35 +159,133 @@ class Cart:
             del self.cart[producto_id]
             self.save()
 
+    def set_quantities(self, cantidades):
+        """
+        Fija varias cantidades de una vez ({producto: cantidad}); 0 quita el
+        producto. El carrito se guarda una sola vez.
+        """
+        for producto, cantidad in cantidades.items():
+            producto_id = str(producto.id)
+            if cantidad <= 0:
+                self.cart.pop(producto_id, None)
+            elif producto_id in self.cart:
+                self.cart[producto_id]["cantidad"] = cantidad
+            else:
+                self.cart[producto_id] = {"cantidad": cantidad, "precio": str(producto.precio)}
+        self.save()
+
     def clear(self):
-        self.session["cart"] = {}
-        self.session.modified = True
+        self._cart = {}
+        self._items = None
+        # Si nunca hubo carrito no hay nada que vaciar
+        if self.almacen.existe():
+            self.save()
 
     def save(self):
-        self.session["cart"] = self.cart
-        self.session.modified = True
+        self.almacen.guardar(self.cart)
+        self._items = None
 
-    def get_items(self):
-        """Retornar lista de items procesados + total"""
+    def get_items(self, precargados=None):
+        """
+        Retornar lista de items procesados + total. `precargados` ({id: producto},
+        con inventario y disponible) evita volver a consultar esos productos.
+        """
+        if self._items is not None:
+            return self._items
+
+        # Una sola consulta para todos los productos del carrito
+        productos = dict(precargados or {})
+        ids = self._ids_faltantes(productos)
+        if ids:
+            nuevos = self._productos().in_bulk(ids)
+            # El stock de productos fragmentados también en una sola consulta
+            precargar_disponible(
+                producto.inventario for producto in nuevos.values() if hasattr(producto, "inventario")
+            )
+            productos.update(nuevos)
+        return self._armar_items(productos)
+
+    async def aget_items(self):
+        """get_items() para vistas asíncronas"""
+        if self._items is not None:
+            return self._items
+
+        await self.acargar()
+        productos = {}
+        ids = self._ids_faltantes(productos)
+        if ids:
+            productos = await self._productos().ain_bulk(ids)
+            await aprecargar_disponible(
+                producto.inventario for producto in productos.values() if hasattr(producto, "inventario")
+            )
+        return self._armar_items(productos)
+
+    def _productos(self):
+        return Producto.objects.select_related("inventario", "categoria")
+
+    def _ids_faltantes(self, productos):
+        return [
+            int(producto_id) for producto_id in self.cart
+            if producto_id.isdigit() and int(producto_id) not in productos
+        ]
+
+    def _armar_items(self, productos):
         items = []
         total = Decimal("0.00")
+        obsoletos = []
 
         for producto_id, datos in self.cart.items():
-            producto = Producto.objects.get(id=int(producto_id))
+            producto = productos.get(int(producto_id)) if producto_id.isdigit() else None
+            if producto is None:
+                # El producto ya no existe: se descarta del carrito
+                obsoletos.append(producto_id)
+                continue
+
             cantidad = datos["cantidad"]
-            precio = Decimal(datos["precio"])
+            # El almacén en cookie no guarda precios: se usa el actual
+            precio = Decimal(datos["precio"]) if "precio" in datos else producto.precio
             subtotal = cantidad * precio
 
             items.append({
                 "producto": producto,
                 "cantidad": cantidad,
+                "precio": precio,
                 "subtotal": subtotal,
             })
 
             total += subtotal
 
-        return items, total
-    
+        if obsoletos:
+            for producto_id in obsoletos:
+                del self.cart[producto_id]
+            self.save()
+
+        self._items = (items, total)
+        return self._items
+
+    def resumen(self, precargados=None):
+        """Contenido y totales del carrito en un dict serializable (API JSON)"""
+        items, total = self.get_items(precargados)
+        envio = 0 if total >= ENVIO_GRATIS_DESDE else COSTO_ENVIO
+        return {
+            "items": [
+                {
+                    "producto_id": item["producto"].id,
+                    "nombre": item["producto"].nombre,
+                    "cantidad": item["cantidad"],
+                    "precio": item["precio"],
+                    "subtotal": item["subtotal"],
+                    "disponible": disponible_en_carrito(item["producto"]),
+                }
+                for item in items
+            ],
+            "cantidad_items": sum(item["cantidad"] for item in items),
+            "subtotal": total,
+            "envio": envio,
+            "total": total + envio,
+            "faltante_envio": faltante_envio(total),
+        }
+
     def count(self):
         """Retorna el número total de items en el carrito"""
         total_items = 0
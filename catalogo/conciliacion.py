@@ -0,0 +1,211 @@
+import asyncio
+import http.client
+import json
+import logging
+import random
+import time
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Pedido
+from .pagos import ESTADOS_WOMPI, total_pagado
+
+logger = logging.getLogger(__name__)
+
+# Conciliación de pagos: los pedidos Wompi que siguen "pendiente" (el cliente
+# cerró el navegador o el evento no llegó) se consultan en la API de
+# transacciones de Wompi. Las consultas van en paralelo sobre un grupo fijo
+# de conexiones keep-alive y los cambios se guardan con un bulk_update por lote.
+
+REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class ErrorConsulta(Exception):
+    """La API no respondió bien después de los reintentos"""
+
+
+class ClienteWompi:
+    """
+    Cliente HTTP asíncrono con `conexiones` conexiones persistentes. Cada
+    consulta toma una conexión libre, así el tamaño del grupo limita el
+    paralelismo; la petición (bloqueante, http.client) corre en un hilo.
+    Los errores de red y los 429/5xx se reintentan con espera exponencial.
+    """
+
+    def __init__(self, url_base, llave, conexiones=8, reintentos=3, espera=0.5, timeout=10):
+        partes = urlsplit(url_base)
+        clase = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+        self.prefijo = partes.path.rstrip("/")
+        self.cabeceras = {"Authorization": f"Bearer {llave}", "Accept": "application/json"}
+        self.reintentos = reintentos
+        self.espera = espera
+        self._todas = [clase(partes.netloc, timeout=timeout) for _ in range(conexiones)]
+        self._libres = asyncio.Queue()
+        for conexion in self._todas:
+            self._libres.put_nowait(conexion)
+
+    def cerrar(self):
+        for conexion in self._todas:
+            conexion.close()
+
+    def _pedir(self, conexion, ruta):
+        try:
+            conexion.request("GET", ruta, headers=self.cabeceras)
+            respuesta = conexion.getresponse()
+            return respuesta.status, respuesta.read()
+        except (OSError, http.client.HTTPException):
+            # http.client vuelve a abrir la conexión en la próxima petición
+            conexion.close()
+            raise
+
+    async def get(self, ruta, **parametros):
+        ruta = f"{self.prefijo}{ruta}?{urlencode(parametros)}"
+        for intento in range(self.reintentos + 1):
+            conexion = await self._libres.get()
+            try:
+                estado, cuerpo = await asyncio.to_thread(self._pedir, conexion, ruta)
+            except (OSError, http.client.HTTPException) as error:
+                falla = repr(error)
+            else:
+                if estado == 200:
+                    return json.loads(cuerpo)
+                if estado not in REINTENTABLES:
+                    raise ErrorConsulta(f"{ruta}: HTTP {estado}")
+                falla = f"HTTP {estado}"
+            finally:
+                self._libres.put_nowait(conexion)
+
+            if intento < self.reintentos:
+                # Espera exponencial con variación aleatoria para no reintentar todos a la vez
+                await asyncio.sleep(self.espera * 2 ** intento * (0.5 + random.random()))
+        raise ErrorConsulta(f"{ruta}: {falla}")
+
+
+def _cubre_el_total(transaccion, total):
+    monto = transaccion.get("amount_in_cents")
+    return type(monto) is int and total_pagado(monto, str(transaccion.get("currency"))) == total
+
+
+def estado_de_transacciones(transacciones, total):
+    """
+    Estado de pago según las transacciones de una referencia (un cliente puede
+    reintentar el pago). None si todavía no hay un resultado definitivo. Una
+    transacción aprobada solo paga el pedido si el monto y la moneda
+    coinciden con `total`; si no, el pedido sigue pendiente.
+    """
+    estados = set()
+    for transaccion in transacciones:
+        estado = transaccion.get("status")
+        if estado == "APPROVED" and not _cubre_el_total(transaccion, total):
+            logger.warning(
+                "%s: transacción %s aprobada por %s centavos %s no coincide con el total %s; sigue sin pagar",
+                transaccion.get("reference"), transaccion.get("id"),
+                transaccion.get("amount_in_cents"), transaccion.get("currency"), total,
+            )
+            estado = "PENDING"
+        estados.add(estado)
+    if "APPROVED" in estados:
+        return "pagado"
+    if "PENDING" in estados or not estados & ESTADOS_WOMPI.keys():
+        return None
+    return "rechazado"
+
+
+async def consultar_lote(cliente, pedidos):
+    """
+    [(pedido_id, estado_pago o None, segundos, error)] de un lote, en paralelo.
+    Los pedidos deben traer `total`.
+    """
+
+    async def consultar(pedido):
+        inicio = time.perf_counter()
+        try:
+            datos = await cliente.get("/transactions", reference=f"PEDIDO{pedido.id}")
+        except (ErrorConsulta, ValueError) as error:
+            logger.warning("No se pudo consultar el pedido %s: %s", pedido.id, error)
+            return pedido.id, None, time.perf_counter() - inicio, True
+        estado_pago = estado_de_transacciones(datos.get("data", []), pedido.total)
+        return pedido.id, estado_pago, time.perf_counter() - inicio, False
+
+    return await asyncio.gather(*(consultar(pedido) for pedido in pedidos))
+
+
+def aplicar_estados(estados):
+    """
+    Guarda {pedido_id: (estado_pago, total)} con un bulk_update; `total` es
+    el total con el que se verificaron las transacciones. Retorna los
+    actualizados.
+    """
+    with transaction.atomic():
+        # Solo los que siguen pendientes: un evento pudo llegar durante la consulta
+        bloqueados = (
+            Pedido.objects.select_for_update()
+            .filter(id__in=estados, estado_pago="pendiente")
+            .only("id", "estado_pago", "total", "actualizado_en")
+        )
+        pedidos = []
+        for pedido in bloqueados:
+            estado_pago, total = estados[pedido.id]
+            if estado_pago == "pagado" and pedido.total != total:
+                # El total cambió después de la consulta: el pago ya no lo cubre
+                logger.warning("Pedido %s: el total cambió durante la conciliación; sigue sin pagar", pedido.id)
+                continue
+            pedidos.append(pedido)
+        ahora = timezone.now()
+        for pedido in pedidos:
+            pedido.estado_pago = estados[pedido.id][0]
+            pedido.actualizado_en = ahora
+        Pedido.objects.bulk_update(pedidos, ["estado_pago", "actualizado_en"])
+    return len(pedidos)
+
+
+def pendientes(antiguedad, dias):
+    """Pedidos Wompi pendientes creados entre hace `dias` días y hace `antiguedad` minutos"""
+    ahora = timezone.now()
+    return Pedido.objects.filter(
+        metodo_pago="Wompi",
+        estado_pago="pendiente",
+        creado_en__gte=ahora - timedelta(days=dias),
+        creado_en__lt=ahora - timedelta(minutes=antiguedad),
+    ).order_by("id")
+
+
+def conciliar(antiguedad=30, dias=7, lote=200, conexiones=8, reintentos=3, espera=0.5):
+    """Concilia los pedidos pendientes por lotes y retorna las métricas de la corrida"""
+    resultado = {"consultados": 0, "actualizados": 0, "errores": 0, "latencias": []}
+    consulta = pendientes(antiguedad, dias).only("id", "total")
+    ultimo = 0
+    inicio = time.perf_counter()
+
+    # Un solo event loop para toda la corrida: las conexiones se reutilizan entre lotes
+    with asyncio.Runner() as runner:
+        cliente = ClienteWompi(
+            settings.WOMPI_API_URL, settings.WOMPI_PRIVATE_KEY,
+            conexiones=conexiones, reintentos=reintentos, espera=espera,
+        )
+        try:
+            while True:
+                pedidos = list(consulta.filter(id__gt=ultimo)[:lote])
+                if not pedidos:
+                    break
+                ultimo = pedidos[-1].id
+
+                totales = {pedido.id: pedido.total for pedido in pedidos}
+                estados = {}
+                for pedido_id, estado_pago, segundos, error in runner.run(consultar_lote(cliente, pedidos)):
+                    resultado["latencias"].append(segundos)
+                    resultado["errores"] += error
+                    if estado_pago is not None:
+                        estados[pedido_id] = (estado_pago, totales[pedido_id])
+                resultado["consultados"] += len(pedidos)
+                if estados:
+                    resultado["actualizados"] += aplicar_estados(estados)
+        finally:
+            cliente.cerrar()
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
@@ -1,14 +1,16 @@
-from .models import Pedido
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart
+from .pedidos import pedidos_no_vistos
 
 def nuevos_pedidos(request):
     if request.user.is_authenticated and request.user.is_staff:
-        count = Pedido.objects.filter(visto_por_admin=False).count()
-        return {'nuevos_pedidos': count}
+        # Perezoso: solo se lee el contador si la plantilla muestra el badge
+        return {'nuevos_pedidos': SimpleLazyObject(pedidos_no_vistos)}
     return {'nuevos_pedidos': 0}
 
 def cart_count(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     return {
         'cart_count': cart.count()
     }
\ No newline at end of file
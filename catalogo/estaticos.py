@@ -0,0 +1,164 @@
+import gzip
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Archivos estáticos con hash en el nombre (styles.css → styles.4f1c2e8a9b7d.css)
+# y versiones comprimidas al lado (.gz y .br), generadas una sola vez en
+# collectstatic. Como el nombre cambia con el contenido, el navegador puede
+# guardarlos en caché por un año.
+
+COMPRIMIBLES = ('.css', '.js', '.svg', '.txt', '.json', '.xml', '.map', '.ico', '.html')
+CON_HASH = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+UN_ANO = 60 * 60 * 24 * 365
+
+
+def comprimir(ruta):
+    """Escribe ruta.gz (y ruta.br) si comprimir ahorra al menos un 5 %"""
+    # Solo se usa en collectstatic: no se carga al arrancar los workers
+    import brotli
+
+    with open(ruta, 'rb') as archivo:
+        original = archivo.read()
+
+    versiones = [
+        ('.gz', gzip.compress(original, compresslevel=9, mtime=0)),
+        ('.br', brotli.compress(original, quality=11)),
+    ]
+
+    escritos = []
+    for extension, comprimido in versiones:
+        if len(comprimido) < len(original) * 0.95:
+            with open(ruta + extension, 'wb') as archivo:
+                archivo.write(comprimido)
+            escritos.append(ruta + extension)
+    return escritos
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Originales y versiones con hash (el CSS se referencia de ambas formas)
+        for nombre in {*self.hashed_files, *self.hashed_files.values()}:
+            if nombre.endswith(COMPRIMIBLES) and self.exists(nombre):
+                comprimir(self.path(nombre))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Sin collectstatic todavía (desarrollo, pruebas) se usa el nombre
+            # original; con manifiesto, un archivo faltante sigue siendo error
+            if self.hashed_files:
+                raise
+            return name
+
+
+def codificaciones_aceptadas(cabecera):
+    """{codificación: q} de un Accept-Encoding; 'gzip;q=0' significa que no se acepta"""
+    aceptadas = {}
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.partition(';')
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        q = 1.0
+        for parametro in parametros.split(';'):
+            clave, _, valor = parametro.partition('=')
+            if clave.strip().lower() == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        aceptadas[nombre] = q
+    return aceptadas
+
+
+def servir_estatico(request, ruta):
+    """
+    Sirve STATIC_ROOT eligiendo la versión precomprimida que acepte el
+    navegador (br > gzip). Los archivos con hash se cachean por un año.
+    """
+    # safe_join rechaza rutas fuera de STATIC_ROOT (SuspiciousFileOperation → 400)
+    completa = safe_join(settings.STATIC_ROOT, ruta)
+    if not os.path.isfile(completa):
+        raise Http404
+
+    aceptadas = codificaciones_aceptadas(request.headers.get('Accept-Encoding', ''))
+    opciones = [
+        (aceptadas.get(nombre, aceptadas.get('*', 0)), extension, nombre)
+        for extension, nombre in (('.br', 'br'), ('.gz', 'gzip'))
+        if os.path.isfile(completa + extension)
+    ]
+    # La de mayor q; a igual q, br (la primera de la lista)
+    q, extension, nombre = max(opciones, key=lambda opcion: opcion[0], default=(0, '', None))
+    if q > 0:
+        archivo, codificacion = completa + extension, nombre
+    else:
+        archivo, codificacion = completa, None
+
+    estado = os.stat(archivo)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), estado.st_mtime):
+        return HttpResponseNotModified()
+
+    tipo, _ = mimetypes.guess_type(completa)
+    response = FileResponse(open(archivo, 'rb'), content_type=tipo or 'application/octet-stream')
+    # FileResponse lo agrega con el nombre del .gz/.br; aquí no aplica
+    response.headers.pop('Content-Disposition', None)
+    response['Last-Modified'] = http_date(estado.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    if codificacion:
+        response['Content-Encoding'] = codificacion
+    if CON_HASH.search(ruta):
+        response['Cache-Control'] = f'public, max-age={UN_ANO}, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+@lru_cache(maxsize=None)
+def leer_estatico(nombre):
+    """Contenido de un archivo estático (ya recolectado o desde las apps)"""
+    if staticfiles_storage.exists(nombre):
+        with staticfiles_storage.open(nombre) as archivo:
+            return archivo.read().decode()
+    ruta = finders.find(nombre)
+    if ruta is None:
+        raise FileNotFoundError(nombre)
+    with open(ruta, encoding='utf-8') as archivo:
+        return archivo.read()
+
+
+# CSS crítico: las reglas de styles.css que pinta la primera pantalla (barra
+# superior, títulos y tarjetas). Se extraen del mismo styles.css, que sigue
+# siendo la única fuente: cambiar una regla ahí cambia también la copia en línea.
+SELECTORES_CRITICOS = (
+    ':root', 'body', '.navbar-custom', '.brand-title', '.section-title', 'h1, h2, h3, h4',
+    '.product-card', '.product-card img',
+)
+COMENTARIO_CSS = re.compile(r'/\*.*?\*/', re.S)
+REGLA_CSS = re.compile(r'([^{}]+)\{([^{}]*)\}')
+
+
+@lru_cache(maxsize=None)
+def css_critico(nombre, selectores=SELECTORES_CRITICOS):
+    """Reglas de `nombre` cuyo selector está en `selectores`, compactadas"""
+    reglas = []
+    for selector, cuerpo in REGLA_CSS.findall(COMENTARIO_CSS.sub('', leer_estatico(nombre))):
+        selector = ' '.join(selector.split())
+        if selector in selectores:
+            declaraciones = ';'.join(' '.join(linea.split()) for linea in cuerpo.split(';') if linea.strip())
+            reglas.append(f'{selector}{{{declaraciones}}}')
+    return '\n'.join(reglas)
@@ -0,0 +1,210 @@
+import csv
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import DetallePedido
+
+# openpyxl y reportlab se importan dentro de escribir_xlsx / escribir_pdf:
+# son las librerías más pesadas del proyecto y solo las usa el worker de
+# reportes, no cada proceso web ni el CSV.
+
+# Filas que se traen de la base de datos por cada viaje; la memoria del
+# worker queda fija sin importar el rango de fechas exportado
+TAMANO_LOTE = 2000
+
+ENCABEZADO_PEDIDOS = ["ID", "Cliente", "Fecha", "Total", "Estado"]
+ENCABEZADO_DETALLES = ["Pedido", "Producto", "Cantidad", "Precio unitario", "Subtotal"]
+
+
+def filas_pedidos(pedidos):
+    """Filas (id, cliente, fecha local, total, estado) leídas por lotes"""
+    filas = (
+        pedidos
+        .values_list("id", "nombre_cliente", "creado_en", "total", "estado")
+        .iterator(chunk_size=TAMANO_LOTE)
+    )
+    for pedido_id, cliente, creado_en, total, estado in filas:
+        yield [pedido_id, cliente, timezone.localtime(creado_en).strftime("%Y-%m-%d %H:%M"), total, estado]
+
+
+def filas_detalles(pedidos):
+    """Líneas de los pedidos (pedido, producto, cantidad, precio, subtotal) leídas por lotes"""
+    return (
+        DetallePedido.objects
+        .filter(pedido__in=pedidos.order_by().values("id"))
+        .order_by("pedido_id", "id")
+        .values_list("pedido_id", "producto__nombre", "cantidad", "precio_unitario", "subtotal")
+        .iterator(chunk_size=TAMANO_LOTE)
+    )
+
+
+def escribir_xlsx(destino, pedidos):
+    """
+    Escribe el reporte en `destino` (ruta o archivo) con openpyxl en modo
+    write-only: las filas se vuelcan a disco a medida que se agregan.
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+
+    ws = wb.create_sheet("Reporte de Pedidos")
+    ws.append(ENCABEZADO_PEDIDOS)
+    total = Decimal("0")
+    for fila in filas_pedidos(pedidos):
+        total += fila[3]
+        fila[3] = float(fila[3])
+        ws.append(fila)
+    ws.append(["", "", "", "TOTAL:", float(total)])
+
+    ws_detalles = wb.create_sheet("Detalle de Pedidos")
+    ws_detalles.append(ENCABEZADO_DETALLES)
+    for pedido_id, producto, cantidad, precio, subtotal in filas_detalles(pedidos):
+        ws_detalles.append([pedido_id, producto, cantidad, float(precio), float(subtotal)])
+
+    wb.save(destino)
+
+
+def escribir_pdf(destino, pedidos):
+    """Escribe el reporte de pedidos en PDF (reportlab) en `destino` (ruta o archivo)"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+
+    elements = []
+
+    styles = getSampleStyleSheet()
+
+    # =====================
+    # LOGO
+    # =====================
+    logo_path = os.path.join(settings.BASE_DIR, "catalogo/static/cliente/img/logo.png")
+    if os.path.exists(logo_path):
+        logo = Image(logo_path, width=1*inch, height=0.5*inch)
+        logo.hAlign = 'LEFT'
+        elements.append(logo)
+
+    elements.append(Spacer(1, 12))
+
+    # =====================
+    # DATOS NEGOCIO
+    # =====================
+    negocio = Paragraph(
+        "<b>Sr. Cheesecake, inc.</b><br/>"
+        "Dirección: Calle 71 SUR 45A - 43, Sabaneta Antioquia <br/>"
+        "Teléfono: 3222336338 <br/>"
+        "Email: contacto@srcheesecake.com",
+        styles["Normal"]
+    )
+    elements.append(negocio)
+
+    elements.append(Spacer(1, 20))
+
+    # =====================
+    # TÍTULO REPORTE
+    # =====================
+    titulo = Paragraph(
+        "<b>REPORTE DE PEDIDOS</b>",
+        styles["Heading1"]
+    )
+    elements.append(titulo)
+
+    elements.append(Spacer(1, 12))
+
+    fecha_generacion = datetime.now().strftime("%d/%m/%Y %H:%M")
+
+    rango = Paragraph(
+        f"Fecha de generación: {fecha_generacion}",
+        styles["Normal"]
+    )
+    elements.append(rango)
+
+    elements.append(Spacer(1, 20))
+
+    # =====================
+    # TABLA DATOS
+    # =====================
+    data = [["ID", "Cliente", "Fecha", "Estado", "Total"]]
+
+    total = Decimal("0")
+    filas = (
+        pedidos
+        .values_list("id", "nombre_cliente", "creado_en", "estado", "total")
+        .iterator(chunk_size=TAMANO_LOTE)
+    )
+    for pedido_id, cliente, creado_en, estado, monto in filas:
+        total += monto
+        data.append([
+            str(pedido_id),
+            cliente,
+            timezone.localtime(creado_en).strftime("%d/%m/%Y"),
+            estado,
+            f"${monto}"
+        ])
+
+    data.append(["", "", "", "TOTAL GENERAL:", f"${total}"])
+
+    table = Table(data, repeatRows=1)
+
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0,0), (-1,0), colors.grey),
+        ("TEXTCOLOR", (0,0), (-1,0), colors.white),
+        ("ALIGN", (4,1), (4,-1), "RIGHT"),
+        ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+        ("FONTNAME", (0,0), (-1,-1), "Helvetica"),
+        ("FONTSIZE", (0,0), (-1,-1), 9),
+        ("BOTTOMPADDING", (0,0), (-1,0), 10),
+        ("BACKGROUND", (0,-1), (-1,-1), colors.lightgrey),
+    ]))
+
+    elements.append(table)
+
+    elements.append(Spacer(1, 30))
+
+    # =====================
+    # PIE DE PÁGINA
+    # =====================
+    footer = Paragraph(
+        "Documento generado automáticamente por el sistema administrativo. Sr. Cheesecake, inc. © 2026 Todos los derechos reservados.",
+        styles["Italic"]
+    )
+
+    elements.append(footer)
+
+    doc.build(elements)
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: retorna la línea en vez de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_pedidos(pedidos):
+    """Genera el CSV de pedidos línea a línea (para StreamingHttpResponse)"""
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca UTF-8 (tildes y eñes)
+    yield "\ufeff"
+    yield escritor.writerow(ENCABEZADO_PEDIDOS)
+    total = Decimal("0")
+    for fila in filas_pedidos(pedidos):
+        total += fila[3]
+        yield escritor.writerow(fila)
+    yield escritor.writerow(["", "", "", "TOTAL:", total])
+
+
+def csv_detalles(pedidos):
+    """Genera el CSV de líneas de pedido línea a línea"""
+    escritor = csv.writer(_Eco())
+    yield "\ufeff"
+    yield escritor.writerow(ENCABEZADO_DETALLES)
+    for fila in filas_detalles(pedidos):
+        yield escritor.writerow(fila)
@@ -0,0 +1,26 @@
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+# Los días de venta se cuentan en la hora local del negocio
+ZONA_NEGOCIO = ZoneInfo('America/Bogota')
+
+
+def inicio_del_dia(dia):
+    """Medianoche (hora de Bogotá) del día dado, como datetime con zona horaria"""
+    return datetime.combine(dia, time.min, tzinfo=ZONA_NEGOCIO)
+
+
+def rango_fechas(fecha_inicio, fecha_fin):
+    """
+    Convierte un rango de fechas locales (date o 'AAAA-MM-DD', ambas inclusive)
+    en los límites [inicio, fin) para filtrar `creado_en__gte` / `creado_en__lt`.
+
+    Comparar la columna directamente (en vez de `creado_en__date`) permite que
+    la base de datos use los índices sobre `creado_en`. Lanza ValueError si
+    alguna fecha no es válida.
+    """
+    if not isinstance(fecha_inicio, date):
+        fecha_inicio = date.fromisoformat(fecha_inicio or "")
+    if not isinstance(fecha_fin, date):
+        fecha_fin = date.fromisoformat(fecha_fin or "")
+    return inicio_del_dia(fecha_inicio), inicio_del_dia(fecha_fin + timedelta(days=1))
@@ -0,0 +1,113 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Errores de una imagen que no se puede usar: archivo dañado o inexistente
+# (OSError) o tan grande que abrirla agotaría la memoria (más del doble de
+# Image.MAX_IMAGE_PIXELS)
+IMAGEN_INVALIDA = (OSError, Image.DecompressionBombError)
+
+# Versiones reducidas de las fotos de productos: para cada ancho se guarda
+# un WebP y un JPEG (para navegadores sin WebP) junto al original, p. ej.
+# productos/tarta.jpg → productos/tarta-320w.webp y productos/tarta-320w.jpg
+
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def anchos():
+    return getattr(settings, "IMAGENES_ANCHOS", (320, 640, 1024))
+
+
+def nombre_derivado(nombre, ancho, extension):
+    base, _ = os.path.splitext(nombre)
+    return f"{base}-{ancho}w.{extension}"
+
+
+def generar_derivados(nombre, storage=default_storage):
+    """
+    Crea (o reemplaza) las versiones reducidas de la imagen `nombre`.
+    Nunca agranda: si el original es más angosto, ese ancho queda con el
+    tamaño original. Lanza uno de IMAGEN_INVALIDA si la imagen no existe o
+    no es válida.
+    """
+    with storage.open(nombre, "rb") as archivo:
+        original = Image.open(archivo)
+        # Las fotos de celular traen la rotación en EXIF
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+
+    generados = []
+    for ancho in anchos():
+        copia = original.copy()
+        copia.thumbnail((ancho, ancho * 10), Image.LANCZOS)
+        for extension, (formato, opciones) in FORMATOS.items():
+            imagen = copia
+            if formato == "JPEG" and imagen.mode == "RGBA":
+                # JPEG no tiene transparencia: fondo blanco
+                fondo = Image.new("RGB", imagen.size, "white")
+                fondo.paste(imagen, mask=imagen.getchannel("A"))
+                imagen = fondo
+
+            contenido = io.BytesIO()
+            imagen.save(contenido, formato, **opciones)
+            destino = nombre_derivado(nombre, ancho, extension)
+            if storage.exists(destino):
+                storage.delete(destino)
+            generados.append(storage.save(destino, ContentFile(contenido.getvalue())))
+    return generados
+
+
+def borrar_derivados(nombre, storage=default_storage):
+    for ancho in anchos():
+        for extension in FORMATOS:
+            destino = nombre_derivado(nombre, ancho, extension)
+            if storage.exists(destino):
+                storage.delete(destino)
+
+
+def borrar_derivados_sin_uso(nombre, storage=default_storage):
+    """Borra los derivados de `nombre` si ya ningún producto usa esa imagen"""
+    from .models import Producto
+
+    if not Producto.objects.filter(imagen=nombre).exists():
+        borrar_derivados(nombre, storage)
+
+
+def srcset(imagen, extension):
+    """'url-320w.webp 320w, url-640w.webp 640w, ...' para un ImageField"""
+    return ", ".join(
+        f"{imagen.storage.url(nombre_derivado(imagen.name, ancho, extension))} {ancho}w"
+        for ancho in anchos()
+    )
+
+
+def procesar_producto(producto):
+    """
+    Genera los derivados y marca el producto; retorna False si la imagen no
+    sirve (el producto queda sin miniaturas y se registra el motivo).
+    """
+    from .models import Producto
+
+    if not producto.imagen.storage.exists(producto.imagen.name):
+        return False
+    try:
+        generar_derivados(producto.imagen.name, producto.imagen.storage)
+    except IMAGEN_INVALIDA as error:
+        logger.warning("No se pudieron generar miniaturas de %s: %s", producto.imagen.name, error)
+        return False
+    Producto.objects.filter(id=producto.id, imagen=producto.imagen.name).update(imagen_derivados=True)
+    producto.imagen_derivados = True
+    return True
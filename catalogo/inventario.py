@@ -0,0 +1,182 @@
+import random
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Sum
+
+from .models import Inventario, FragmentoInventario
+
+
+class StockInsuficiente(Exception):
+    """No hay unidades suficientes de un producto para completar el pedido"""
+
+    def __init__(self, producto, disponible):
+        self.producto = producto
+        self.disponible = disponible
+        super().__init__(
+            f"No hay suficiente stock de {producto.nombre}. Disponible: {disponible}"
+        )
+
+
+def _consulta_stock(producto_ids):
+    return (
+        Inventario.objects
+        .filter(producto_id__in=producto_ids)
+        .annotate(total_fragmentos=Sum("fragmentos__cantidad"))
+        .values_list("producto_id", "cantidad", "num_fragmentos", "total_fragmentos")
+    )
+
+
+def _stock(filas):
+    return {
+        producto_id: (total_fragmentos or 0) if num_fragmentos else cantidad
+        for producto_id, cantidad, num_fragmentos, total_fragmentos in filas
+    }
+
+
+def stock_por_producto(producto_ids):
+    """Retorna {producto_id: cantidad disponible} con una sola consulta"""
+    return _stock(_consulta_stock(producto_ids))
+
+
+async def astock_por_producto(producto_ids):
+    return _stock([fila async for fila in _consulta_stock(producto_ids)])
+
+
+def _consulta_fragmentos(inventario_ids):
+    return (
+        FragmentoInventario.objects
+        .filter(inventario_id__in=inventario_ids)
+        .values("inventario_id")
+        .annotate(total=Sum("cantidad"))
+        .values_list("inventario_id", "total")
+    )
+
+
+def precargar_disponible(inventarios):
+    """
+    Calcula `disponible` de los inventarios fragmentados con una sola consulta,
+    para listados que muestran el stock de muchos productos.
+    """
+    fragmentados = {inventario.id: inventario for inventario in inventarios if inventario.num_fragmentos}
+    if not fragmentados:
+        return
+    totales = dict(_consulta_fragmentos(fragmentados))
+    for inventario_id, inventario in fragmentados.items():
+        inventario.disponible = totales.get(inventario_id) or 0
+
+
+async def aprecargar_disponible(inventarios):
+    fragmentados = {inventario.id: inventario for inventario in inventarios if inventario.num_fragmentos}
+    if not fragmentados:
+        return
+    totales = {inventario_id: total async for inventario_id, total in _consulta_fragmentos(fragmentados)}
+    for inventario_id, inventario in fragmentados.items():
+        inventario.disponible = totales.get(inventario_id) or 0
+
+
+def disponible_en_carrito(producto):
+    """
+    Unidades que el carrito deja pedir del producto (con el inventario ya
+    cargado). Sin Inventario no hay stock que vender: 0, igual en todas las
+    vistas del carrito y en su API.
+    """
+    return producto.inventario.disponible if hasattr(producto, "inventario") else 0
+
+
+def con_stock():
+    """Filtro de productos con al menos una unidad disponible"""
+    fragmentos_con_stock = FragmentoInventario.objects.filter(
+        inventario__producto=OuterRef("pk"), cantidad__gt=0
+    )
+    return (
+        Q(inventario__num_fragmentos=0, inventario__cantidad__gt=0)
+        | Q(Exists(fragmentos_con_stock), inventario__num_fragmentos__gt=0)
+    )
+
+
+def descontar_stock(producto, cantidad):
+    """Resta unidades con un UPDATE condicional; falla si no alcanza el stock"""
+    inventario = producto.inventario
+    if inventario.num_fragmentos:
+        _descontar_fragmentos(producto, inventario, cantidad)
+        return
+
+    actualizados = (
+        Inventario.objects
+        .filter(producto_id=producto.id, cantidad__gte=cantidad)
+        .update(cantidad=F("cantidad") - cantidad)
+    )
+    if not actualizados:
+        disponible = (
+            Inventario.objects
+            .filter(producto_id=producto.id)
+            .values_list("cantidad", flat=True)
+            .first()
+        )
+        raise StockInsuficiente(producto, disponible or 0)
+
+
+def _descontar_fragmentos(producto, inventario, cantidad):
+    # Se prueban los fragmentos en orden aleatorio para repartir la contención
+    indices = list(range(inventario.num_fragmentos))
+    random.shuffle(indices)
+    for indice in indices:
+        actualizados = (
+            FragmentoInventario.objects
+            .filter(inventario_id=inventario.id, indice=indice, cantidad__gte=cantidad)
+            .update(cantidad=F("cantidad") - cantidad)
+        )
+        if actualizados:
+            return
+
+    # Ningún fragmento alcanza por sí solo: se bloquean todos (en orden) y se reparte
+    fragmentos = list(
+        FragmentoInventario.objects
+        .select_for_update()
+        .filter(inventario_id=inventario.id)
+        .order_by("indice")
+    )
+    disponible = sum(fragmento.cantidad for fragmento in fragmentos)
+    if disponible < cantidad:
+        raise StockInsuficiente(producto, disponible)
+
+    restante = cantidad
+    for fragmento in fragmentos:
+        tomar = min(fragmento.cantidad, restante)
+        fragmento.cantidad -= tomar
+        restante -= tomar
+    FragmentoInventario.objects.bulk_update(fragmentos, ["cantidad"])
+
+
+@transaction.atomic
+def establecer_stock(inventario, cantidad, num_fragmentos=None):
+    """
+    Fija la cantidad lógica del inventario. Con fragmentos, el total se reparte
+    en partes iguales; sin ellos, se guarda en la fila del inventario.
+    `num_fragmentos` cambia el número de fragmentos; si no se indica se usa el
+    guardado en la BD (no el de `inventario`, que puede estar desactualizado).
+    """
+    bloqueado = Inventario.objects.select_for_update().get(id=inventario.id)
+    if num_fragmentos is not None:
+        bloqueado.num_fragmentos = num_fragmentos
+
+    if not bloqueado.num_fragmentos:
+        bloqueado.fragmentos.all().delete()
+        bloqueado.cantidad = cantidad
+    else:
+        base, resto = divmod(cantidad, bloqueado.num_fragmentos)
+        bloqueado.fragmentos.filter(indice__gte=bloqueado.num_fragmentos).delete()
+        for indice in range(bloqueado.num_fragmentos):
+            FragmentoInventario.objects.update_or_create(
+                inventario=bloqueado,
+                indice=indice,
+                defaults={"cantidad": base + (1 if indice < resto else 0)},
+            )
+        bloqueado.cantidad = 0
+
+    bloqueado.save(update_fields=["cantidad", "num_fragmentos"])
+    # El objeto del llamador queda igual a la fila; la cantidad calculada
+    # anteriormente ya no es válida
+    inventario.cantidad = bloqueado.cantidad
+    inventario.num_fragmentos = bloqueado.num_fragmentos
+    inventario.__dict__.pop("disponible", None)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.arranque import diferidos_cargados, medir_arranque
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque de un worker (src.wsgi + URLconf) en un intérprete nuevo con "
+        "-X importtime: tiempo, RSS y los módulos que más tardan en importarse"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a mostrar")
+
+    def handle(self, *args, **options):
+        medida = medir_arranque()
+        modulos = medida["modulos"]
+
+        self.stdout.write(
+            f"Arranque: {medida['segundos'] * 1000:.0f} ms | RSS {medida['rss_kb'] / 1024:.1f} MB | "
+            f"{len(modulos)} módulos importados"
+        )
+        # Tiempo acumulado: incluye lo que cada módulo importa a su vez
+        self.stdout.write(f"{'ms':>8}  módulo")
+        for modulo, microsegundos in sorted(modulos.items(), key=lambda par: par[1], reverse=True)[:options["top"]]:
+            self.stdout.write(f"{microsegundos / 1000:>8.1f}  {modulo}")
+
+        cargados = diferidos_cargados(modulos)
+        if cargados:
+            self.stderr.write(self.style.ERROR(f"Módulos de exportación cargados al arrancar: {', '.join(cargados[:5])}"))
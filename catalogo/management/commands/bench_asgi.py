@@ -0,0 +1,177 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import include, path, reverse
+
+from catalogo import views, views_async
+from catalogo.models import Categoria, DetallePedido, Inventario, Pedido, Producto
+from catalogo.urls import rutas_tienda
+
+
+class UrlsWsgi:
+    urlpatterns = [*rutas_tienda(views), path("", include("src.urls"))]
+
+
+class UrlsAsgi:
+    urlpatterns = [*rutas_tienda(views_async), path("", include("src.urls"))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara peticiones/s y latencia p99 de las páginas de la tienda entre WSGI (vistas "
+        "síncronas, un hilo por petición como gunicorn --threads) y ASGI (vistas async en un event loop)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--peticiones", type=int, default=400, help="Peticiones por modo")
+        parser.add_argument("--concurrencia", type=int, default=16,
+                            help="Peticiones simultáneas (hilos en WSGI, tareas en ASGI)")
+        parser.add_argument("--latencia-bd", type=float, default=0.0,
+                            help="Milisegundos agregados a cada consulta para simular una BD lenta o remota")
+
+    def handle(self, *args, **options):
+        if options["peticiones"] < 1 or options["concurrencia"] < 1:
+            raise CommandError("--peticiones y --concurrencia deben ser mayores que cero")
+
+        categoria = Categoria.objects.create(nombre="bench-asgi")
+        productos = [
+            Producto.objects.create(
+                categoria=categoria, nombre=f"Cheesecake bench {i}", descripcion="Producto temporal del benchmark",
+                precio=Decimal("25000"), imagen="productos/bench.jpg",
+            )
+            for i in range(3)
+        ]
+        Inventario.objects.bulk_create([Inventario(producto=producto, cantidad=1000) for producto in productos])
+        pedido = Pedido.objects.create(nombre_cliente="Bench", telefono="300", direccion="Calle 1", total=Decimal("50000"))
+        DetallePedido.objects.create(
+            pedido=pedido, producto=productos[0], cantidad=2,
+            precio_unitario=Decimal("25000"), subtotal=Decimal("50000"),
+        )
+        sesion = SessionStore()
+        sesion["cart"] = {str(producto.id): {"cantidad": 1, "precio": "25000"} for producto in productos}
+        sesion.create()
+
+        demora = options["latencia_bd"] / 1000
+
+        def demorar(execute, sql, params, many, context):
+            time.sleep(demora)
+            return execute(sql, params, many, context)
+
+        def agregar_demora(sender, connection, **kwargs):
+            connection.execute_wrappers.append(demorar)
+
+        if demora:
+            # Cada hilo abre su propia conexión; la del hilo principal ya existe
+            connection_created.connect(agregar_demora)
+            connections["default"].execute_wrappers.append(demorar)
+
+        try:
+            self.stdout.write(
+                f"Motor: {connections['default'].vendor} | {options['peticiones']} peticiones por modo | "
+                f"concurrencia {options['concurrencia']} | latencia BD +{options['latencia_bd']:.0f} ms"
+            )
+            for nombre, urlconf, medir in (("WSGI", UrlsWsgi, self.medir_wsgi), ("ASGI", UrlsAsgi, self.medir_asgi)):
+                with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                    urls = [
+                        reverse("lista_productos"),
+                        reverse("detalle_producto", args=[productos[0].id]),
+                        reverse("ver_carrito"),
+                        reverse("confirmacion_pedido", args=[pedido.id]),
+                    ]
+                    peticiones = [urls[i % len(urls)] for i in range(options["peticiones"])]
+                    cookie = f"{settings.SESSION_COOKIE_NAME}={sesion.session_key}"
+                    # Calentamiento: cachés del catálogo y plantillas compiladas
+                    medir(urls, cookie, 1)
+                    inicio = time.perf_counter()
+                    tiempos = medir(peticiones, cookie, options["concurrencia"])
+                    self.reportar(nombre, tiempos, time.perf_counter() - inicio)
+        finally:
+            if demora:
+                connection_created.disconnect(agregar_demora)
+                connections["default"].execute_wrappers.remove(demorar)
+            # Limpieza de los datos temporales
+            sesion.delete()
+            pedido.delete()
+            categoria.delete()
+
+    def medir_wsgi(self, urls, cookie, concurrencia):
+        aplicacion = WSGIHandler()
+
+        def pedir(url):
+            entorno = {
+                "REQUEST_METHOD": "GET", "PATH_INFO": url, "QUERY_STRING": "", "SCRIPT_NAME": "",
+                "SERVER_NAME": "testserver", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": "testserver", "HTTP_COOKIE": cookie,
+                "wsgi.input": io.BytesIO(), "wsgi.url_scheme": "http", "wsgi.errors": io.StringIO(),
+            }
+            estado = []
+            inicio = time.perf_counter()
+            respuesta = aplicacion(entorno, lambda status, headers, exc_info=None: estado.append(status))
+            b"".join(respuesta)
+            respuesta.close()
+            self.verificar(url, int(estado[0][:3]))
+            return time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(concurrencia) as hilos:
+            return list(hilos.map(pedir, urls))
+
+    def medir_asgi(self, urls, cookie, concurrencia):
+        aplicacion = ASGIHandler()
+
+        async def pedir(url, limite):
+            alcance = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": url, "raw_path": url.encode(), "query_string": b"", "root_path": "",
+                "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+                "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+            }
+            mensajes = [{"type": "http.request", "body": b"", "more_body": False}]
+            estado = []
+
+            async def recibir():
+                if mensajes:
+                    return mensajes.pop()
+                # Django espera aquí una desconexión que nunca llega
+                await asyncio.Future()
+
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    estado.append(mensaje["status"])
+
+            async with limite:
+                inicio = time.perf_counter()
+                await aplicacion(alcance, recibir, enviar)
+                self.verificar(url, estado[0])
+                return time.perf_counter() - inicio
+
+        async def todas():
+            limite = asyncio.Semaphore(concurrencia)
+            return await asyncio.gather(*(pedir(url, limite) for url in urls))
+
+        return asyncio.run(todas())
+
+    def verificar(self, url, estado):
+        if estado != 200:
+            raise CommandError(f"{url} respondió {estado}")
+
+    def reportar(self, nombre, tiempos, segundos):
+        tiempos = sorted(tiempos)
+        total = len(tiempos)
+        self.stdout.write(
+            f"{nombre}: {total / segundos:.1f} peticiones/s | "
+            f"media {statistics.mean(tiempos) * 1000:.1f} ms | "
+            f"p50 {tiempos[total // 2] * 1000:.1f} ms | "
+            f"p99 {tiempos[max(int(total * 0.99) - 1, 0)] * 1000:.1f} ms"
+        )
@@ -0,0 +1,76 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo.models import Categoria, Producto, Inventario
+
+ESCRITURAS = ("INSERT", "UPDATE", "DELETE")
+
+
+class Command(BaseCommand):
+    help = "Compara escrituras en BD y latencia por operación del carrito entre los almacenes 'sesion' y 'cookie'"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ciclos", type=int, default=50,
+                            help="Ciclos agregar → más → menos → eliminar por almacén")
+
+    def handle(self, *args, **options):
+        categoria = Categoria.objects.create(nombre="bench-carrito")
+        producto = Producto.objects.create(
+            categoria=categoria,
+            nombre="Cheesecake bench",
+            descripcion="Producto temporal del benchmark",
+            precio=Decimal("25000"),
+            imagen="productos/bench.jpg",
+        )
+        Inventario.objects.create(producto=producto, cantidad=1000)
+
+        operaciones = [
+            reverse(nombre, args=[producto.id])
+            for nombre in ("agregar_al_carrito", "incrementar_cantidad", "decrementar_cantidad", "eliminar_item")
+        ]
+
+        try:
+            self.stdout.write(f"Motor: {connection.vendor} | {options['ciclos']} ciclos de {len(operaciones)} operaciones")
+            for almacen in ("sesion", "cookie"):
+                with override_settings(
+                    CARRITO_ALMACENAMIENTO=almacen,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                ):
+                    self.medir(almacen, operaciones, options["ciclos"])
+        finally:
+            # Limpieza de los datos temporales
+            categoria.delete()
+
+    def medir(self, almacen, operaciones, ciclos):
+        client = Client()
+        # La primera operación crea la sesión: no se cuenta
+        client.get(operaciones[0])
+        client.get(operaciones[-1])
+
+        tiempos = []
+        escrituras = 0
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(ciclos):
+                for url in operaciones:
+                    inicio = time.perf_counter()
+                    client.get(url)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+        for consulta in consultas.captured_queries:
+            if consulta["sql"].lstrip().upper().startswith(ESCRITURAS):
+                escrituras += 1
+
+        tiempos.sort()
+        total = len(tiempos)
+        self.stdout.write(
+            f"{almacen:>6}: {escrituras / total:.2f} escrituras/op | "
+            f"{len(consultas.captured_queries) / total:.2f} consultas/op | "
+            f"media {statistics.mean(tiempos):.2f} ms | p95 {tiempos[int(total * 0.95) - 1]:.2f} ms"
+        )
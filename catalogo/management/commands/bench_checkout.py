@@ -0,0 +1,138 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalogo.fechas import ZONA_NEGOCIO
+from catalogo.models import Categoria, Producto, Inventario, Pedido, DetallePedido, VentaDiaria
+from catalogo.pedidos import crear_pedido, StockInsuficiente
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de checkouts concurrentes (verifica que no haya sobreventa). Con --productos "
+        "varios, el inventario deja de ser la fila compartida y se ve la contención del resumen del día"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clientes", type=int, default=20, help="Hilos comprando en paralelo")
+        parser.add_argument("--compras", type=int, default=10, help="Compras por cliente")
+        parser.add_argument("--stock", type=int, default=100, help="Stock inicial de cada producto")
+        parser.add_argument("--productos", type=int, default=1, help="Productos distintos (cliente i compra el i %% N)")
+        parser.add_argument("--cantidad", type=int, default=1, help="Unidades por compra")
+
+    def handle(self, *args, **options):
+        categoria = Categoria.objects.create(nombre="bench-checkout")
+        productos = []
+        for i in range(max(options["productos"], 1)):
+            producto = Producto.objects.create(
+                categoria=categoria,
+                nombre=f"Cheesecake bench {i}",
+                descripcion="Producto temporal del benchmark",
+                precio=Decimal("25000"),
+                imagen="productos/bench.jpg",
+            )
+            Inventario.objects.create(producto=producto, cantidad=options["stock"])
+            productos.append(producto)
+
+        # Las señales del resumen siguen activas: cada checkout suma a la misma
+        # fila de VentaDiaria, que se compara al final con los pedidos creados
+        hoy = timezone.localdate(timezone=ZONA_NEGOCIO)
+        pedidos_antes = VentaDiaria.objects.filter(fecha=hoy).values_list("pedidos", flat=True).first() or 0
+
+        resultados = {"vendidos": 0, "sin_stock": 0, "bloqueos": 0}
+        latencias = []
+        candado = threading.Lock()
+
+        def cliente(producto):
+            try:
+                for _ in range(options["compras"]):
+                    # Igual que el carrito: producto hidratado con su inventario
+                    item_producto = Producto.objects.select_related("inventario").get(id=producto.id)
+                    subtotal = item_producto.precio * options["cantidad"]
+                    items = [{"producto": item_producto, "cantidad": options["cantidad"], "subtotal": subtotal}]
+                    comienzo = time.perf_counter()
+                    try:
+                        crear_pedido(
+                            items,
+                            subtotal,
+                            nombre_cliente="bench",
+                            telefono="0",
+                            direccion="bench",
+                            metodo_pago="Efectivo",
+                        )
+                        clave = "vendidos"
+                    except StockInsuficiente:
+                        clave = "sin_stock"
+                    except OperationalError:
+                        # SQLite serializa escrituras y puede rechazar por bloqueo
+                        clave = "bloqueos"
+                    latencia = time.perf_counter() - comienzo
+                    with candado:
+                        resultados[clave] += 1
+                        latencias.append(latencia)
+            finally:
+                connection.close()
+
+        hilos = [
+            threading.Thread(target=cliente, args=(productos[i % len(productos)],))
+            for i in range(options["clientes"])
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        stock_final = sum(Inventario.objects.filter(producto__in=productos).values_list("cantidad", flat=True))
+        sobreventa = descuadre = unidades_vendidas = 0
+        for producto in productos:
+            vendidas = (
+                DetallePedido.objects.filter(producto=producto)
+                .aggregate(total=Sum("cantidad"))["total"] or 0
+            )
+            stock = Inventario.objects.get(producto=producto).cantidad
+            unidades_vendidas += vendidas
+            sobreventa += max(vendidas - options["stock"], 0)
+            descuadre += options["stock"] - stock - vendidas
+        pedidos_resumen = (
+            VentaDiaria.objects.filter(fecha=hoy).values_list("pedidos", flat=True).first() or 0
+        ) - pedidos_antes
+
+        # Limpieza de los datos temporales. Los ids se leen antes de borrar los
+        # detalles (el queryset es perezoso y después ya no encontraría nada).
+        # No se usa una transacción con rollback: cada hilo compra con su
+        # propia conexión y sus commits no se podrían deshacer desde aquí.
+        pedidos = list(Pedido.objects.filter(detalles__producto__in=productos).distinct().values_list("id", flat=True))
+        DetallePedido.objects.filter(pedido_id__in=pedidos).delete()
+        Pedido.objects.filter(id__in=pedidos).delete()
+        categoria.delete()
+
+        intentos = options["clientes"] * options["compras"]
+        self.stdout.write(f"Motor: {connection.vendor}")
+        self.stdout.write(f"Intentos: {intentos} en {duracion:.2f}s")
+        self.stdout.write(f"Productos: {len(productos)}")
+        self.stdout.write(f"Pedidos creados: {resultados['vendidos']} ({resultados['vendidos'] / duracion:.1f} pedidos/s)")
+        if latencias:
+            latencias.sort()
+            p50 = latencias[len(latencias) // 2] * 1000
+            p95 = latencias[min(int(len(latencias) * 0.95), len(latencias) - 1)] * 1000
+            self.stdout.write(f"Latencia por checkout: p50 {p50:.1f} ms | p95 {p95:.1f} ms")
+        self.stdout.write(f"Rechazados por stock: {resultados['sin_stock']}")
+        if resultados["bloqueos"]:
+            self.stdout.write(f"Rechazados por bloqueo de BD: {resultados['bloqueos']}")
+        self.stdout.write(f"Stock final: {stock_final} | Unidades vendidas: {unidades_vendidas}")
+
+        if pedidos_resumen != resultados["vendidos"]:
+            self.stderr.write(self.style.ERROR(
+                f"Resumen del día: {pedidos_resumen} pedidos sumados para {resultados['vendidos']} creados"
+            ))
+        if sobreventa or descuadre:
+            self.stderr.write(self.style.ERROR(f"Sobreventa: {sobreventa} | Descuadre de inventario: {descuadre}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sobreventa: 0"))
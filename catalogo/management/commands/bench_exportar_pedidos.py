@@ -0,0 +1,70 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from catalogo.models import Categoria, Producto, Pedido, DetallePedido
+from catalogo.resources import PedidoResource
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo y número de consultas del export de PedidoResource (los datos se descartan al final)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 100000],
+                            help="Cantidades de pedidos a exportar")
+        parser.add_argument("--lineas", type=int, default=2, help="Líneas de detalle por pedido")
+
+    def handle(self, *args, **options):
+        for tamano in options["tamanos"]:
+            try:
+                with transaction.atomic():
+                    self.medir(tamano, options["lineas"])
+                    # Nada del benchmark queda en la base de datos
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def medir(self, tamano, lineas):
+        categoria = Categoria.objects.create(nombre="bench-export")
+        productos = [
+            Producto.objects.create(
+                categoria=categoria, nombre=f"Producto {i}", descripcion="bench",
+                precio=Decimal("10000"), imagen="productos/bench.jpg",
+            )
+            for i in range(lineas)
+        ]
+        pedidos = Pedido.objects.bulk_create(
+            [
+                Pedido(nombre_cliente=f"Cliente {i}", telefono="300", direccion="bench",
+                       total=Decimal("10000") * lineas)
+                for i in range(tamano)
+            ],
+            batch_size=5000,
+        )
+        DetallePedido.objects.bulk_create(
+            [
+                DetallePedido(pedido=pedido, producto=producto, cantidad=1,
+                              precio_unitario=Decimal("10000"), subtotal=Decimal("10000"))
+                for pedido in pedidos
+                for producto in productos
+            ],
+            batch_size=5000,
+        )
+
+        queryset = Pedido.objects.filter(direccion="bench").order_by("-creado_en")
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            dataset = PedidoResource().export(queryset=queryset)
+            duracion = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"[{connection.vendor}] {tamano:>7} pedidos: {duracion:.2f}s, "
+            f"{len(consultas)} consultas, {len(dataset)} filas"
+        )
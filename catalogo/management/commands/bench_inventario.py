@@ -0,0 +1,71 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+
+from catalogo.inventario import descontar_stock, establecer_stock, StockInsuficiente
+from catalogo.models import Categoria, Producto, Inventario
+
+
+class Command(BaseCommand):
+    help = "Compara descuentos concurrentes de stock en una sola fila contra stock fragmentado"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=16, help="Hilos descontando en paralelo")
+        parser.add_argument("--descuentos", type=int, default=50, help="Descuentos por hilo")
+        parser.add_argument("--fragmentos", type=int, default=8, help="Fragmentos del modo fragmentado")
+
+    def handle(self, *args, **options):
+        categoria = Categoria.objects.create(nombre="bench-inventario")
+        try:
+            for num_fragmentos in (0, options["fragmentos"]):
+                self.medir(categoria, num_fragmentos, options)
+        finally:
+            categoria.delete()
+
+    def medir(self, categoria, num_fragmentos, options):
+        total = options["hilos"] * options["descuentos"]
+        producto = Producto.objects.create(
+            categoria=categoria,
+            nombre=f"Cheesecake bench x{num_fragmentos}",
+            descripcion="Producto temporal del benchmark",
+            precio=Decimal("25000"),
+            imagen="productos/bench.jpg",
+        )
+        inventario = Inventario.objects.create(producto=producto, num_fragmentos=num_fragmentos)
+        establecer_stock(inventario, total)
+
+        errores = []
+        candado = threading.Lock()
+
+        def trabajador():
+            try:
+                local = Producto.objects.select_related("inventario").get(id=producto.id)
+                for _ in range(options["descuentos"]):
+                    try:
+                        with transaction.atomic():
+                            descontar_stock(local, 1)
+                    except (StockInsuficiente, OperationalError) as error:
+                        with candado:
+                            errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(options["hilos"])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        restante = Inventario.objects.get(id=inventario.id).disponible
+        modo = "una fila" if not num_fragmentos else f"{num_fragmentos} fragmentos"
+        self.stdout.write(
+            f"[{connection.vendor}] {modo}: {total - len(errores)} descuentos en {duracion:.2f}s "
+            f"({(total - len(errores)) / duracion:.1f}/s), fallidos: {len(errores)}, stock final: {restante}"
+        )
+        if restante != len(errores):
+            self.stderr.write(self.style.ERROR(f"Descuadre de inventario en modo {modo}"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.conciliacion import conciliar
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulta en Wompi los pedidos que siguen con pago pendiente y guarda el estado real "
+        "(para programar con cron, p. ej. cada 15 minutos)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--antiguedad", type=int, default=30,
+                            help="Minutos desde la creación del pedido antes de consultarlo")
+        parser.add_argument("--dias", type=int, default=7, help="No consulta pedidos más viejos que esto")
+        parser.add_argument("--lote", type=int, default=200, help="Pedidos leídos y guardados por lote")
+        parser.add_argument("--concurrencia", type=int, default=8, help="Consultas simultáneas a la API")
+        parser.add_argument("--reintentos", type=int, default=3, help="Reintentos por consulta fallida")
+        parser.add_argument("--espera", type=float, default=0.5,
+                            help="Segundos de la primera espera entre reintentos (se duplica en cada uno)")
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1 or options["concurrencia"] < 1:
+            raise CommandError("--lote y --concurrencia deben ser mayores que cero")
+
+        resultado = conciliar(
+            antiguedad=options["antiguedad"],
+            dias=options["dias"],
+            lote=options["lote"],
+            conexiones=options["concurrencia"],
+            reintentos=options["reintentos"],
+            espera=options["espera"],
+        )
+
+        latencias = sorted(resultado["latencias"])
+        total = len(latencias)
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['consultados']} pedidos consultados, {resultado['actualizados']} actualizados, "
+            f"{resultado['errores']} con error en {resultado['segundos']:.2f}s"
+        ))
+        if total:
+            self.stdout.write(
+                f"{total / resultado['segundos']:.1f} consultas/s | "
+                f"latencia p50 {latencias[total // 2] * 1000:.0f} ms | "
+                f"p95 {latencias[max(int(total * 0.95) - 1, 0)] * 1000:.0f} ms | "
+                f"máx {latencias[-1] * 1000:.0f} ms"
+            )
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from catalogo.imagenes import IMAGEN_INVALIDA, generar_derivados
+from catalogo.models import Producto
+
+
+def _generar(nombre):
+    # Corre en un proceso hijo: solo toca archivos, no la base de datos
+    try:
+        generar_derivados(nombre, default_storage)
+    except IMAGEN_INVALIDA as error:
+        return nombre, str(error)
+    return nombre, None
+
+
+class Command(BaseCommand):
+    help = "Genera las miniaturas WebP/JPEG de las imágenes de productos que aún no las tienen, en paralelo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=None,
+                            help="Procesos en paralelo (por defecto, uno por CPU)")
+        parser.add_argument("--todas", action="store_true",
+                            help="Regenera también las que ya tienen miniaturas (p. ej. si cambian los anchos)")
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen="")
+        if not options["todas"]:
+            productos = productos.filter(imagen_derivados=False)
+        # Varios productos pueden compartir la misma imagen
+        nombres = set(productos.values_list("imagen", flat=True))
+        if not nombres:
+            self.stdout.write("No hay imágenes pendientes")
+            return
+
+        listas, fallidas = [], 0
+        inicio = time.perf_counter()
+        # initializer: con 'spawn' (macOS/Windows) cada hijo debe configurar Django
+        with ProcessPoolExecutor(max_workers=options["procesos"], initializer=django.setup) as pool:
+            tareas = [pool.submit(_generar, nombre) for nombre in nombres]
+            for tarea in as_completed(tareas):
+                nombre, error = tarea.result()
+                if error:
+                    fallidas += 1
+                    self.stderr.write(self.style.WARNING(f"{nombre}: {error}"))
+                else:
+                    listas.append(nombre)
+        duracion = time.perf_counter() - inicio
+
+        # Un solo UPDATE por lote desde el proceso principal
+        for i in range(0, len(listas), 500):
+            Producto.objects.filter(imagen__in=listas[i:i + 500]).update(imagen_derivados=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(listas)} imágenes procesadas en {duracion:.2f}s ({len(listas) / duracion:.1f}/s), {fallidas} con error"
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+MOTORES_EN_BD = (
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cached_db",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las sesiones vencidas por lotes pequeños (cada lote es una transacción corta), "
+        "en vez del DELETE único de clearsessions que bloquea la tabla con millones de filas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=5000, help="Sesiones borradas por transacción")
+        parser.add_argument("--pausa", type=float, default=0.1,
+                            help="Segundos de espera entre lotes para no saturar la base de datos")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in MOTORES_EN_BD:
+            raise CommandError(f"El motor de sesiones {settings.SESSION_ENGINE} no guarda sesiones en la base de datos")
+        if options["lote"] < 1:
+            raise CommandError("--lote debe ser mayor que cero")
+
+        # Límite fijo: las sesiones que vencen mientras corre quedan para la próxima vez
+        limite = timezone.now()
+        vencidas = Session.objects.filter(expire_date__lt=limite)
+
+        borradas = 0
+        inicio = time.perf_counter()
+        while True:
+            # Recorre el índice de expire_date; cada DELETE es por clave primaria
+            claves = list(vencidas.values_list("session_key", flat=True)[:options["lote"]])
+            if not claves:
+                break
+            borradas += Session.objects.filter(session_key__in=claves).delete()[0]
+            if len(claves) < options["lote"]:
+                break
+            time.sleep(options["pausa"])
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f"{borradas} sesiones vencidas borradas en {duracion:.2f}s"))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from catalogo.trabajos import limpiar_vencidos, liberar_abandonados, procesar, tomar_siguiente
+
+# La limpieza de trabajos vencidos corre al arrancar y luego cada hora
+INTERVALO_LIMPIEZA = 3600
+
+
+class Command(BaseCommand):
+    help = "Worker que genera los reportes encolados desde el panel (sin broker: la cola es la base de datos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Procesa la cola pendiente y termina")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera cuando la cola está vacía")
+        parser.add_argument("--abandonados", type=int, default=30,
+                            help="Minutos sin latido tras los que un trabajo 'procesando' vuelve a la cola")
+        parser.add_argument("--retener-dias", type=int, default=7,
+                            help="Días que se conservan los reportes terminados y sus archivos")
+
+    def handle(self, *args, **options):
+        ultima_limpieza = None
+        while True:
+            close_old_connections()
+            if ultima_limpieza is None or time.monotonic() - ultima_limpieza >= INTERVALO_LIMPIEZA:
+                ultima_limpieza = time.monotonic()
+                borrados = limpiar_vencidos(options["retener_dias"])
+                if borrados:
+                    self.stdout.write(f"{borrados} reportes vencidos borrados")
+
+            liberados = liberar_abandonados(options["abandonados"])
+            if liberados:
+                self.stdout.write(f"{liberados} trabajos abandonados devueltos a la cola")
+
+            trabajo = tomar_siguiente()
+            if trabajo is None:
+                if options["una_vez"]:
+                    return
+                time.sleep(options["intervalo"])
+                continue
+
+            inicio = time.perf_counter()
+            procesar(trabajo)
+            duracion = time.perf_counter() - inicio
+            if trabajo.estado == "listo":
+                self.stdout.write(self.style.SUCCESS(f"{trabajo} en {duracion:.2f}s"))
+            else:
+                self.stderr.write(self.style.ERROR(f"{trabajo}: {trabajo.error.strip().splitlines()[-1]}"))
@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.ventas import recalcular_ventas
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen diario de ventas (VentaDiaria) para un rango de fechas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha inicial AAAA-MM-DD (por defecto, desde el primer pedido)")
+        parser.add_argument("--hasta", help="Fecha final AAAA-MM-DD (por defecto, hasta hoy)")
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options["desde"]) if options["desde"] else None
+            hasta = date.fromisoformat(options["hasta"]) if options["hasta"] else None
+        except ValueError as error:
+            raise CommandError(f"Fecha inválida: {error}")
+
+        dias = recalcular_ventas(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f"Resumen recalculado: {dias} días con ventas"))
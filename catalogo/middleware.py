@@ -0,0 +1,70 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import perfilador
+
+
+class CarritoMiddleware:
+    """Escribe en la respuesta los cambios del carrito (necesario para el almacén en cookie)"""
+
+    # Funciona con WSGI y ASGI: bajo ASGI no obliga a pasar las vistas async a un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.responder(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.responder(request, response)
+        return response
+
+    def responder(self, request, response):
+        cart = getattr(request, "_cart", None)
+        if cart is not None:
+            cart.almacen.responder(response)
+
+
+class PerfiladorMiddleware:
+    """
+    Mide una fracción de las peticiones (settings.PERFILADOR_MUESTREO, entre
+    0 y 1). Con 0 el middleware se desactiva y no agrega ningún costo.
+    Es solo síncrono: execute_wrapper mide las consultas del hilo actual, y
+    bajo ASGI activarlo hace que las vistas async corran en un hilo.
+    """
+
+    def __init__(self, get_response):
+        self.muestreo = getattr(settings, "PERFILADOR_MUESTREO", 0)
+        if not self.muestreo:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        medidor = perfilador.MedidorSQL()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(medidor):
+            response = self.get_response(request)
+        ms = (time.perf_counter() - inicio) * 1000
+
+        # Las rutas con parámetros se agrupan por nombre de la vista
+        coincidencia = request.resolver_match
+        vista = coincidencia.view_name if coincidencia else request.path
+        perfilador.registrar(vista, request.method, ms, medidor)
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0007_pedido_visto_por_admin_alter_pedido_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventario',
+            name='num_fragmentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FragmentoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('inventario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='catalogo.inventario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('inventario', 'indice'), name='fragmento_inventario_unico')],
+            },
+        ),
+    ]
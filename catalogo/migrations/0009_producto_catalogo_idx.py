@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0008_inventario_fragmentos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', 'categoria', 'created_at', 'id'], name='producto_catalogo_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0012_pedido_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_derivados',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
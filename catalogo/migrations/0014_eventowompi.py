@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0013_producto_imagen_derivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoWompi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(max_length=64, unique=True)),
+                ('transaccion_id', models.CharField(max_length=64)),
+                ('referencia', models.CharField(max_length=64)),
+                ('estado', models.CharField(max_length=20)),
+                ('recibido_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
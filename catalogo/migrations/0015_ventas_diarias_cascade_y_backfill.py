@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:37
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def reconstruir_resumen(apps, schema_editor):
+    """
+    Llena el resumen diario con los pedidos existentes (0010 creó las tablas
+    vacías). Misma agregación que ventas.recalcular_ventas, con los modelos
+    históricos.
+    """
+    Pedido = apps.get_model('catalogo', 'Pedido')
+    DetallePedido = apps.get_model('catalogo', 'DetallePedido')
+    VentaDiaria = apps.get_model('catalogo', 'VentaDiaria')
+    VentaDiariaProducto = apps.get_model('catalogo', 'VentaDiariaProducto')
+    zona = ZoneInfo('America/Bogota')
+    cancelados = Q(estado='cancelado')
+
+    VentaDiaria.objects.all().delete()
+    VentaDiariaProducto.objects.all().delete()
+
+    por_dia = (
+        Pedido.objects
+        .annotate(dia=TruncDate('creado_en', tzinfo=zona))
+        .values('dia')
+        .annotate(
+            ventas=Sum('total'),
+            cantidad=Count('id'),
+            ventas_canceladas=Sum('total', filter=cancelados),
+            cantidad_cancelados=Count('id', filter=cancelados),
+        )
+        .order_by()
+    )
+    VentaDiaria.objects.bulk_create(
+        [
+            VentaDiaria(
+                fecha=fila['dia'],
+                total=fila['ventas'] or 0,
+                pedidos=fila['cantidad'],
+                total_cancelado=fila['ventas_canceladas'] or 0,
+                pedidos_cancelados=fila['cantidad_cancelados'],
+            )
+            for fila in por_dia
+        ],
+        batch_size=1000,
+    )
+
+    por_producto = (
+        DetallePedido.objects
+        .annotate(dia=TruncDate('pedido__creado_en', tzinfo=zona))
+        .values('dia', 'producto_id')
+        .annotate(vendidas=Sum('cantidad'), ventas=Sum('subtotal'))
+        .order_by()
+    )
+    VentaDiariaProducto.objects.bulk_create(
+        [
+            VentaDiariaProducto(
+                fecha=fila['dia'], producto_id=fila['producto_id'], unidades=fila['vendidas'], total=fila['ventas']
+            )
+            for fila in por_producto
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0014_eventowompi'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ventadiariaproducto',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalogo.producto'),
+        ),
+        migrations.RunPython(reconstruir_resumen, migrations.RunPython.noop),
+    ]
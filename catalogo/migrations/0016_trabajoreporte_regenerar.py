@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0015_ventas_diarias_cascade_y_backfill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='regenerar',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Sum
+from django.utils.functional import cached_property
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100)
@@ -14,19 +16,51 @@ class Producto(models.Model):
     descripcion = models.TextField()
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     imagen = models.ImageField(upload_to='productos/')
+    # True cuando ya existen las miniaturas WebP/JPEG de la imagen actual
+    imagen_derivados = models.BooleanField(default=False, editable=False)
     disponible = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Catálogo público: disponible=True, filtro por categoría y
+            # paginación por cursor sobre (categoria, created_at, id)
+            models.Index(fields=['disponible', 'categoria', 'created_at', 'id'], name='producto_catalogo_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
 class Inventario(models.Model):
     producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='inventario')
     cantidad = models.PositiveIntegerField(default=0)
+    # 0 = stock en esta fila; K > 0 = stock repartido en K fragmentos (productos en promoción)
+    num_fragmentos = models.PositiveSmallIntegerField(default=0)
+
+    @cached_property
+    def disponible(self):
+        """Cantidad lógica disponible, sumando los fragmentos si los hay"""
+        if not self.num_fragmentos:
+            return self.cantidad
+        return self.fragmentos.aggregate(total=Sum('cantidad'))['total'] or 0
+
+    def __str__(self):
+        return f"{self.producto.nombre} — {self.disponible}"
+
+
+class FragmentoInventario(models.Model):
+    inventario = models.ForeignKey(Inventario, on_delete=models.CASCADE, related_name='fragmentos')
+    indice = models.PositiveSmallIntegerField()
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['inventario', 'indice'], name='fragmento_inventario_unico'),
+        ]
 
     def __str__(self):
-        return f"{self.producto.nombre} — {self.cantidad}"
+        return f"{self.inventario.producto.nombre} [{self.indice}] — {self.cantidad}"
 
 # Create your models here.
 
@@ -36,6 +70,11 @@ class Pedido(models.Model):
         ('cancelado', 'Cancelado'),
         ('entregado', 'Entregado'),
     ]
+    ESTADOS_PAGO = [
+        ('pendiente', 'Pendiente'),
+        ('pagado', 'Pagado'),
+        ('rechazado', 'Rechazado'),
+    ]
 
     nombre_cliente = models.CharField(max_length=100)
     telefono = models.CharField(max_length=20)
@@ -48,6 +87,16 @@ class Pedido(models.Model):
     estado_pago = models.CharField(max_length=20, default="pendiente")  # pendiente, pagado, rechazado
     visto_por_admin = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Rangos de fechas de reportes, exportaciones y listado de pedidos
+            models.Index(fields=['creado_en'], name='pedido_creado_idx'),
+            # Listado de pedidos filtrado por estado / estado de pago
+            models.Index(fields=['estado', 'estado_pago', 'creado_en'], name='pedido_estados_creado_idx'),
+            # Solo los pedidos sin ver (pocos): contador del panel
+            models.Index(fields=['creado_en'], name='pedido_no_visto_idx', condition=models.Q(visto_por_admin=False)),
+        ]
+
     def __str__(self):
         return f"Pedido #{self.id} - {self.nombre_cliente}"
     
@@ -59,4 +108,85 @@ class DetallePedido(models.Model):
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.cantidad} x {self.producto.nombre} en pedido #{self.pedido.id}"
\ No newline at end of file
+        return f"{self.cantidad} x {self.producto.nombre} en pedido #{self.pedido.id}"
+
+
+class VentaDiaria(models.Model):
+    """Totales de ventas por día (hora de Bogotá), mantenidos por las señales de Pedido"""
+    fecha = models.DateField(unique=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pedidos = models.PositiveIntegerField(default=0)
+    total_cancelado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pedidos_cancelados = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha} — {self.pedidos} pedidos"
+
+
+class VentaDiariaProducto(models.Model):
+    """Unidades vendidas por producto y día"""
+    fecha = models.DateField()
+    # Un producto con ventas no se puede borrar (DetallePedido lo protege); si
+    # se borra es porque ya no tiene líneas y sus filas aquí están en cero
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    unidades = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='venta_diaria_producto_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} — {self.unidades} x {self.producto.nombre}"
+
+
+
+class TrabajoReporte(models.Model):
+    """Reporte pedido desde el panel y generado por el worker `procesar_reportes`"""
+    TIPOS = [
+        ('xlsx', 'Excel'),
+        ('pdf', 'PDF'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    archivo = models.FileField(upload_to='reportes/', blank=True)
+    error = models.TextField(blank=True)
+    # Pedido otra vez mientras se generaba: al terminar vuelve a la cola
+    regenerar = models.BooleanField(default=False)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    # También es el latido del worker mientras lo genera
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Un mismo reporte (tipo y rango) se genera una sola vez
+            models.UniqueConstraint(fields=['tipo', 'fecha_inicio', 'fecha_fin'], name='trabajo_reporte_unico'),
+        ]
+
+    def __str__(self):
+        return f"Reporte {self.tipo} {self.fecha_inicio} a {self.fecha_fin} ({self.estado})"
+
+
+class EventoWompi(models.Model):
+    """
+    Evento de Wompi ya procesado. El checksum es el mismo en cada reintento
+    del mismo evento, así un reenvío se reconoce sin volver a tocar el pedido.
+    """
+    checksum = models.CharField(max_length=64, unique=True)
+    transaccion_id = models.CharField(max_length=64)
+    referencia = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20)
+    recibido_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.referencia} {self.estado} ({self.transaccion_id})"
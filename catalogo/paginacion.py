@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+from django.db.models import Q
+
+# Paginación por cursor (keyset): en vez de OFFSET se filtra por la última
+# fila mostrada, así el costo de cada página no crece con el número de página.
+# El cursor son los valores de las columnas de orden separados por puntos;
+# las fechas se guardan en microsegundos UTC.
+
+
+def codificar_cursor(valores):
+    partes = []
+    for valor in valores:
+        if isinstance(valor, datetime):
+            valor = int(valor.timestamp()) * 1_000_000 + valor.microsecond
+        partes.append(str(valor))
+    return ".".join(partes)
+
+
+def decodificar_cursor(cursor, tipos):
+    """Retorna los valores del cursor, o None si el cursor no es válido"""
+    try:
+        partes = [int(parte) for parte in cursor.split(".")]
+    except (AttributeError, ValueError):
+        return None
+    if len(partes) != len(tipos):
+        return None
+
+    valores = []
+    for parte, tipo in zip(partes, tipos):
+        if tipo is datetime:
+            segundos, microsegundos = divmod(parte, 1_000_000)
+            try:
+                parte = datetime.fromtimestamp(segundos, tz=timezone.utc).replace(microsecond=microsegundos)
+            except (OverflowError, OSError, ValueError):
+                return None
+        valores.append(parte)
+    return valores
+
+
+def filtro_despues(campos, valores, descendente=False):
+    """(a, b, c) > (x, y, z) expresado como Q, compatible con cualquier motor"""
+    comparacion = "lt" if descendente else "gt"
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(campos, valores):
+        condicion |= Q(**iguales, **{f"{campo}__{comparacion}": valor})
+        iguales[campo] = valor
+    return condicion
+
+
+def _pagina(queryset, campos, valores, por_pagina, descendente):
+    if valores:
+        queryset = queryset.filter(filtro_despues(campos, valores, descendente))
+    orden = [f"-{campo}" if descendente else campo for campo in campos]
+    # Una fila de más indica si hay página siguiente
+    return queryset.order_by(*orden)[:por_pagina + 1]
+
+
+def _cortar(filas, campos, por_pagina):
+    siguiente = None
+    if len(filas) > por_pagina:
+        filas = filas[:por_pagina]
+        siguiente = codificar_cursor([getattr(filas[-1], campo) for campo in campos])
+    return filas, siguiente
+
+
+def paginar(queryset, campos, valores, por_pagina, descendente=False):
+    """
+    Retorna (filas, cursor_siguiente). `valores` es el cursor ya decodificado
+    de la página anterior (o None para la primera página).
+    """
+    filas = list(_pagina(queryset, campos, valores, por_pagina, descendente))
+    return _cortar(filas, campos, por_pagina)
+
+
+async def apaginar(queryset, campos, valores, por_pagina, descendente=False):
+    """paginar() para vistas asíncronas"""
+    filas = [fila async for fila in _pagina(queryset, campos, valores, por_pagina, descendente)]
+    return _cortar(filas, campos, por_pagina)
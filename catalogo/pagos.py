@@ -0,0 +1,127 @@
+import hashlib
+import hmac
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import EventoWompi, Pedido
+
+logger = logging.getLogger(__name__)
+
+# Eventos de Wompi: POST servidor a servidor con el estado de la transacción.
+# signature.properties lista los campos firmados (rutas dentro de `data`) y
+# el checksum es SHA256(valores + timestamp + secreto de eventos).
+# Wompi reintenta la entrega si no recibe 200, así que el mismo evento puede
+# llegar varias veces: se registra en EventoWompi y los repetidos se ignoran.
+
+ESTADOS_WOMPI = {
+    "APPROVED": "pagado",
+    "DECLINED": "rechazado",
+    "VOIDED": "rechazado",
+    "ERROR": "rechazado",
+}
+
+# Los pedidos se cobran en pesos: un pago en otra moneda o por otro monto
+# no corresponde al pedido, aunque Wompi lo apruebe
+MONEDA = "COP"
+
+PROCESADO = "procesado"
+DUPLICADO = "duplicado"
+IGNORADO = "ignorado"
+
+
+class EventoInvalido(Exception):
+    """Evento sin los campos esperados o con un checksum que no corresponde"""
+
+
+def _valor(datos, ruta):
+    # Un JSON bien formado puede traer cualquier tipo en estas posiciones
+    if not isinstance(ruta, str):
+        raise EventoInvalido(f"Propiedad firmada inválida: {ruta!r}")
+    for clave in ruta.split("."):
+        if not isinstance(datos, dict) or clave not in datos:
+            raise EventoInvalido(f"Falta la propiedad firmada {ruta}")
+        datos = datos[clave]
+    return datos
+
+
+def calcular_checksum(evento, secreto):
+    valores = "".join(str(_valor(evento["data"], ruta)) for ruta in evento["signature"]["properties"])
+    return hashlib.sha256(f"{valores}{evento['timestamp']}{secreto}".encode()).hexdigest()
+
+
+def verificar_evento(evento):
+    """Retorna el checksum del evento; lanza EventoInvalido si la firma no es válida"""
+    try:
+        esperado = calcular_checksum(evento, settings.WOMPI_EVENTS_SECRET)
+        recibido = str(evento["signature"]["checksum"]).lower()
+    except (KeyError, TypeError) as error:
+        raise EventoInvalido(f"Evento incompleto: {error}") from error
+    if not hmac.compare_digest(esperado, recibido):
+        raise EventoInvalido("Checksum inválido")
+    return esperado
+
+
+def total_pagado(monto_en_centavos, moneda):
+    """Total del pedido que cubre la transacción, o None si no es en MONEDA"""
+    return Decimal(monto_en_centavos) / 100 if moneda == MONEDA else None
+
+
+def procesar_evento(evento):
+    """
+    Aplica un evento ya verificado. El estado de pago se cambia con un solo
+    UPDATE condicional: si el pedido ya tiene ese estado no se escribe nada.
+    Solo se marca pagado si el monto y la moneda coinciden con el pedido.
+    """
+    checksum = verificar_evento(evento)
+    if evento.get("event") != "transaction.updated":
+        return IGNORADO
+
+    try:
+        transaccion = evento["data"]["transaction"]
+        referencia = str(transaccion["reference"])
+        estado = str(transaccion["status"])
+        transaccion_id = str(transaccion["id"])
+        monto = transaccion["amount_in_cents"]
+        moneda = str(transaccion["currency"])
+        if type(monto) is not int:
+            raise TypeError(f"amount_in_cents={monto!r}")
+    except (KeyError, TypeError) as error:
+        raise EventoInvalido(f"Transacción incompleta: {error}") from error
+
+    try:
+        with transaction.atomic():
+            # La restricción única del checksum detecta los reenvíos, también
+            # cuando dos entregas del mismo evento llegan a la vez
+            EventoWompi.objects.create(
+                checksum=checksum, transaccion_id=transaccion_id, referencia=referencia, estado=estado,
+            )
+            estado_pago = ESTADOS_WOMPI.get(estado)
+            pedido_id = referencia.removeprefix("PEDIDO")
+            # PENDING no hace retroceder un pago ya resuelto
+            if estado_pago is None or not pedido_id.isdigit():
+                return PROCESADO
+            pedidos = Pedido.objects.filter(id=pedido_id).exclude(estado_pago=estado_pago)
+            if estado_pago == "pagado":
+                # Un pago parcial o en otra moneda deja el pedido pendiente
+                total = total_pagado(monto, moneda)
+                pedidos = pedidos.filter(total=total) if total is not None else pedidos.none()
+            else:
+                # Un pago aprobado es definitivo: un DECLINED/VOIDED tardío o
+                # repetido no lo revierte (igual que en conciliacion.py)
+                pedidos = pedidos.exclude(estado_pago="pagado")
+            actualizados = pedidos.update(estado_pago=estado_pago, actualizado_en=timezone.now())
+    except IntegrityError:
+        return DUPLICADO
+
+    if actualizados:
+        logger.info("Pedido %s: pago %s (transacción %s)", pedido_id, estado_pago, transaccion_id)
+    elif estado_pago == "pagado" and Pedido.objects.filter(id=pedido_id).exclude(estado_pago="pagado").exists():
+        logger.warning(
+            "Pedido %s: transacción %s aprobada por %s centavos %s no coincide con el total; sigue sin pagar",
+            pedido_id, transaccion_id, monto, moneda,
+        )
+    return PROCESADO
@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache_catalogo import cache_compartida, invalidar_stock
+from .inventario import descontar_stock, StockInsuficiente
+from .models import Pedido, DetallePedido
+from .ventas import registrar_pedido
+
+
+def crear_pedido(items, total, **datos):
+    """
+    Crea el pedido y sus detalles descontando el inventario en una sola transacción.
+    Si algún producto no tiene stock se lanza StockInsuficiente y no queda nada guardado.
+    """
+    # Orden determinista para que dos checkouts concurrentes bloqueen
+    # las filas de inventario siempre en el mismo orden (sin deadlocks)
+    lineas = sorted(items, key=lambda item: item["producto"].id)
+
+    # Validación previa con el inventario ya cargado por el carrito
+    for item in lineas:
+        producto = item["producto"]
+        if hasattr(producto, "inventario") and producto.inventario.disponible < item["cantidad"]:
+            raise StockInsuficiente(producto, producto.inventario.disponible)
+
+    with transaction.atomic():
+        for item in lineas:
+            # Productos sin inventario configurado no controlan stock
+            if hasattr(item["producto"], "inventario"):
+                descontar_stock(item["producto"], item["cantidad"])
+
+        pedido = Pedido(total=total, **datos)
+        pedido._resumen_al_final = True
+        pedido.save()
+
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido,
+                producto=item["producto"],
+                cantidad=item["cantidad"],
+                precio_unitario=item["producto"].precio,
+                subtotal=item["subtotal"],
+            )
+            for item in items
+        ])
+
+        # El resumen de ventas se actualiza en la misma transacción, como
+        # última escritura: la fila del día la comparten todos los checkouts
+        registrar_pedido(pedido, lineas)
+
+        # El contador del panel y la versión del stock (ETag del catálogo)
+        # solo cambian si el pedido realmente se guarda
+        transaction.on_commit(sumar_pedido_no_visto)
+        transaction.on_commit(invalidar_stock)
+
+    return pedido
+
+
+# =====================
+# CONTADOR DE PEDIDOS NO VISTOS
+# =====================
+# Lo muestra el menú del panel en cada página; se guarda en caché para no
+# contar en la base de datos en cada render. Expira cada cierto tiempo para
+# corregir cualquier desfase (p. ej. pedidos creados desde el admin de Django).
+# Solo con un cache compartido (CACHE_DIR): con uno por proceso cada worker
+# mostraría su propia cuenta, así que se cuenta siempre en la BD (el índice
+# parcial pedido_no_visto_idx solo recorre los pedidos sin ver).
+CLAVE_NO_VISTOS = "pedidos:no_vistos"
+DURACION_NO_VISTOS = 600
+
+
+def pedidos_no_vistos():
+    if not cache_compartida():
+        return Pedido.objects.filter(visto_por_admin=False).count()
+    valor = cache.get(CLAVE_NO_VISTOS)
+    if valor is None:
+        valor = Pedido.objects.filter(visto_por_admin=False).count()
+        cache.add(CLAVE_NO_VISTOS, valor, DURACION_NO_VISTOS)
+    return valor
+
+
+def sumar_pedido_no_visto():
+    if not cache_compartida():
+        return
+    try:
+        cache.incr(CLAVE_NO_VISTOS)
+    except ValueError:
+        # Sin valor en caché: la próxima lectura lo cuenta desde la base de datos
+        pass
+
+
+def descontar_pedidos_vistos(cantidad):
+    if not cache_compartida():
+        return
+    try:
+        if cache.decr(CLAVE_NO_VISTOS, cantidad) < 0:
+            # Desfasado respecto a la BD: se recuenta en la próxima lectura
+            cache.delete(CLAVE_NO_VISTOS)
+    except ValueError:
+        pass
@@ -0,0 +1,92 @@
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+# Perfilador por muestreo: de cada petición muestreada se guarda el tiempo
+# total, el número y tiempo de consultas SQL y las consultas más lentas.
+# Las muestras viven en memoria de cada worker, en un buffer circular de
+# tamaño fijo (las más viejas se descartan), así el costo es acotado.
+
+LARGO_SQL = 300
+
+_candado = threading.Lock()
+_muestras = deque(maxlen=getattr(settings, "PERFILADOR_CAPACIDAD", 1000))
+
+
+class MedidorSQL:
+    """execute_wrapper que cuenta y cronometra las consultas de una petición"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.ms_sql = 0.0
+        self.tiempos = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+            self.ms_sql += ms
+            self.tiempos.append((ms, sql))
+
+    def mas_lentas(self, cantidad):
+        return [(ms, sql[:LARGO_SQL]) for ms, sql in sorted(self.tiempos, key=lambda t: t[0], reverse=True)[:cantidad]]
+
+
+def registrar(vista, metodo, ms, medidor):
+    muestra = {
+        "vista": vista,
+        "metodo": metodo,
+        "ms": ms,
+        "consultas": medidor.consultas,
+        "ms_sql": medidor.ms_sql,
+        "lentas": medidor.mas_lentas(getattr(settings, "PERFILADOR_CONSULTAS_LENTAS", 3)),
+    }
+    with _candado:
+        _muestras.append(muestra)
+
+
+def limpiar():
+    with _candado:
+        _muestras.clear()
+
+
+def _percentil(valores, p):
+    """Percentil por el método del rango más cercano; `valores` ordenados"""
+    return valores[max(math.ceil(p / 100 * len(valores)) - 1, 0)]
+
+
+def resumen():
+    """Estadísticas por vista, de la más lenta a la más rápida según su p95"""
+    with _candado:
+        muestras = list(_muestras)
+
+    por_vista = {}
+    for muestra in muestras:
+        por_vista.setdefault((muestra["metodo"], muestra["vista"]), []).append(muestra)
+
+    filas = []
+    for (metodo, vista), grupo in por_vista.items():
+        tiempos = sorted(muestra["ms"] for muestra in grupo)
+        lentas = sorted(
+            (consulta for muestra in grupo for consulta in muestra["lentas"]),
+            key=lambda consulta: consulta[0], reverse=True,
+        )
+        filas.append({
+            "metodo": metodo,
+            "vista": vista,
+            "muestras": len(grupo),
+            "p50": _percentil(tiempos, 50),
+            "p95": _percentil(tiempos, 95),
+            "maximo": tiempos[-1],
+            "consultas": sum(muestra["consultas"] for muestra in grupo) / len(grupo),
+            "ms_sql": sum(muestra["ms_sql"] for muestra in grupo) / len(grupo),
+            "lentas": lentas[:3],
+        })
+    filas.sort(key=lambda fila: fila["p95"], reverse=True)
+    return filas
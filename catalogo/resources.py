@@ -1,40 +1,92 @@
+from importlib.util import find_spec
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce, NullIf
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
+from tablib.formats import load_format_class, registry
 from .models import Pedido, DetallePedido, Producto, Categoria
 
 
+# =====================
+# FORMATOS DE TABLIB SIN IMPORTAR SUS LIBRERÍAS AL ARRANCAR
+# =====================
+# Al importarse, import_export.admin revisa qué formatos están disponibles
+# cargando la clase de cada uno, y la de xlsx importa openpyxl (y la de yaml,
+# PyYAML) en cada worker aunque nadie exporte. Registrados como FormatoDiferido
+# la clase real se carga la primera vez que se importa o exporta con ellos.
+FORMATOS_DIFERIDOS = {
+    # clave de tablib: (módulo que necesita, clase del formato)
+    'xlsx': ('openpyxl', 'tablib.formats._xlsx.XLSXFormat'),
+    'yaml': ('yaml', 'tablib.formats._yaml.YAMLFormat'),
+}
+
+
+class FormatoDiferido:
+    def __init__(self, clave, ruta):
+        self.title = clave
+        self.ruta = ruta
+
+    def __getattr__(self, nombre):
+        return getattr(load_format_class(self.ruta), nombre)
+
+
+def diferir_formatos_pesados():
+    """Llamar antes de importar import_export.admin (ver catalogo/admin.py)"""
+    for clave, (modulo, ruta) in FORMATOS_DIFERIDOS.items():
+        # Igual que tablib: solo si la librería está instalada. Volver a
+        # registrar la clave conserva su orden (xlsx antes que xls al detectar)
+        if find_spec(modulo):
+            registry.register(clave, FormatoDiferido(clave, ruta))
+
+
 class PedidoResource(resources.ModelResource):
-    total_items = fields.Field()
-    promedio_item = fields.Field()
+    total_items = fields.Field(column_name='total_items')
+    promedio_item = fields.Field(column_name='promedio_item')
 
     class Meta:
         model = Pedido
+        # Se recorre el queryset por lotes en vez de cargarlo completo
+        chunk_size = 2000
         fields = (
             'id',
             'nombre_cliente',
             'telefono',
             'direccion',
-            'fecha',
+            'creado_en',
             'total',
+            'total_items',
+            'promedio_item',
         )
         export_order = (
             'id',
             'nombre_cliente',
             'telefono',
             'direccion',
-            'fecha',
+            'creado_en',
             'total',
             'total_items',
             'promedio_item',
         )
 
+    def filter_export(self, queryset, **kwargs):
+        # Unidades y promedio se calculan en la misma consulta del export,
+        # sin consultar los detalles de cada pedido
+        return queryset.annotate(
+            unidades=Coalesce(Sum('detalles__cantidad'), 0),
+        ).annotate(
+            promedio=ExpressionWrapper(
+                F('total') / NullIf(F('unidades'), 0),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
     # Total de unidades por pedido
     def dehydrate_total_items(self, pedido):
-        return sum(detalle.cantidad for detalle in pedido.detalles.all())
+        return pedido.unidades
 
     # Valor promedio por item = total / total_items
     def dehydrate_promedio_item(self, pedido):
-        total_items = sum(detalle.cantidad for detalle in pedido.detalles.all())
-        if total_items == 0:
+        if pedido.promedio is None:
             return 0
-        return round(pedido.total / total_items, 2)
+        return round(pedido.promedio, 2)
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache_catalogo import invalidar_catalogo
+from .imagenes import borrar_derivados_sin_uso, procesar_producto
+from .models import Categoria, Producto, Inventario, Pedido, DetallePedido
+from .ventas import ajustar_detalle, ajustar_pedido
+
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Categoria)
+@receiver([post_save, post_delete], sender=Inventario)
+def catalogo_modificado(sender, **kwargs):
+    # Cualquier cambio en el catálogo invalida los fragmentos cacheados
+    invalidar_catalogo()
+
+
+@receiver(pre_save, sender=Producto)
+def imagen_cambiada(sender, instance, raw=False, **kwargs):
+    # Una imagen nueva necesita sus propias miniaturas; las de la anterior
+    # sobran (se borran al confirmar, si otro producto no la usa)
+    if raw or not instance.pk or not instance.imagen_derivados:
+        return
+    anterior = Producto.objects.filter(pk=instance.pk).values_list('imagen', flat=True).first()
+    if anterior != instance.imagen.name:
+        instance.imagen_derivados = False
+        if anterior:
+            transaction.on_commit(lambda: borrar_derivados_sin_uso(anterior, instance.imagen.storage))
+
+
+@receiver(post_save, sender=Producto)
+def generar_miniaturas(sender, instance, raw=False, **kwargs):
+    if raw or not instance.imagen or instance.imagen_derivados:
+        return
+    procesar_producto(instance)
+
+
+@receiver(post_delete, sender=Producto)
+def miniaturas_sin_producto(sender, instance, **kwargs):
+    if instance.imagen_derivados and instance.imagen:
+        nombre = instance.imagen.name
+        transaction.on_commit(lambda: borrar_derivados_sin_uso(nombre, instance.imagen.storage))
+
+
+# Resumen diario de ventas: cualquier alta, cambio o borrado de pedidos y
+# líneas (panel, admin de Django, importaciones) ajusta sus totales. Los
+# valores anteriores se leen en pre_save para aplicar solo la diferencia.
+def _afecta_resumen(update_fields, campos):
+    return update_fields is None or bool(campos & set(update_fields))
+
+
+@receiver(pre_save, sender=Pedido)
+def pedido_antes_de_guardar(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.pk or not _afecta_resumen(update_fields, {'estado', 'total'}):
+        return
+    instance._venta_anterior = Pedido.objects.filter(pk=instance.pk).values_list('estado', 'total').first()
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_guardado(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not (created or _afecta_resumen(update_fields, {'estado', 'total'})):
+        return
+    if created and getattr(instance, '_resumen_al_final', False):
+        # El checkout lo suma con registrar_pedido al cerrar la transacción
+        return
+    anterior = None if created else instance.__dict__.pop('_venta_anterior', None)
+    ajustar_pedido(instance, anterior, (instance.estado, instance.total))
+
+
+@receiver(post_delete, sender=Pedido)
+def pedido_borrado(sender, instance, **kwargs):
+    ajustar_pedido(instance, (instance.estado, instance.total), None)
+
+
+@receiver(pre_save, sender=DetallePedido)
+def detalle_antes_de_guardar(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    instance._venta_anterior = (
+        DetallePedido.objects.filter(pk=instance.pk).values_list('producto_id', 'cantidad', 'subtotal').first()
+    )
+
+
+@receiver(post_save, sender=DetallePedido)
+def detalle_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = None if created else instance.__dict__.pop('_venta_anterior', None)
+    ajustar_detalle(instance.pedido, anterior, (instance.producto_id, instance.cantidad, instance.subtotal))
+
+
+@receiver(pre_delete, sender=DetallePedido)
+def detalle_borrado(sender, instance, **kwargs):
+    # En pre_delete: si se borra todo el pedido, aún existe para leer su fecha
+    ajustar_detalle(instance.pedido, (instance.producto_id, instance.cantidad, instance.subtotal), None)
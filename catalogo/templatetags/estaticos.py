@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from catalogo.estaticos import css_critico as extraer_css_critico
+
+register = template.Library()
+
+
+@register.simple_tag
+def css_critico(nombre):
+    """<style> con las reglas críticas de un CSS estático (se extraen una vez por proceso)"""
+    return mark_safe(f"<style>{extraer_css_critico(nombre)}</style>")
@@ -0,0 +1,19 @@
+from django import template
+
+from catalogo.imagenes import srcset
+
+register = template.Library()
+
+
+@register.inclusion_tag('catalogo/fragmentos/imagen_producto.html')
+def imagen_producto(producto, tamanos="100vw", clase=""):
+    """
+    <picture> con las miniaturas WebP y JPEG del producto; el navegador elige
+    el ancho según `tamanos` (atributo sizes). Sin miniaturas usa el original.
+    """
+    imagen = producto.imagen
+    contexto = {'producto': producto, 'tamanos': tamanos, 'clase': clase}
+    if imagen and producto.imagen_derivados:
+        contexto['srcset_webp'] = srcset(imagen, 'webp')
+        contexto['srcset_jpg'] = srcset(imagen, 'jpg')
+    return contexto
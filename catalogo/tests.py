@@ -1,3 +1,1841 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import brotli
+import openpyxl
+from PIL import Image
+
+from django.apps import apps as django_apps
+from django.contrib.admin import site as admin_site
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.template.loader import get_template
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.urls import include, path, resolve, reverse
+
+from django.contrib.auth.models import User
+
+from .admin import PedidoAdmin
+from .cart import Cart, get_cart
+from . import pagos, perfilador, trabajos, views_async
+from .arranque import diferidos_cargados, medir_arranque, plantillas_del_proyecto
+from .conciliacion import aplicar_estados
+from .fechas import rango_fechas
+from .imagenes import nombre_derivado
+from .pedidos import CLAVE_NO_VISTOS, crear_pedido, pedidos_no_vistos
+from .inventario import descontar_stock, establecer_stock, StockInsuficiente
+from .models import (
+    Categoria, Producto, Inventario, Pedido, DetallePedido, VentaDiaria, VentaDiariaProducto,
+    TrabajoReporte, EventoWompi,
+)
+from .resources import PedidoResource
+from .urls import rutas_tienda
+from .ventas import recalcular_ventas
+
+
+def crear_producto(categoria, nombre="Cheesecake", precio="25000", cantidad=10):
+    producto = Producto.objects.create(
+        categoria=categoria,
+        nombre=nombre,
+        descripcion="Tarta de queso artesanal",
+        precio=Decimal(precio),
+        imagen="productos/test.jpg",
+    )
+    Inventario.objects.create(producto=producto, cantidad=cantidad)
+    return producto
+
+
+def usar_cache_compartida(test):
+    """Cache en disco, compartida entre procesos como con CACHE_DIR, durante la prueba"""
+    directorio = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directorio)
+    ajustes = override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": directorio,
+    }})
+    ajustes.enable()
+    test.addCleanup(ajustes.disable)
+
+
+class CartTests(TestCase):
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre="Tartas")
+        self.productos = [
+            crear_producto(self.categoria, nombre=f"Tarta {i}") for i in range(15)
+        ]
+        self.request = RequestFactory().get("/")
+        self.request.session = SessionStore()
+
+    def test_get_items_usa_una_sola_consulta(self):
+        cart = Cart(self.request)
+        for producto in self.productos:
+            cart.add(producto, cantidad=2)
+
+        with self.assertNumQueries(1):
+            items, total = cart.get_items()
+            # El inventario y la categoría vienen en la misma consulta
+            for item in items:
+                item["producto"].inventario.cantidad
+                item["producto"].categoria.nombre
+
+        self.assertEqual(len(items), 15)
+        self.assertEqual(total, Decimal("25000") * 2 * 15)
+
+    def test_productos_eliminados_se_descartan(self):
+        cart = Cart(self.request)
+        cart.add(self.productos[0])
+        cart.add(self.productos[1])
+        self.productos[1].delete()
+
+        items, total = cart.get_items()
+
+        self.assertEqual([item["producto"] for item in items], [self.productos[0]])
+        self.assertNotIn(str(self.productos[1].id), self.request.session["cart"])
+        self.assertEqual(cart.count(), 1)
+
+    def test_get_cart_memoiza_por_request(self):
+        self.assertIs(get_cart(self.request), get_cart(self.request))
+
+    def test_leer_no_modifica_la_sesion(self):
+        cart = Cart(self.request)
+        self.assertEqual(cart.count(), 0)
+        self.assertEqual(cart.get_items(), ([], Decimal("0.00")))
+        cart.clear()
+        self.assertFalse(self.request.session.modified)
+
+        cart.add(self.productos[0])
+        self.assertTrue(self.request.session.modified)
+
+    def test_visitante_anonimo_no_crea_sesion(self):
+        response = self.client.get(reverse("lista_productos"))
+        response = self.client.get(reverse("detalle_producto", args=[self.productos[0].id]))
+
+        self.assertNotIn("sessionid", response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+        self.client.get(reverse("agregar_al_carrito", args=[self.productos[0].id]))
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class ApiCarritoTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Tartas")
+        self.productos = [crear_producto(categoria, nombre=f"Tarta {i}") for i in range(5)]
+        for producto in self.productos:
+            self.client.get(reverse("agregar_al_carrito", args=[producto.id]))
+
+    def actualizar(self, cambios):
+        return self.client.post(
+            reverse("api_carrito_actualizar"), json.dumps(cambios), content_type="application/json",
+        )
+
+    def test_lote_de_cambios_en_una_peticion(self):
+        cambios = {self.productos[0].id: 3, self.productos[1].id: 0, self.productos[2].id: 2}
+        # Sesión, productos del lote, resto del carrito y guardado de la sesión (3 con el savepoint)
+        with self.assertNumQueries(6):
+            response = self.actualizar(cambios)
+
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        cantidades = {item["producto_id"]: item["cantidad"] for item in datos["items"]}
+        self.assertEqual(cantidades, {
+            self.productos[0].id: 3, self.productos[2].id: 2,
+            self.productos[3].id: 1, self.productos[4].id: 1,
+        })
+        self.assertEqual(datos["cantidad_items"], 7)
+        self.assertEqual(Decimal(datos["subtotal"]), Decimal("175000"))
+        self.assertEqual(Decimal(datos["envio"]), 0)
+        self.assertEqual(Decimal(datos["faltante_envio"]), 0)
+
+    def test_stock_insuficiente_no_aplica_ningun_cambio(self):
+        response = self.actualizar({self.productos[0].id: 3, self.productos[1].id: 11})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIn(str(self.productos[1].id), response.json()["errores"])
+        cantidades = {item["producto_id"]: item["cantidad"] for item in self.client.get(reverse("api_carrito")).json()["items"]}
+        self.assertEqual(cantidades[self.productos[0].id], 1)
+
+    def test_resumen_con_faltante_de_envio(self):
+        self.actualizar({producto.id: 0 for producto in self.productos[1:]})
+
+        datos = self.client.get(reverse("api_carrito")).json()
+        self.assertEqual(Decimal(datos["subtotal"]), Decimal("25000"))
+        self.assertEqual(Decimal(datos["envio"]), Decimal("11000"))
+        self.assertEqual(Decimal(datos["total"]), Decimal("36000"))
+        self.assertEqual(Decimal(datos["faltante_envio"]), Decimal("35000"))
+        self.assertEqual(datos["items"][0]["disponible"], 10)
+
+    def test_cambios_invalidos(self):
+        self.assertEqual(self.actualizar({self.productos[0].id: -1}).status_code, 400)
+        self.assertEqual(self.actualizar({self.productos[0].id: "2"}).status_code, 400)
+        self.assertEqual(self.actualizar([1, 2]).status_code, 400)
+        self.assertEqual(self.actualizar({99999: 1}).status_code, 404)
+        self.assertEqual(self.client.get(reverse("api_carrito_actualizar")).status_code, 405)
+
+    def test_carrito_trata_agotado_y_sin_inventario_igual(self):
+        Inventario.objects.filter(producto=self.productos[0]).update(cantidad=0)
+        self.productos[1].inventario.delete()
+
+        response = self.client.get(reverse("ver_carrito"))
+
+        # 0 bloquea el botón "+" en el navegador
+        self.assertContains(response, f'data-producto="{self.productos[0].id}" data-cantidad="1" data-disponible="0"')
+        self.assertContains(response, f'data-producto="{self.productos[1].id}" data-cantidad="1" data-disponible="0"')
+
+    def test_sin_inventario_misma_regla_en_la_api_y_en_incrementar(self):
+        sin_inventario = self.productos[1]
+        sin_inventario.inventario.delete()
+
+        response = self.actualizar({sin_inventario.id: 2})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["errores"][str(sin_inventario.id)], "Solo quedan 0 unidades de Tarta 1.")
+
+        self.client.get(reverse("incrementar_cantidad", args=[sin_inventario.id]))
+        datos = self.client.get(reverse("api_carrito")).json()
+        item = [item for item in datos["items"] if item["producto_id"] == sin_inventario.id][0]
+        self.assertEqual((item["cantidad"], item["disponible"]), (1, 0))
+        self.assertEqual(self.client.session["error"], "Solo quedan 0 unidades de Tarta 1.")
+
+
+@override_settings(CARRITO_ALMACENAMIENTO="cookie")
+class CarritoCookieTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Tartas")
+        self.producto = crear_producto(categoria)
+        self.otro = crear_producto(categoria, nombre="Brownie", precio="8000")
+
+    def test_operaciones_sin_sesion_ni_escrituras(self):
+        self.client.get(reverse("agregar_al_carrito", args=[self.producto.id]))
+        self.client.get(reverse("incrementar_cantidad", args=[self.producto.id]))
+        self.client.get(reverse("agregar_al_carrito", args=[self.otro.id]))
+
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn("sessionid", self.client.cookies)
+        # El precio se toma de la BD al leer
+        Producto.objects.filter(id=self.otro.id).update(precio=Decimal("9000"))
+        response = self.client.get(reverse("ver_carrito"))
+        self.assertEqual(response.context["total"], Decimal("59000"))
+
+        self.client.get(reverse("eliminar_item", args=[self.producto.id]))
+        self.client.get(reverse("eliminar_item", args=[self.otro.id]))
+        self.assertEqual(self.client.cookies["carrito"].value, "")
+
+    def test_cookie_alterada_se_ignora(self):
+        self.client.cookies["carrito"] = f"{self.producto.id}:99"
+        response = self.client.get(reverse("ver_carrito"))
+        self.assertEqual(response.context["items"], [])
+
+
+class LimpiarSesionesTests(TestCase):
+
+    def test_borra_solo_vencidas_por_lotes(self):
+        ahora = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"vencida{i}", session_data="", expire_date=ahora - timedelta(days=1)) for i in range(7)]
+            + [Session(session_key="vigente", session_data="", expire_date=ahora + timedelta(days=1))]
+        )
+
+        salida = io.StringIO()
+        call_command("limpiar_sesiones", lote=3, pausa=0, stdout=salida)
+
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["vigente"])
+        self.assertIn("7 sesiones", salida.getvalue())
+
+
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Tartas")
+        self.producto = crear_producto(categoria, cantidad=3)
+        self.otro = crear_producto(categoria, nombre="Brownie", precio="8000", cantidad=1)
+        self.datos = {
+            "nombre": "Ana",
+            "telefono": "3000000000",
+            "direccion": "Calle 1",
+            "metodo_pago": "Efectivo",
+        }
+
+    def agregar(self, producto, veces):
+        for _ in range(veces):
+            self.client.get(reverse("agregar_al_carrito", args=[producto.id]))
+
+    def test_checkout_descuenta_stock_y_crea_detalles(self):
+        self.agregar(self.producto, 2)
+        self.agregar(self.otro, 1)
+
+        response = self.client.post(reverse("checkout"), self.datos)
+
+        pedido = Pedido.objects.get()
+        self.assertRedirects(response, reverse("confirmacion_pedido", args=[pedido.id]))
+        self.assertEqual(pedido.total, Decimal("58000"))
+        self.assertEqual(pedido.detalles.count(), 2)
+        self.assertEqual(Inventario.objects.get(producto=self.producto).cantidad, 1)
+        self.assertEqual(Inventario.objects.get(producto=self.otro).cantidad, 0)
+
+    def test_checkout_suma_al_contador_de_no_vistos(self):
+        usar_cache_compartida(self)
+        self.assertEqual(pedidos_no_vistos(), 0)
+        self.agregar(self.producto, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("checkout"), self.datos)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(pedidos_no_vistos(), 1)
+
+    def test_sin_stock_no_deja_pedido_huerfano(self):
+        self.agregar(self.producto, 1)
+        self.agregar(self.otro, 1)
+        # Otro cliente compra el último brownie antes de confirmar
+        Inventario.objects.filter(producto=self.otro).update(cantidad=0)
+
+        response = self.client.post(reverse("checkout"), self.datos)
+
+        self.assertContains(response, "No hay suficiente stock de Brownie")
+        self.assertFalse(Pedido.objects.exists())
+        self.assertFalse(DetallePedido.objects.exists())
+        self.assertEqual(Inventario.objects.get(producto=self.producto).cantidad, 3)
+
+
+class InventarioFragmentadoTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre="Tartas")
+        self.producto = crear_producto(categoria, cantidad=0)
+        self.inventario = self.producto.inventario
+        establecer_stock(self.inventario, 10, num_fragmentos=4)
+
+    def test_stock_se_reparte_entre_fragmentos(self):
+        cantidades = list(self.inventario.fragmentos.order_by("indice").values_list("cantidad", flat=True))
+        self.assertEqual(cantidades, [3, 3, 2, 2])
+        self.assertEqual(Inventario.objects.get(id=self.inventario.id).disponible, 10)
+
+    def test_usa_la_fila_bloqueada_y_no_la_copia_del_llamador(self):
+        # Otra petición cambió la configuración después de leer el inventario
+        copia = Inventario.objects.get(id=self.inventario.id)
+        Inventario.objects.filter(id=self.inventario.id).update(num_fragmentos=2)
+
+        establecer_stock(copia, 9)
+
+        self.assertEqual(copia.num_fragmentos, 2)
+        self.assertEqual(copia.fragmentos.count(), 2)
+        self.assertEqual(Inventario.objects.get(id=self.inventario.id).disponible, 9)
+
+    def test_descuento_mayor_que_un_fragmento(self):
+        descontar_stock(self.producto, 7)
+        self.assertEqual(Inventario.objects.get(id=self.inventario.id).disponible, 3)
+
+        with self.assertRaises(StockInsuficiente):
+            descontar_stock(self.producto, 4)
+
+    def test_editar_inventario_usa_cantidad_logica(self):
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        self.client.login(username="admin", password="clave")
+
+        response = self.client.get(reverse("editar_inventario", args=[self.producto.id]))
+        self.assertContains(response, 'value="10"')
+
+        self.client.post(reverse("editar_inventario", args=[self.producto.id]), {"cantidad": "21"})
+        inventario = Inventario.objects.get(id=self.inventario.id)
+        self.assertEqual(inventario.disponible, 21)
+        self.assertEqual(inventario.fragmentos.count(), 4)
+
+    def test_listado_del_admin_sin_consultas_por_fila(self):
+        User.objects.create_superuser("admin", password="clave")
+        self.client.login(username="admin", password="clave")
+        categoria = self.producto.categoria
+        url = reverse("admin:catalogo_inventario_changelist")
+
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get(url)
+        for i in range(5):
+            inventario = crear_producto(categoria, nombre=f"Extra {i}", cantidad=0).inventario
+            establecer_stock(inventario, 6, num_fragmentos=2)
+        with CaptureQueriesContext(connection) as muchos:
+            response = self.client.get(url)
+
+        self.assertEqual(len(muchos), len(pocos))
+        self.assertContains(response, '<td class="field-disponible">6</td>', count=5, html=True)
+        self.assertContains(response, '<td class="field-fragmentos_creados">2</td>', count=5, html=True)
+
+
+class CacheCatalogoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nombre="Tartas")
+        self.producto = crear_producto(self.categoria, nombre="Tarta de maracuyá", cantidad=8)
+
+    def test_segunda_visita_no_renderiza_productos(self):
+        self.client.get(reverse("lista_productos"))
+        # Solo queda la consulta del stock en vivo
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("lista_productos"))
+        self.assertContains(response, "Tarta de maracuyá")
+
+    def test_stock_en_vivo_sin_invalidar(self):
+        self.client.get(reverse("detalle_producto", args=[self.producto.id]))
+        # Un UPDATE directo (como el del checkout) no dispara señales
+        Inventario.objects.filter(producto=self.producto).update(cantidad=2)
+
+        response = self.client.get(reverse("detalle_producto", args=[self.producto.id]))
+        self.assertContains(response, "Pocas unidades disponibles (2)")
+
+    def test_guardar_producto_invalida_fragmentos(self):
+        self.client.get(reverse("lista_productos"))
+        self.producto.nombre = "Tarta de arequipe"
+        self.producto.save()
+
+        response = self.client.get(reverse("lista_productos"))
+        self.assertContains(response, "Tarta de arequipe")
+        self.assertNotContains(response, "Tarta de maracuyá")
+
+    def test_detalle_inexistente(self):
+        response = self.client.get(reverse("detalle_producto", args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cache_en_disco(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        backend = {"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": directorio,
+        }}
+        with override_settings(CACHES=backend):
+            self.client.get(reverse("lista_productos"))
+            Inventario.objects.filter(producto=self.producto).update(cantidad=0)
+            response = self.client.get(reverse("lista_productos"))
+        self.assertContains(response, "Agotado")
+
+
+@override_settings(CATALOGO_POR_PAGINA=2)
+class GetCondicionalTests(TestCase):
+
+    def setUp(self):
+        usar_cache_compartida(self)
+        self.producto = crear_producto(Categoria.objects.create(nombre="Tartas"), cantidad=5)
+        self.urls = [reverse("lista_productos"), reverse("detalle_producto", args=[self.producto.id])]
+
+    def test_304_sin_renderizar(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertTrue(response.has_header("Last-Modified"))
+
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertLessEqual(len(consultas), 1)
+
+    def test_compra_y_carrito_cambian_el_etag(self):
+        url = self.urls[0]
+        etag = self.client.get(url)["ETag"]
+
+        self.client.get(reverse("agregar_al_carrito", args=[self.producto.id]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Otro cliente compra: cambia el stock mostrado
+        etag = response["ETag"]
+        otro = self.client_class()
+        otro.get(reverse("agregar_al_carrito", args=[self.producto.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            otro.post(reverse("checkout"), {
+                "nombre": "Ana", "telefono": "300", "direccion": "Calle 1", "metodo_pago": "Efectivo",
+            })
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_producto_inexistente_nunca_es_304(self):
+        url = reverse("detalle_producto", args=[self.producto.id + 1])
+        etag = self.client.get(self.urls[1])["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_sin_cache_compartida_no_hay_validadores(self):
+        # Con LocMemCache cada worker tendría sus propias versiones del catálogo
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            for url in self.urls:
+                response = self.client.get(url)
+                self.assertFalse(response.has_header("ETag"))
+                self.assertFalse(response.has_header("Last-Modified"))
+                response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+                self.assertEqual(response.status_code, 200)
+
+
+class UrlsAsync:
+    """URLconf con las vistas asíncronas de la tienda, como la deja src/asgi.py"""
+    urlpatterns = [*rutas_tienda(views_async), path("", include("src.urls"))]
+
+
+@override_settings(ROOT_URLCONF=UrlsAsync)
+class VistasAsyncTests(TestCase):
+
+    def setUp(self):
+        usar_cache_compartida(self)
+        categoria = Categoria.objects.create(nombre="Tartas")
+        self.producto = crear_producto(categoria, cantidad=5)
+        self.otro = crear_producto(categoria, nombre="Brownie", precio="8000")
+        self.urls = [reverse("lista_productos"), reverse("detalle_producto", args=[self.producto.id])]
+
+    def test_rutas_de_lectura_son_async(self):
+        for url in [*self.urls, reverse("ver_carrito"), reverse("confirmacion_pedido", args=[1])]:
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+
+    async def test_catalogo_igual_que_la_version_sincrona(self):
+        for url in self.urls:
+            asincrona = await self.async_client.get(url)
+            with override_settings(ROOT_URLCONF="src.urls"):
+                sincrona = await sync_to_async(self.client.get)(url)
+            self.assertEqual(asincrona.status_code, 200)
+            self.assertEqual(asincrona.content, sincrona.content)
+            self.assertEqual(asincrona["ETag"], sincrona["ETag"])
+
+        response = await self.async_client.get(reverse("detalle_producto", args=[99999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_304_con_etag(self):
+        response = await self.async_client.get(self.urls[0])
+
+        response = await self.async_client.get(self.urls[0], headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(self.urls[0])
+        inexistente = reverse("detalle_producto", args=[self.otro.id + 1])
+        response = await self.async_client.get(inexistente, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_carrito_y_confirmacion(self):
+        for producto in (self.producto, self.producto, self.otro):
+            await self.async_client.get(reverse("agregar_al_carrito", args=[producto.id]))
+
+        response = await self.async_client.get(reverse("ver_carrito"))
+        self.assertEqual(response.context["total"], Decimal("58000"))
+        self.assertEqual(response.context["faltante_envio"], Decimal("2000"))
+        self.assertContains(response, "Brownie")
+
+        response = await self.async_client.post(reverse("checkout"), {
+            "nombre": "Ana", "telefono": "300", "direccion": "Calle 1", "metodo_pago": "Efectivo",
+        })
+        response = await self.async_client.get(response["Location"])
+        self.assertContains(response, "Gracias por tu compra, Ana")
+        self.assertContains(response, "Cheesecake (x2)")
+
+    @override_settings(CARRITO_ALMACENAMIENTO="cookie")
+    async def test_carrito_en_cookie(self):
+        await self.async_client.get(reverse("agregar_al_carrito", args=[self.otro.id]))
+
+        response = await self.async_client.get(reverse("ver_carrito"))
+        self.assertEqual(response.context["total"], Decimal("8000"))
+
+    async def test_staff_navegando_la_tienda(self):
+        admin = await User.objects.acreate_user("admin", password="clave", is_staff=True)
+        await self.async_client.aforce_login(admin)
+
+        for url in self.urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+
+class CatalogoPaginadoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.tartas = Categoria.objects.create(nombre="Tartas")
+        self.brownies = Categoria.objects.create(nombre="Brownies")
+        for i in range(3):
+            crear_producto(self.tartas, nombre=f"Tarta {i}")
+        crear_producto(self.brownies, nombre="Brownie agotado", cantidad=0)
+        oculto = crear_producto(self.brownies, nombre="Brownie retirado")
+        oculto.disponible = False
+        oculto.save()
+
+    def recorrer(self, **filtros):
+        nombres, parametros = [], dict(filtros)
+        while True:
+            response = self.client.get(reverse("lista_productos"), parametros)
+            nombres += [p for p in ["Tarta 0", "Tarta 1", "Tarta 2", "Brownie agotado"]
+                        if f">{p}</h5>" in response.content.decode()]
+            siguiente = response.content.decode().split("despues=")
+            if len(siguiente) == 1:
+                return nombres
+            parametros["despues"] = siguiente[1].split('"')[0].split("&")[0]
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        self.assertEqual(self.recorrer(), ["Tarta 0", "Tarta 1", "Tarta 2", "Brownie agotado"])
+
+    def test_filtra_por_categoria(self):
+        self.assertEqual(self.recorrer(categoria=self.brownies.id), ["Brownie agotado"])
+
+    def test_oculta_agotados(self):
+        self.assertEqual(self.recorrer(disponibles="1"), ["Tarta 0", "Tarta 1", "Tarta 2"])
+
+    def test_cursor_invalido_muestra_primera_pagina(self):
+        response = self.client.get(reverse("lista_productos"), {"despues": "x.y"})
+        self.assertContains(response, "Tarta 0")
+
+
+def crear_pedido_en(fecha, total):
+    """Pedido con fecha de creación fija (creado_en es auto_now_add)"""
+    pedido = Pedido.objects.create(
+        nombre_cliente="Cliente", telefono="300", direccion="Calle 1", total=Decimal(total)
+    )
+    Pedido.objects.filter(id=pedido.id).update(creado_en=fecha)
+    return pedido
+
+
+class PanelInicioTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        self.client.login(username="admin", password="clave")
+        self.bogota = ZoneInfo("America/Bogota")
+        self.hoy = timezone.localdate(timezone=self.bogota)
+        cache.clear()
+
+    def a_las(self, dia, hora):
+        return datetime(dia.year, dia.month, dia.day, hora, tzinfo=self.bogota)
+
+    def test_series_por_dia_en_hora_de_bogota(self):
+        ayer = self.hoy - timedelta(days=1)
+        # 21:00 en Bogotá ya es el día siguiente en UTC
+        crear_pedido_en(self.a_las(ayer, 21), "30000")
+        crear_pedido_en(self.a_las(ayer, 9), "10000")
+        crear_pedido_en(self.a_las(self.hoy, 8), "5000")
+        recalcular_ventas()
+
+        response = self.client.get(reverse("panel_inicio"))
+
+        self.assertEqual(response.context["labels_7"][-1], self.hoy.strftime("%d/%m"))
+        self.assertEqual(response.context["ventas_7"], [0, 0, 0, 0, 0, 40000.0, 5000.0])
+        # Ayer puede caer en la semana o el mes anterior: entre los dos últimos está todo
+        self.assertEqual(response.context["ventas_30"][-1] + response.context["ventas_30"][-2], 45000.0)
+        self.assertEqual(sum(response.context["ventas_30"]), 45000.0)
+        self.assertEqual(response.context["ventas_6m"][-1] + response.context["ventas_6m"][-2], 45000.0)
+        self.assertEqual(sum(response.context["ventas_6m"]), 45000.0)
+        self.assertEqual(response.context["total_pedidos"], 3)
+
+    def test_numero_de_consultas_fijo(self):
+        for i in range(30):
+            crear_pedido_en(self.a_las(self.hoy - timedelta(days=i * 5), 12), "1000")
+        recalcular_ventas()
+
+        # sesión, usuario, resumen, series, top 5 y contador de nuevos pedidos (caché vacía)
+        with self.assertNumQueries(6):
+            self.client.get(reverse("panel_inicio"))
+
+
+    def test_contador_de_nuevos_pedidos_en_cache(self):
+        usar_cache_compartida(self)
+        crear_pedido_en(timezone.now(), "1000")
+        self.client.get(reverse("panel_inicio"))
+
+        # Con el contador en caché el menú ya no cuenta pedidos:
+        # sesión, usuario, resumen, series y top 5
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("panel_inicio"))
+        self.assertEqual(response.context["nuevos_pedidos"], 1)
+        self.assertContains(response, 'badge bg-danger')
+
+        response = self.client.get(reverse("admin_pedidos"))
+        self.assertEqual(pedidos_no_vistos(), 0)
+        self.assertNotContains(response, 'badge bg-danger')
+
+    def test_contador_sin_cache_compartida_cuenta_en_la_bd(self):
+        # LocMemCache: cada worker tendría su propio contador
+        crear_pedido_en(timezone.now(), "1000")
+        with self.assertNumQueries(1):
+            self.assertEqual(pedidos_no_vistos(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_pedido(
+                [], Decimal("0"), nombre_cliente="Ana", telefono="300", direccion="Calle 1", metodo_pago="Efectivo",
+            )
+        self.assertIsNone(cache.get(CLAVE_NO_VISTOS))
+        self.assertEqual(pedidos_no_vistos(), 2)
+
+
+@override_settings(PANEL_PEDIDOS_POR_PAGINA=2)
+class AdminPedidosTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        self.client.login(username="admin", password="clave")
+        usar_cache_compartida(self)
+        ahora = timezone.now()
+        self.pedidos = [crear_pedido_en(ahora - timedelta(hours=i), "1000") for i in range(5)]
+        Pedido.objects.filter(id__in=[self.pedidos[0].id, self.pedidos[1].id]).update(estado_pago="pagado")
+        Pedido.objects.filter(id=self.pedidos[4].id).update(estado="cancelado")
+
+    def test_pagina_y_marca_vistos_solo_los_mostrados(self):
+        self.assertEqual(pedidos_no_vistos(), 5)
+        response = self.client.get(reverse("admin_pedidos"))
+
+        self.assertEqual([p.id for p in response.context["pedidos"]], [p.id for p in self.pedidos[:2]])
+        self.assertEqual(Pedido.objects.filter(visto_por_admin=False).count(), 3)
+        self.assertEqual(pedidos_no_vistos(), 3)
+
+        response = self.client.get(reverse("admin_pedidos") + "?" + response.context["filtros_siguiente"])
+        self.assertEqual([p.id for p in response.context["pedidos"]], [p.id for p in self.pedidos[2:4]])
+
+    def test_conteos_por_estado_respetan_el_otro_filtro(self):
+        response = self.client.get(reverse("admin_pedidos"), {"estado_pago": "pendiente"})
+
+        estados = {f["nombre"]: f["cantidad"] for f in response.context["facetas_estado"]}
+        pagos = {f["nombre"]: f["cantidad"] for f in response.context["facetas_pago"]}
+        self.assertEqual(estados, {"Todos": 3, "Pendiente": 2, "Cancelado": 1, "Entregado": 0})
+        self.assertEqual(pagos, {"Todos": 5, "Pendiente": 3, "Pagado": 2, "Rechazado": 0})
+
+    def test_consultas_no_crecen_con_los_pedidos(self):
+        self.client.get(reverse("admin_pedidos"))
+        for _ in range(20):
+            crear_pedido_en(timezone.now() - timedelta(days=2), "1000")
+        Pedido.objects.update(visto_por_admin=True)
+
+        # sesión, usuario, conteos y página
+        with self.assertNumQueries(4):
+            self.client.get(reverse("admin_pedidos"))
+
+
+class VentaDiariaTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        categoria = Categoria.objects.create(nombre="Tartas")
+        self.producto = crear_producto(categoria, cantidad=20)
+        self.datos = {"nombre": "Ana", "telefono": "300", "direccion": "Calle 1", "metodo_pago": "Efectivo"}
+
+    def comprar(self, unidades):
+        for _ in range(unidades):
+            self.client.get(reverse("agregar_al_carrito", args=[self.producto.id]))
+        self.client.post(reverse("checkout"), self.datos)
+        return Pedido.objects.latest("id")
+
+    def test_checkout_y_cambio_de_estado_actualizan_resumen(self):
+        self.comprar(2)
+        pedido = self.comprar(3)
+
+        dia = VentaDiaria.objects.get()
+        self.assertEqual((dia.pedidos, dia.total), (2, Decimal("125000")))
+        self.assertEqual(VentaDiariaProducto.objects.get().unidades, 5)
+
+        self.client.login(username="admin", password="clave")
+        self.client.post(reverse("admin_detalle_pedido", args=[pedido.id]), {"estado": "cancelado"})
+        dia.refresh_from_db()
+        self.assertEqual((dia.pedidos_cancelados, dia.total_cancelado), (1, Decimal("75000")))
+
+    def test_checkout_escribe_la_fila_del_dia_al_final(self):
+        # La fila del día la comparten todos los checkouts: se bloquea lo más
+        # tarde posible, después del inventario, el pedido y sus líneas
+        for _ in range(2):
+            self.client.get(reverse("agregar_al_carrito", args=[self.producto.id]))
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse("checkout"), self.datos)
+
+        escrituras = [
+            c["sql"] for c in consultas.captured_queries
+            if c["sql"].startswith(("INSERT", "UPDATE", "DELETE")) and "django_session" not in c["sql"]
+        ]
+        self.assertIn('"catalogo_ventadiaria"', escrituras[-1])
+        self.assertEqual(sum('"catalogo_ventadiaria"' in sql for sql in escrituras), 2)
+        self.assertEqual(VentaDiaria.objects.get().pedidos, 1)
+
+    def test_recalcular_coincide_con_el_incremental(self):
+        self.comprar(2)
+        self.comprar(1)
+        incremental = list(VentaDiaria.objects.values("fecha", "total", "pedidos"))
+
+        recalcular_ventas()
+
+        self.assertEqual(list(VentaDiaria.objects.values("fecha", "total", "pedidos")), incremental)
+        self.assertEqual(VentaDiariaProducto.objects.get().unidades, 3)
+
+    def resumen(self):
+        return (
+            list(VentaDiaria.objects.order_by("fecha").values_list("fecha", "total", "pedidos", "total_cancelado", "pedidos_cancelados")),
+            list(VentaDiariaProducto.objects.filter(unidades__gt=0).order_by("fecha", "producto").values_list("fecha", "producto", "unidades", "total")),
+        )
+
+    def test_cambios_fuera_del_panel_mantienen_el_resumen(self):
+        primero = self.comprar(2)
+        segundo = self.comprar(3)
+
+        # Como lo haría el admin de Django: cambios y borrados sobre el modelo
+        segundo.estado = "cancelado"
+        segundo.save()
+        detalle = primero.detalles.get()
+        detalle.cantidad, detalle.subtotal = 1, Decimal("25000")
+        detalle.save()
+        Pedido.objects.filter(id=segundo.id).delete()
+        incremental = self.resumen()
+
+        recalcular_ventas()
+
+        self.assertEqual(self.resumen(), incremental)
+        self.assertEqual(incremental[1][0][2:], (1, Decimal("25000")))
+
+    def test_borrar_producto_sin_ventas_no_lo_bloquea_el_resumen(self):
+        pedido = self.comprar(2)
+        pedido.delete()
+        self.producto.categoria.delete()
+        self.assertFalse(VentaDiariaProducto.objects.exists())
+        self.assertEqual(VentaDiaria.objects.get().pedidos, 0)
+
+    def test_migracion_llena_el_resumen_existente(self):
+        self.comprar(2)
+        self.comprar(1)
+        esperado = self.resumen()
+        VentaDiaria.objects.all().delete()
+        VentaDiariaProducto.objects.all().delete()
+
+        migracion = import_module("catalogo.migrations.0015_ventas_diarias_cascade_y_backfill")
+        migracion.reconstruir_resumen(django_apps, None)
+
+        self.assertEqual(self.resumen(), esperado)
+
+    def test_reportes_lee_el_resumen(self):
+        self.comprar(2)
+        self.client.login(username="admin", password="clave")
+
+        response = self.client.get(reverse("admin_reportes"))
+
+        self.assertEqual(response.context["total_ventas"], Decimal("50000"))
+        self.assertEqual(response.context["total_pedidos"], 1)
+        self.assertEqual(list(response.context["productos_mas_vendidos"]),
+                         [{"producto__nombre": "Cheesecake", "total_vendido": 2}])
+
+    def test_reportes_con_fechas_mal_escritas(self):
+        self.comprar(2)
+        self.client.login(username="admin", password="clave")
+
+        response = self.client.get(reverse("admin_reportes"), {"fecha_inicio": "2024-13-01", "fecha_fin": "ayer"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Las fechas deben tener el formato AAAA-MM-DD.")
+        self.assertEqual(response.context["total_pedidos"], 1)
+
+
+class ExportacionesTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        self.client.login(username="admin", password="clave")
+        categoria = Categoria.objects.create(nombre="Tartas")
+        producto = crear_producto(categoria)
+        self.hoy = timezone.localdate().isoformat()
+        for i in range(3):
+            pedido = Pedido.objects.create(
+                nombre_cliente=f"Cliente {i}", telefono="300", direccion="Calle 1", total=Decimal("25000")
+            )
+            DetallePedido.objects.create(
+                pedido=pedido, producto=producto, cantidad=1,
+                precio_unitario=Decimal("25000"), subtotal=Decimal("25000"),
+            )
+
+    def test_csv_en_streaming(self):
+        response = self.client.get(reverse("exportar_pedidos_csv"), {"fecha_inicio": self.hoy, "fecha_fin": self.hoy})
+
+        self.assertTrue(response.streaming)
+        lineas = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lineas[0], "ID,Cliente,Fecha,Total,Estado")
+        self.assertEqual(lineas[-1], ",,,TOTAL:,75000.00")
+        self.assertEqual(len(lineas), 5)
+
+    def test_csv_de_detalles(self):
+        response = self.client.get(
+            reverse("exportar_pedidos_csv"),
+            {"fecha_inicio": self.hoy, "fecha_fin": self.hoy, "detalle": "1"},
+        )
+        lineas = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lineas), 4)
+        self.assertIn("Cheesecake", lineas[1])
+
+    def test_sin_fechas(self):
+        response = self.client.get(reverse("exportar_pedidos_csv"))
+        self.assertContains(response, "Debe seleccionar un rango de fechas")
+
+
+class TrabajosReporteTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        self.client.login(username="admin", password="clave")
+        producto = crear_producto(Categoria.objects.create(nombre="Tartas"))
+        for i in range(3):
+            pedido = Pedido.objects.create(
+                nombre_cliente=f"Cliente {i}", telefono="300", direccion="Calle 1", total=Decimal("25000")
+            )
+            DetallePedido.objects.create(
+                pedido=pedido, producto=producto, cantidad=1,
+                precio_unitario=Decimal("25000"), subtotal=Decimal("25000"),
+            )
+        self.rango = {"fecha_inicio": "2020-01-01", "fecha_fin": timezone.localdate().isoformat()}
+
+    def test_exportar_encola_y_no_genera_en_la_peticion(self):
+        response = self.client.get(reverse("exportar_pedidos"), self.rango)
+        self.assertRedirects(response, reverse("reportes_trabajos"))
+        self.client.get(reverse("exportar_pedidos"), self.rango)
+
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual((trabajo.tipo, trabajo.estado), ("xlsx", "pendiente"))
+        self.assertFalse(trabajo.archivo)
+
+    def test_worker_genera_xlsx_con_hoja_de_detalles(self):
+        import openpyxl
+
+        self.client.get(reverse("exportar_pedidos"), self.rango)
+        call_command("procesar_reportes", "--una-vez", stdout=io.StringIO())
+
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual(trabajo.estado, "listo")
+        response = self.client.get(reverse("descargar_reporte", args=[trabajo.id]))
+        libro = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        pedidos, detalles = libro.worksheets
+        self.assertEqual(pedidos.max_row, 5)
+        self.assertEqual(list(pedidos.iter_rows(values_only=True))[-1][-1], 75000)
+        self.assertEqual(detalles.max_row, 4)
+
+    def test_worker_genera_pdf(self):
+        self.client.get(reverse("exportar_pedidos_pdf"), self.rango)
+        call_command("procesar_reportes", "--una-vez", stdout=io.StringIO())
+
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual(trabajo.estado, "listo")
+        with trabajo.archivo.open("rb") as archivo:
+            self.assertEqual(archivo.read(4), b"%PDF")
+
+    def test_reporte_pasado_se_reutiliza(self):
+        rango = {"fecha_inicio": "2020-01-01", "fecha_fin": "2020-01-31"}
+        self.client.get(reverse("exportar_pedidos_pdf"), rango)
+        call_command("procesar_reportes", "--una-vez", stdout=io.StringIO())
+
+        self.client.get(reverse("exportar_pedidos_pdf"), rango)
+
+        self.assertEqual(TrabajoReporte.objects.get().estado, "listo")
+
+    def test_latido_mantiene_vivo_el_trabajo_en_proceso(self):
+        self.client.get(reverse("exportar_pedidos"), self.rango)
+        trabajo = trabajos.tomar_siguiente()
+        # Sin tocar la BD desde el hilo (la transacción del test la bloquea)
+        latidos = []
+        latir, latido = trabajos.latir, trabajos.LATIDO
+        trabajos.latir, trabajos.LATIDO = latidos.append, 0.01
+        try:
+            with trabajos.latido(trabajo):
+                time.sleep(0.1)
+        finally:
+            trabajos.latir, trabajos.LATIDO = latir, latido
+        self.assertIn(trabajo.id, latidos)
+
+        # Solo vuelve a la cola el que lleva más del límite sin latir
+        self.assertEqual(trabajos.liberar_abandonados(30), 0)
+        TrabajoReporte.objects.filter(id=trabajo.id).update(actualizado_en=timezone.now() - timedelta(minutes=31))
+        self.assertEqual(trabajos.liberar_abandonados(30), 1)
+        self.assertEqual(TrabajoReporte.objects.get().estado, "pendiente")
+
+    def test_pedido_mientras_se_genera_vuelve_a_la_cola(self):
+        self.client.get(reverse("exportar_pedidos"), self.rango)
+        trabajo = trabajos.tomar_siguiente()
+
+        # Llega otro pedido de hoy y se vuelve a pedir el reporte
+        self.client.get(reverse("exportar_pedidos"), self.rango)
+        self.assertTrue(TrabajoReporte.objects.get().regenerar)
+
+        trabajos.procesar(trabajo)
+        self.assertEqual(TrabajoReporte.objects.get().estado, "pendiente")
+
+        call_command("procesar_reportes", "--una-vez", stdout=io.StringIO())
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual((trabajo.estado, trabajo.regenerar), ("listo", False))
+
+    def test_worker_borra_reportes_vencidos_y_sus_archivos(self):
+        self.client.get(reverse("exportar_pedidos"), self.rango)
+        self.client.get(reverse("exportar_pedidos_pdf"), self.rango)
+        call_command("procesar_reportes", "--una-vez", stdout=io.StringIO())
+        viejo, reciente = TrabajoReporte.objects.order_by("id")
+        TrabajoReporte.objects.filter(id=viejo.id).update(actualizado_en=timezone.now() - timedelta(days=8))
+
+        call_command("procesar_reportes", "--una-vez", "--retener-dias", "7", stdout=io.StringIO())
+
+        self.assertEqual(list(TrabajoReporte.objects.values_list("id", flat=True)), [reciente.id])
+        self.assertFalse(default_storage.exists(viejo.archivo.name))
+        self.assertTrue(default_storage.exists(reciente.archivo.name))
+
+
+class PedidoResourceTests(TestCase):
+
+    def test_export_sin_consultas_por_pedido(self):
+        producto = crear_producto(Categoria.objects.create(nombre="Tartas"))
+        for i in range(20):
+            pedido = Pedido.objects.create(
+                nombre_cliente=f"Cliente {i}", telefono="300", direccion="Calle 1", total=Decimal("30000")
+            )
+            for _ in range(2):
+                DetallePedido.objects.create(
+                    pedido=pedido, producto=producto, cantidad=2,
+                    precio_unitario=Decimal("7500"), subtotal=Decimal("15000"),
+                )
+        Pedido.objects.create(nombre_cliente="Vacío", telefono="300", direccion="Calle 1")
+
+        with self.assertNumQueries(1):
+            dataset = PedidoResource().export()
+
+        self.assertEqual(len(dataset), 21)
+        fila = dataset.dict[0]
+        self.assertIn("creado_en", fila)
+        self.assertEqual((fila["total_items"], fila["promedio_item"]), (4, Decimal("7500.00")))
+        vacio = [fila for fila in dataset.dict if fila["nombre_cliente"] == "Vacío"][0]
+        self.assertEqual((vacio["total_items"], vacio["promedio_item"]), (0, 0))
+
+    def test_admin_exporta_xlsx_con_el_formato_diferido(self):
+        User.objects.create_superuser("admin", password="clave")
+        self.client.login(username="admin", password="clave")
+        Pedido.objects.create(nombre_cliente="Ana", telefono="300", direccion="Calle 1", total=Decimal("30000"))
+        formatos = [formato().get_title() for formato in PedidoAdmin(Pedido, admin_site).get_export_formats()]
+
+        response = self.client.post(reverse("admin:catalogo_pedido_export"), {
+            "format": formatos.index("xlsx"), "pedidoresource_id": True, "pedidoresource_nombre_cliente": True,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        libro = openpyxl.load_workbook(io.BytesIO(response.content))
+        self.assertEqual([celda.value for celda in libro.active[2]], [Pedido.objects.get().id, "Ana"])
+
+
+class IndicesPedidoTests(TestCase):
+
+    def setUp(self):
+        for i in range(30):
+            crear_pedido_en(timezone.now() - timedelta(days=i), "10000")
+        if connection.vendor == "postgresql":
+            # Con tan pocas filas el planificador preferiría recorrer la tabla
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def plan(self, queryset):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.skipTest("EXPLAIN no soportado en este motor")
+        return queryset.explain()
+
+    def test_rango_fechas_limites_locales(self):
+        inicio, fin = rango_fechas("2025-03-01", date(2025, 3, 31))
+        bogota = ZoneInfo("America/Bogota")
+        self.assertEqual(inicio, datetime(2025, 3, 1, tzinfo=bogota))
+        self.assertEqual(fin, datetime(2025, 4, 1, tzinfo=bogota))
+        with self.assertRaises(ValueError):
+            rango_fechas("2025-13-01", "")
+
+    def test_rango_de_fechas_usa_indice(self):
+        inicio, fin = rango_fechas(timezone.localdate() - timedelta(days=7), timezone.localdate())
+        pedidos = Pedido.objects.filter(creado_en__gte=inicio, creado_en__lt=fin)
+        self.assertIn("pedido_creado_idx", self.plan(pedidos))
+
+    def test_filtro_por_estados_usa_indice(self):
+        pedidos = Pedido.objects.filter(estado="pendiente", estado_pago="pagado").order_by("-creado_en")
+        self.assertIn("pedido_estados_creado_idx", self.plan(pedidos))
+
+    def test_no_vistos_usa_indice_parcial(self):
+        pedidos = Pedido.objects.filter(visto_por_admin=False).order_by("creado_en")
+        self.assertIn("pedido_no_visto_idx", self.plan(pedidos))
+
+
+def foto_jpeg(ancho=1600, alto=1200):
+    contenido = io.BytesIO()
+    Image.new("RGB", (ancho, alto), "orange").save(contenido, "JPEG")
+    return SimpleUploadedFile("foto.jpg", contenido.getvalue(), content_type="image/jpeg")
+
+
+class MiniaturasTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media, IMAGENES_ANCHOS=(320, 640))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.categoria = Categoria.objects.create(nombre="Tartas")
+
+    def crear(self, imagen):
+        return Producto.objects.create(
+            categoria=self.categoria, nombre="Tarta", descripcion="-", precio=Decimal("1000"), imagen=imagen,
+        )
+
+    def test_al_subir_genera_webp_y_jpeg_por_ancho(self):
+        producto = self.crear(foto_jpeg())
+
+        self.assertTrue(Producto.objects.get(id=producto.id).imagen_derivados)
+        for ancho in (320, 640):
+            for extension in ("webp", "jpg"):
+                nombre = nombre_derivado(producto.imagen.name, ancho, extension)
+                with default_storage.open(nombre) as archivo:
+                    self.assertEqual(Image.open(archivo).size, (ancho, ancho * 3 // 4))
+
+        html = Template("{% load imagenes %}{% imagen_producto producto '50vw' %}").render(Context({"producto": producto}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("-640w.webp 640w", html)
+
+    def test_sin_miniaturas_usa_el_original(self):
+        producto = crear_producto(self.categoria)
+        self.assertFalse(producto.imagen_derivados)
+
+        html = Template("{% load imagenes %}{% imagen_producto producto %}").render(Context({"producto": producto}))
+        self.assertNotIn("srcset", html)
+        self.assertIn(producto.imagen.url, html)
+
+    def test_comando_completa_las_pendientes(self):
+        producto = self.crear(foto_jpeg(800, 600))
+        Producto.objects.update(imagen_derivados=False)
+        default_storage.delete(nombre_derivado(producto.imagen.name, 320, "webp"))
+
+        call_command("generar_miniaturas", procesos=2, stdout=io.StringIO())
+
+        self.assertTrue(Producto.objects.get(id=producto.id).imagen_derivados)
+        self.assertTrue(default_storage.exists(nombre_derivado(producto.imagen.name, 320, "webp")))
+
+    def derivados(self, nombre):
+        return [
+            default_storage.exists(nombre_derivado(nombre, ancho, extension))
+            for ancho in (320, 640) for extension in ("webp", "jpg")
+        ]
+
+    def test_cambiar_o_borrar_la_imagen_borra_sus_derivados(self):
+        producto = self.crear(foto_jpeg(800, 600))
+        compartida = self.crear(foto_jpeg(800, 600))
+        Producto.objects.filter(id=compartida.id).update(imagen=producto.imagen.name)
+        anterior = producto.imagen.name
+
+        producto = Producto.objects.get(id=producto.id)
+        producto.imagen = foto_jpeg(800, 600)
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.save()
+        # Otro producto sigue usando la imagen anterior
+        self.assertEqual(self.derivados(anterior), [True] * 4)
+        self.assertEqual(self.derivados(producto.imagen.name), [True] * 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.get(id=compartida.id).delete()
+            producto.delete()
+        self.assertEqual(self.derivados(anterior), [False] * 4)
+        self.assertEqual(self.derivados(producto.imagen.name), [False] * 4)
+
+    def test_imagen_gigante_queda_sin_miniaturas(self):
+        limite = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = 1000
+        self.addCleanup(setattr, Image, "MAX_IMAGE_PIXELS", limite)
+
+        with self.assertLogs("catalogo.imagenes", "WARNING"):
+            producto = self.crear(foto_jpeg(100, 100))
+
+        self.assertFalse(Producto.objects.get(id=producto.id).imagen_derivados)
+        self.assertEqual(self.derivados(producto.imagen.name), [False] * 4)
+
+
+class EstaticosTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Un solo collectstatic para la clase (brotli al máximo es lento)
+        cls.static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        ajustes = override_settings(STATIC_ROOT=cls.static_root)
+        ajustes.enable()
+        cls.addClassCleanup(ajustes.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_collectstatic_genera_hash_gzip_y_brotli(self):
+        nombre = staticfiles_storage.stored_name("catalogo/ccs/styles.css")
+        self.assertRegex(nombre, r"styles\.[0-9a-f]{12}\.css$")
+        ruta = staticfiles_storage.path(nombre)
+        with open(ruta, "rb") as original, gzip.open(ruta + ".gz") as comprimido, open(ruta + ".br", "rb") as br:
+            contenido = original.read()
+            self.assertEqual(contenido, comprimido.read())
+            self.assertEqual(contenido, brotli.decompress(br.read()))
+        # Las imágenes ya vienen comprimidas
+        self.assertFalse(os.path.exists(staticfiles_storage.path("cliente/img/logo.png") + ".gz"))
+
+    def test_sirve_version_comprimida_con_cache_larga(self):
+        nombre = staticfiles_storage.stored_name("catalogo/ccs/styles.css")
+        response = self.client.get(f"/static/{nombre}", HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(b"--primary", gzip.decompress(b"".join(response.streaming_content)))
+
+        response = self.client.get("/static/catalogo/ccs/styles.css")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertNotIn("immutable", response["Cache-Control"])
+        self.assertEqual(self.client.get("/static/../settings.py").status_code, 400)
+        self.assertEqual(self.client.get("/static/no-existe.css").status_code, 404)
+
+    def test_respeta_q_de_accept_encoding(self):
+        url = "/static/" + staticfiles_storage.stored_name("catalogo/ccs/styles.css")
+        casos = {
+            "gzip, deflate, br": "br",
+            "br;q=0, gzip": "gzip",
+            "gzip;q=0": None,
+            "br;q=0.5, gzip;q=0.8": "gzip",
+            "*": "br",
+            "*;q=0, identity": None,
+            "gzip;q=nada": None,
+        }
+        for cabecera, esperada in casos.items():
+            with self.subTest(cabecera):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING=cabecera)
+                self.assertEqual(response.get("Content-Encoding"), esperada)
+
+    def test_base_incluye_css_critico_en_linea(self):
+        response = self.client.get(reverse("lista_productos"))
+        self.assertContains(response, "<style>:root{--primary: #c81a1a;")
+        self.assertContains(response, ".navbar-custom{background-color: var(--primary)}")
+        # Solo lo crítico: el resto llega con styles.css
+        self.assertNotContains(response, ".footer-custom{")
+        self.assertContains(response, staticfiles_storage.url("catalogo/ccs/styles.css"))
+
+
+@override_settings(PERFILADOR_MUESTREO=1)
+class PerfiladorTests(TestCase):
+
+    def setUp(self):
+        perfilador.limpiar()
+        self.addCleanup(perfilador.limpiar)
+        crear_producto(Categoria.objects.create(nombre="Tartas"))
+
+    def test_registra_tiempo_y_consultas_por_vista(self):
+        for _ in range(3):
+            self.client.get(reverse("lista_productos"))
+
+        fila = [fila for fila in perfilador.resumen() if fila["vista"] == "lista_productos"][0]
+        self.assertEqual(fila["muestras"], 3)
+        self.assertGreaterEqual(fila["consultas"], 1)
+        self.assertGreaterEqual(fila["p95"], fila["p50"])
+        self.assertIn("SELECT", fila["lentas"][0][1])
+
+    def test_pagina_solo_para_staff(self):
+        response = self.client.get(reverse("panel_rendimiento"))
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.create_user("admin", password="clave", is_staff=True)
+        self.client.login(username="admin", password="clave")
+        self.client.get(reverse("lista_productos"))
+        response = self.client.get(reverse("panel_rendimiento"))
+        self.assertContains(response, "lista_productos")
+
+    @override_settings(PERFILADOR_MUESTREO=0)
+    def test_desactivado_no_mide(self):
+        self.client.get(reverse("lista_productos"))
+        self.assertEqual(perfilador.resumen(), [])
+
+
+class SimuladorWompi:
+    """Hace las veces de Wompi: arma eventos firmados como los del servicio real"""
+
+    def __init__(self, secreto=None):
+        self.secreto = secreto or settings.WOMPI_EVENTS_SECRET
+        self.transacciones = 0
+
+    def evento(self, pedido, estado, timestamp=1700000000, centavos=None, moneda="COP"):
+        self.transacciones += 1
+        evento = {
+            "event": "transaction.updated",
+            "data": {"transaction": {
+                "id": f"1234-{pedido.id}-{self.transacciones}",
+                "amount_in_cents": int(pedido.total * 100) if centavos is None else centavos,
+                "currency": moneda,
+                "reference": f"PEDIDO{pedido.id}",
+                "status": estado,
+            }},
+            "environment": "test",
+            "signature": {
+                "properties": ["transaction.id", "transaction.status", "transaction.amount_in_cents"],
+            },
+            "timestamp": timestamp,
+        }
+        evento["signature"]["checksum"] = pagos.calcular_checksum(evento, self.secreto)
+        return evento
+
+
+class WompiEventosTests(TestCase):
+
+    def setUp(self):
+        self.wompi = SimuladorWompi()
+        self.pedido = Pedido.objects.create(
+            nombre_cliente="Ana", telefono="300", direccion="Calle 1", total=Decimal("36000"), metodo_pago="Wompi",
+        )
+
+    def entregar(self, evento):
+        return self.client.post(reverse("wompi_eventos"), json.dumps(evento), content_type="application/json")
+
+    def escrituras_de_pedido(self, evento):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.entregar(evento)
+        self.assertEqual(response.status_code, 200)
+        return [c["sql"] for c in consultas.captured_queries if c["sql"].startswith('UPDATE "catalogo_pedido"')]
+
+    def test_aprobado_marca_el_pedido_pagado(self):
+        response = self.entregar(self.wompi.evento(self.pedido, "APPROVED"))
+
+        self.assertEqual(response.json(), {"resultado": "procesado"})
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado_pago, "pagado")
+        self.assertEqual(EventoWompi.objects.get().referencia, f"PEDIDO{self.pedido.id}")
+
+    def test_aprobado_por_otro_monto_o_moneda_deja_el_pedido_pendiente(self):
+        for evento in (
+            self.wompi.evento(self.pedido, "APPROVED", centavos=100000),
+            self.wompi.evento(self.pedido, "APPROVED", moneda="USD"),
+        ):
+            with self.assertLogs("catalogo.pagos", "WARNING"):
+                response = self.entregar(evento)
+            self.assertEqual(response.json(), {"resultado": "procesado"})
+
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado_pago, "pendiente")
+        self.assertEqual(EventoWompi.objects.count(), 2)
+
+        self.entregar(self.wompi.evento(self.pedido, "APPROVED"))
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado_pago, "pagado")
+
+    def test_checksum_invalido_se_rechaza(self):
+        evento = self.wompi.evento(self.pedido, "APPROVED")
+        evento["data"]["transaction"]["status"] = "DECLINED"
+
+        self.assertEqual(self.entregar(evento).status_code, 400)
+        self.assertEqual(self.client.post(reverse("wompi_eventos"), "{", content_type="application/json").status_code, 400)
+        self.assertFalse(EventoWompi.objects.exists())
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado_pago, "pendiente")
+
+    def test_reenvio_no_escribe_el_pedido(self):
+        evento = self.wompi.evento(self.pedido, "APPROVED")
+        self.assertEqual(len(self.escrituras_de_pedido(evento)), 1)
+
+        self.assertEqual(self.escrituras_de_pedido(evento), [])
+        self.assertEqual(self.entregar(evento).json(), {"resultado": "duplicado"})
+        self.assertEqual(EventoWompi.objects.count(), 1)
+
+    def test_mismo_estado_no_modifica_la_fila(self):
+        self.entregar(self.wompi.evento(self.pedido, "APPROVED"))
+        actualizado_en = Pedido.objects.get(id=self.pedido.id).actualizado_en
+
+        # Otro evento con el mismo estado: el UPDATE condicional no toca filas
+        self.entregar(self.wompi.evento(self.pedido, "APPROVED", timestamp=1700000100))
+        # PENDING nunca hace retroceder un pago resuelto
+        self.entregar(self.wompi.evento(self.pedido, "PENDING", timestamp=1700000200))
+
+        pedido = Pedido.objects.get(id=self.pedido.id)
+        self.assertEqual((pedido.estado_pago, pedido.actualizado_en), ("pagado", actualizado_en))
+        self.assertEqual(EventoWompi.objects.count(), 3)
+
+    def test_rechazo_tardio_no_revierte_un_pago_aprobado(self):
+        self.entregar(self.wompi.evento(self.pedido, "APPROVED"))
+        actualizado_en = Pedido.objects.get(id=self.pedido.id).actualizado_en
+        for estado in ("DECLINED", "VOIDED", "ERROR"):
+            self.assertEqual(self.entregar(self.wompi.evento(self.pedido, estado)).json(), {"resultado": "procesado"})
+
+        pedido = Pedido.objects.get(id=self.pedido.id)
+        self.assertEqual((pedido.estado_pago, pedido.actualizado_en), ("pagado", actualizado_en))
+
+    def test_rechazado_puede_pasar_a_pagado(self):
+        self.entregar(self.wompi.evento(self.pedido, "DECLINED"))
+        self.entregar(self.wompi.evento(self.pedido, "APPROVED"))
+
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado_pago, "pagado")
+
+    def test_json_con_tipos_inesperados_responde_400(self):
+        valido = self.wompi.evento(self.pedido, "APPROVED")
+        for propiedades, data in (
+            ([1], valido["data"]),
+            (["transaction.status.codigo"], valido["data"]),
+            (["transaction.id"], {"transaction": ["no", "es", "un", "objeto"]}),
+            (["transaction.id"], "texto"),
+            (7, valido["data"]),
+        ):
+            with self.subTest(propiedades=propiedades, data=data):
+                evento = {**valido, "data": data, "signature": {"properties": propiedades, "checksum": "x"}}
+                self.assertEqual(self.entregar(evento).status_code, 400)
+        self.assertEqual(self.client.post(reverse("wompi_eventos"), "[1]", content_type="application/json").status_code, 400)
+
+    def test_redireccion_del_navegador_no_cambia_el_pago(self):
+        response = self.client.get(reverse("wompi_confirmacion"), {
+            "reference": f"PEDIDO{self.pedido.id}", "status": "APPROVED",
+        })
+
+        self.assertRedirects(response, reverse("confirmacion_pedido", args=[self.pedido.id]))
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado_pago, "pendiente")
+
+    def test_rafaga_con_reenvios(self):
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(nombre_cliente=f"Cliente {i}", telefono="300", direccion="Calle 1", total=Decimal("30000"))
+            for i in range(60)
+        ])
+        eventos = [
+            self.wompi.evento(pedido, "APPROVED" if pedido.id % 3 else "DECLINED")
+            for pedido in pedidos
+        ]
+        # Cada evento llega tres veces, en desorden, como en los reintentos de Wompi
+        entregas = eventos * 3
+        random.Random(7).shuffle(entregas)
+
+        resultados = []
+        inicio = time.perf_counter()
+        for evento in entregas:
+            resultados.append(self.entregar(evento).json()["resultado"])
+        segundos = time.perf_counter() - inicio
+
+        self.assertEqual(resultados.count("procesado"), 60)
+        self.assertEqual(resultados.count("duplicado"), 120)
+        self.assertEqual(EventoWompi.objects.count(), 60)
+        estados = dict(Pedido.objects.filter(id__in=[p.id for p in pedidos]).values_list("id", "estado_pago"))
+        self.assertEqual(estados, {p.id: "pagado" if p.id % 3 else "rechazado" for p in pedidos})
+
+        por_segundo = len(entregas) / segundos
+        if os.environ.get("REPORTE_VISTAS"):
+            print(f"wompi_eventos: {len(entregas)} entregas, {por_segundo:.0f} eventos/s", file=sys.stderr)
+        self.assertGreater(por_segundo, 50)
+
+
+class ServidorWompi(ThreadingHTTPServer):
+    """
+    API de transacciones de Wompi en local: `transacciones` es {referencia:
+    [estado o {campos de la transacción}]}, por defecto de `centavos` en COP;
+    `fallas` {referencia: cuántas veces responder 503 antes}.
+    """
+    daemon_threads = True
+
+    def __init__(self, transacciones, fallas=None, demora=0.0, centavos=3000000):
+        super().__init__(("127.0.0.1", 0), ManejadorWompi)
+        self.transacciones = transacciones
+        self.centavos = centavos
+        self.fallas = dict(fallas or {})
+        self.demora = demora
+        self.consultas = []
+        self.conexiones = set()
+        self.simultaneas = self.maximo_simultaneas = 0
+        self.candado = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class ManejadorWompi(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        servidor = self.server
+        referencia = parse_qs(urlsplit(self.path).query)["reference"][0]
+        with servidor.candado:
+            servidor.consultas.append(referencia)
+            servidor.conexiones.add(self.client_address)
+            servidor.simultaneas += 1
+            servidor.maximo_simultaneas = max(servidor.maximo_simultaneas, servidor.simultaneas)
+            fallar = servidor.fallas.get(referencia, 0) > 0
+            if fallar:
+                servidor.fallas[referencia] -= 1
+        time.sleep(servidor.demora)
+        with servidor.candado:
+            servidor.simultaneas -= 1
+
+        if fallar:
+            estado, cuerpo = 503, b"{}"
+        else:
+            estado = 200
+            cuerpo = json.dumps({"data": [
+                {
+                    "id": f"{referencia}-{i}", "reference": referencia,
+                    "amount_in_cents": servidor.centavos, "currency": "COP",
+                    **(transaccion if isinstance(transaccion, dict) else {"status": transaccion}),
+                }
+                for i, transaccion in enumerate(servidor.transacciones.get(referencia, []))
+            ]}).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConciliacionTests(TestCase):
+
+    def setUp(self):
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        self.pedidos = []
+        for i in range(40):
+            pedido = Pedido.objects.create(
+                nombre_cliente=f"Cliente {i}", telefono="300", direccion="Calle 1",
+                total=Decimal("30000"), metodo_pago="Wompi",
+            )
+            self.pedidos.append(pedido)
+        Pedido.objects.update(creado_en=hace_una_hora)
+        # Recién creado (el cliente puede estar pagando) y otro método de pago: no se consultan
+        self.reciente = Pedido.objects.create(nombre_cliente="Ana", telefono="300", direccion="Calle 1", metodo_pago="Wompi")
+        self.efectivo = Pedido.objects.create(nombre_cliente="Luis", telefono="300", direccion="Calle 1", metodo_pago="Efectivo")
+        Pedido.objects.filter(id=self.efectivo.id).update(creado_en=hace_una_hora)
+
+    def servidor(self, *args, **kwargs):
+        servidor = ServidorWompi(*args, **kwargs)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        ajustes = override_settings(WOMPI_API_URL=servidor.url)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        return servidor
+
+    def conciliar(self, *argumentos):
+        salida = io.StringIO()
+        call_command("conciliar_pagos", "--espera", "0.01", *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_aplica_estados_por_lotes_en_paralelo(self):
+        ref = lambda pedido: f"PEDIDO{pedido.id}"
+        transacciones = {}
+        for i, pedido in enumerate(self.pedidos):
+            # Aprobado, rechazado, reintento aprobado tras un rechazo, en proceso y sin transacción
+            transacciones[ref(pedido)] = [["APPROVED"], ["DECLINED"], ["DECLINED", "APPROVED"], ["PENDING"], []][i % 5]
+        servidor = self.servidor(transacciones, fallas={ref(self.pedidos[0]): 2}, demora=0.02)
+
+        with CaptureQueriesContext(connection) as consultas:
+            salida = self.conciliar("--lote", "15", "--concurrencia", "4")
+
+        estados = dict(Pedido.objects.values_list("id", "estado_pago"))
+        esperado = ["pagado", "rechazado", "pagado", "pendiente", "pendiente"]
+        self.assertEqual([estados[p.id] for p in self.pedidos], [esperado[i % 5] for i in range(40)])
+        self.assertEqual((estados[self.reciente.id], estados[self.efectivo.id]), ("pendiente", "pendiente"))
+
+        # Cada pedido una vez, más los dos reintentos del 503
+        self.assertEqual(len(servidor.consultas), 42)
+        self.assertEqual(servidor.maximo_simultaneas, 4)
+        self.assertLessEqual(len(servidor.conexiones), 4)
+        # Un solo UPDATE por lote de 15, con todos los pedidos resueltos del lote
+        actualizaciones = [c for c in consultas.captured_queries if c["sql"].startswith('UPDATE "catalogo_pedido"')]
+        self.assertEqual(len(actualizaciones), 3)
+        self.assertIn("40 pedidos consultados, 24 actualizados, 0 con error", salida)
+        self.assertIn("consultas/s", salida)
+
+    def test_error_persistente_no_cambia_el_pedido(self):
+        pedido = self.pedidos[0]
+        servidor = self.servidor({f"PEDIDO{pedido.id}": ["APPROVED"]}, fallas={f"PEDIDO{pedido.id}": 10})
+
+        with self.assertLogs("catalogo.conciliacion", "WARNING"):
+            salida = self.conciliar("--reintentos", "2")
+
+        self.assertEqual(servidor.consultas.count(f"PEDIDO{pedido.id}"), 3)
+        self.assertEqual(Pedido.objects.get(id=pedido.id).estado_pago, "pendiente")
+        self.assertIn("1 con error", salida)
+
+    def test_evento_durante_la_consulta_gana(self):
+        pedido = self.pedidos[0]
+        Pedido.objects.filter(id=pedido.id).update(estado_pago="rechazado")
+
+        total = Decimal("30000")
+        self.assertEqual(aplicar_estados({pedido.id: ("pagado", total), self.pedidos[1].id: ("pagado", total)}), 1)
+        self.assertEqual(Pedido.objects.get(id=pedido.id).estado_pago, "rechazado")
+
+    def test_aprobado_por_otro_monto_o_moneda_sigue_pendiente(self):
+        ref = lambda pedido: f"PEDIDO{pedido.id}"
+        parcial, dolares, reintento = self.pedidos[:3]
+        self.servidor({
+            ref(parcial): [{"status": "APPROVED", "amount_in_cents": 1000000}],
+            ref(dolares): [{"status": "APPROVED", "currency": "USD"}],
+            # Primero un pago incompleto y luego el pago completo
+            ref(reintento): [{"status": "APPROVED", "amount_in_cents": 1000000}, "APPROVED"],
+        })
+
+        with self.assertLogs("catalogo.conciliacion", "WARNING") as registros:
+            salida = self.conciliar()
+
+        estados = dict(Pedido.objects.values_list("id", "estado_pago"))
+        self.assertEqual([estados[p.id] for p in (parcial, dolares, reintento)], ["pendiente", "pendiente", "pagado"])
+        self.assertIn("1 actualizados", salida)
+        self.assertEqual(len(registros.output), 3)
+
+    def test_total_cambiado_durante_la_consulta_no_se_paga(self):
+        pedido = self.pedidos[0]
+        Pedido.objects.filter(id=pedido.id).update(total=Decimal("45000"))
+
+        with self.assertLogs("catalogo.conciliacion", "WARNING"):
+            self.assertEqual(aplicar_estados({pedido.id: ("pagado", Decimal("30000"))}), 0)
+        self.assertEqual(Pedido.objects.get(id=pedido.id).estado_pago, "pendiente")
+
+
+# Los límites de tiempo y memoria dependen de la máquina (en CI varían
+# demasiado): solo se exigen con PRESUPUESTO_MS=1, en una máquina conocida
+EXIGIR_TIEMPOS = bool(os.environ.get("PRESUPUESTO_MS"))
+
+
+class ArranqueTests(SimpleTestCase):
+    # Hoy: ~0,4 s y ~51 MB con SQLite
+    MAX_SEGUNDOS = 3
+    MAX_RSS_MB = 90
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.medida = medir_arranque()
+
+    def test_exportaciones_se_importan_solo_al_exportar(self):
+        self.assertEqual(diferidos_cargados(self.medida["modulos"]), [])
+        self.assertIn("catalogo.views", self.medida["modulos"])
+
+    @unittest.skipUnless(EXIGIR_TIEMPOS, "PRESUPUESTO_MS=1 para exigir tiempo y memoria")
+    def test_tiempo_y_memoria_del_worker(self):
+        self.assertLess(self.medida["segundos"], self.MAX_SEGUNDOS)
+        self.assertLess(self.medida["rss_kb"] / 1024, self.MAX_RSS_MB)
+
+    def test_plantillas_a_calentar(self):
+        nombres = plantillas_del_proyecto()
+        self.assertIn("base.html", nombres)
+        self.assertIn("catalogo/fragmentos/slot_stock.html", nombres)
+        for nombre in nombres:
+            get_template(nombre)
+
+
+# =====================
+# PRESUPUESTO DE CONSULTAS Y TIEMPO POR VISTA
+# =====================
+# Cada ruta de catalogo/urls.py tiene un máximo de consultas SQL y de
+# milisegundos con un volumen de datos realista. Si un cambio agrega un N+1
+# la prueba falla y el número aparece en la revisión. Los milisegundos solo
+# se exigen con PRESUPUESTO_MS=1 (ver EXIGIR_TIEMPOS).
+# REPORTE_VISTAS=1 imprime la tabla de consultas y tiempos al terminar.
+
+PRESUPUESTOS = {
+    # nombre de la ruta: (consultas, milisegundos)
+    "lista_productos": (1, 400),
+    "detalle_producto": (1, 300),
+    "ver_carrito": (3, 300),
+    "agregar_al_carrito": (5, 300),
+    "incrementar_cantidad": (6, 300),
+    "decrementar_cantidad": (5, 300),
+    "eliminar_item": (5, 300),
+    "api_carrito": (3, 300),
+    "api_carrito_actualizar": (6, 300),
+    "checkout": (19, 500),
+    "wompi_confirmacion": (0, 300),
+    "wompi_eventos": (4, 300),
+    "confirmacion_pedido": (3, 300),
+    # Las páginas del panel cuentan los pedidos no vistos para el menú (con
+    # LocMemCache no hay contador en caché: ver pedidos.pedidos_no_vistos)
+    "panel_inicio": (6, 400),
+    "admin_pedidos": (5, 500),
+    "admin_detalle_pedido": (5, 300),
+    "admin_inventario": (5, 500),
+    "editar_inventario": (5, 300),
+    "admin_reportes": (5, 400),
+    "exportar_pedidos": (6, 300),
+    "exportar_pedidos_csv": (3, 1000),
+    "exportar_pedidos_pdf": (6, 300),
+    "reportes_trabajos": (4, 300),
+    "descargar_reporte": (3, 300),
+    "panel_rendimiento": (3, 300),
+    "admin_login": (0, 300),
+    "admin_logout": (4, 300),
+    "reset_password": (0, 300),
+    "password_reset_done": (0, 300),
+    "password_reset_confirm": (1, 300),
+    "password_reset_complete": (0, 300),
+}
+
+# Con el cache de fragmentos vacío (primera visita tras un cambio en el
+# catálogo): aquí se vería un N+1 al renderizar los productos
+PRESUPUESTOS_EN_FRIO = {
+    "lista_productos": (4, 800),
+    "detalle_producto": (2, 500),
+}
+
+
+class PresupuestoVistasTests(TestCase):
+    medidas = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        categorias = [Categoria.objects.create(nombre=f"Categoría {i}") for i in range(4)]
+        cls.productos = [
+            crear_producto(categorias[i % 4], nombre=f"Tarta {i}", cantidad=500) for i in range(60)
+        ]
+        # Algunos productos en promoción con el stock fragmentado
+        for producto in cls.productos[:5]:
+            establecer_stock(producto.inventario, 500, num_fragmentos=4)
+
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(nombre_cliente=f"Cliente {i}", telefono="300", direccion="Calle 1", total=Decimal("75000"))
+            for i in range(300)
+        ])
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido, producto=cls.productos[(pedido.id + j) % 60], cantidad=1,
+                precio_unitario=Decimal("25000"), subtotal=Decimal("25000"),
+            )
+            for pedido in pedidos for j in range(3)
+        ])
+        recalcular_ventas()
+        cls.pedido = pedidos[0]
+
+        cls.admin = User.objects.create_user("admin", password="clave", is_staff=True)
+        cls.trabajo = TrabajoReporte.objects.create(
+            tipo="xlsx", fecha_inicio=date(2020, 1, 1), fecha_fin=date(2020, 1, 31), estado="listo",
+            archivo="reportes/budget.xlsx",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.trabajo.archivo.storage.save("reportes/budget.xlsx", io.BytesIO(b"xlsx"))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if os.environ.get("REPORTE_VISTAS"):
+            for nombre, (consultas, ms) in sorted(cls.medidas.items()):
+                print(f"{nombre:<28} {consultas:>3} consultas {ms:>8.1f} ms", file=sys.stderr)
+
+    def con_carrito(self):
+        for producto in self.productos[:3]:
+            self.client.get(reverse("agregar_al_carrito", args=[producto.id]))
+
+    def como_admin(self):
+        self.client.force_login(self.admin)
+
+    def medir(self, nombre, url, metodo="get", datos=None, estado=(200, 302), calentar=True,
+              presupuestos=PRESUPUESTOS, **extra):
+        # Primera visita fuera de la medición: cachés del catálogo y de plantillas
+        if calentar:
+            getattr(self.client, metodo)(url, datos, **extra)
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            response = getattr(self.client, metodo)(url, datos, **extra)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            ms = (time.perf_counter() - inicio) * 1000
+
+        etiqueta = nombre if presupuestos is PRESUPUESTOS else f"{nombre} (en frío)"
+        self.medidas[etiqueta] = (len(consultas), ms)
+        self.assertIn(response.status_code, estado, nombre)
+        max_consultas, max_ms = presupuestos[nombre]
+        self.assertLessEqual(
+            len(consultas), max_consultas,
+            f"{nombre}: {len(consultas)} consultas (máximo {max_consultas})\n"
+            + "\n".join(consulta["sql"] for consulta in consultas.captured_queries),
+        )
+        if EXIGIR_TIEMPOS:
+            self.assertLessEqual(ms, max_ms, f"{nombre}: {ms:.0f} ms (máximo {max_ms})")
+        return response
+
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        from .urls import urlpatterns
+
+        self.assertEqual({patron.name for patron in urlpatterns}, set(PRESUPUESTOS))
+
+    def test_tienda(self):
+        producto = self.productos[0]
+        self.medir("lista_productos", reverse("lista_productos"))
+        self.medir("detalle_producto", reverse("detalle_producto", args=[producto.id]))
+
+        self.con_carrito()
+        self.medir("ver_carrito", reverse("ver_carrito"))
+        self.medir("agregar_al_carrito", reverse("agregar_al_carrito", args=[producto.id]), calentar=False)
+        self.medir("incrementar_cantidad", reverse("incrementar_cantidad", args=[producto.id]), calentar=False)
+        self.medir("decrementar_cantidad", reverse("decrementar_cantidad", args=[producto.id]), calentar=False)
+        self.medir("eliminar_item", reverse("eliminar_item", args=[producto.id]), calentar=False)
+        self.medir("api_carrito", reverse("api_carrito"))
+        cambios = {producto.id: 2 for producto in self.productos[:10]}
+        self.medir("api_carrito_actualizar", reverse("api_carrito_actualizar"), "post", json.dumps(cambios),
+                   content_type="application/json")
+
+    def test_tienda_en_frio(self):
+        producto = self.productos[0]
+        # Plantillas ya compiladas (otra página), fragmentos sin construir
+        self.client.get(reverse("ver_carrito"))
+        self.medir("lista_productos", reverse("lista_productos"), calentar=False, presupuestos=PRESUPUESTOS_EN_FRIO)
+        self.medir("detalle_producto", reverse("detalle_producto", args=[producto.id]), calentar=False,
+                   presupuestos=PRESUPUESTOS_EN_FRIO)
+
+    def test_compra(self):
+        self.con_carrito()
+        response = self.medir("checkout", reverse("checkout"), "post", {
+            "nombre": "Ana", "telefono": "300", "direccion": "Calle 1", "metodo_pago": "Efectivo",
+        }, calentar=False)
+        self.assertEqual(response.status_code, 302)
+
+        pedido = Pedido.objects.latest("id")
+        self.medir("wompi_confirmacion", reverse("wompi_confirmacion"), datos={
+            "reference": f"PEDIDO{pedido.id}", "status": "APPROVED",
+        }, calentar=False)
+        self.medir("wompi_eventos", reverse("wompi_eventos"), "post",
+                   json.dumps(SimuladorWompi().evento(pedido, "APPROVED")),
+                   content_type="application/json", calentar=False)
+        self.medir("confirmacion_pedido", reverse("confirmacion_pedido", args=[pedido.id]))
+
+    def test_panel(self):
+        self.como_admin()
+        rango = {"fecha_inicio": "2020-01-01", "fecha_fin": timezone.localdate().isoformat()}
+        self.medir("panel_inicio", reverse("panel_inicio"))
+        self.medir("admin_pedidos", reverse("admin_pedidos"))
+        self.medir("admin_detalle_pedido", reverse("admin_detalle_pedido", args=[self.pedido.id]))
+        self.medir("admin_inventario", reverse("admin_inventario"))
+        self.medir("editar_inventario", reverse("editar_inventario", args=[self.productos[0].id]))
+        self.medir("admin_reportes", reverse("admin_reportes"), datos=rango)
+        self.medir("exportar_pedidos", reverse("exportar_pedidos"), datos=rango, calentar=False)
+        self.medir("exportar_pedidos_pdf", reverse("exportar_pedidos_pdf"), datos=rango, calentar=False)
+        self.medir("exportar_pedidos_csv", reverse("exportar_pedidos_csv"), datos=rango)
+        self.medir("reportes_trabajos", reverse("reportes_trabajos"))
+        self.medir("descargar_reporte", reverse("descargar_reporte", args=[self.trabajo.id]))
+        self.medir("panel_rendimiento", reverse("panel_rendimiento"))
+
+    def test_cuentas(self):
+        self.medir("admin_login", reverse("admin_login"))
+        self.medir("reset_password", reverse("reset_password"))
+        self.medir("password_reset_done", reverse("password_reset_done"))
+        self.medir("password_reset_confirm", reverse("password_reset_confirm", args=["MQ", "token"]))
+        self.medir("password_reset_complete", reverse("password_reset_complete"))
+        self.como_admin()
+        self.medir("admin_logout", reverse("admin_logout"), "post", calentar=False)
@@ -0,0 +1,162 @@
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import connection
+from django.utils import timezone
+
+from . import exportaciones
+from .models import Pedido, TrabajoReporte
+from .fechas import ZONA_NEGOCIO, rango_fechas
+
+GENERADORES = {
+    'xlsx': 'escribir_xlsx',
+    'pdf': 'escribir_pdf',
+}
+
+# Cada cuántos segundos un trabajo en proceso renueva `actualizado_en`. Un
+# trabajo 'procesando' sin latidos durante varios minutos quedó abandonado.
+LATIDO = 30
+
+
+def encolar_reporte(tipo, fecha_inicio, fecha_fin):
+    """
+    Retorna el trabajo del reporte (tipo, rango), creándolo si no existe.
+    Un reporte ya generado se reutiliza, salvo que haya fallado o que su
+    rango incluya hoy (pueden haber llegado pedidos nuevos). Si el de hoy se
+    está generando, se marca para generarlo otra vez al terminar.
+    """
+    trabajo, creado = TrabajoReporte.objects.get_or_create(
+        tipo=tipo, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+    )
+    if creado:
+        return trabajo
+
+    hoy = timezone.localdate(timezone=ZONA_NEGOCIO)
+    incluye_hoy = fecha_fin >= hoy
+    if trabajo.estado == 'procesando' and incluye_hoy:
+        # El worker ya leyó los pedidos: los que llegaron después no saldrían
+        marcado = TrabajoReporte.objects.filter(id=trabajo.id, estado='procesando').update(regenerar=True)
+        trabajo.refresh_from_db()
+        if marcado:
+            return trabajo
+
+    if trabajo.estado == 'error' or (trabajo.estado == 'listo' and incluye_hoy):
+        # UPDATE condicional: si otro worker ya lo tomó, no se toca
+        TrabajoReporte.objects.filter(id=trabajo.id, estado=trabajo.estado).update(
+            estado='pendiente', error='', actualizado_en=timezone.now()
+        )
+        trabajo.refresh_from_db()
+    return trabajo
+
+
+def tomar_siguiente():
+    """Reclama el trabajo pendiente más antiguo, o None si no hay"""
+    while True:
+        trabajo = TrabajoReporte.objects.filter(estado='pendiente').order_by('creado_en').first()
+        if trabajo is None:
+            return None
+        # Solo un worker gana el UPDATE; los demás prueban con el siguiente
+        tomado = TrabajoReporte.objects.filter(id=trabajo.id, estado='pendiente').update(
+            estado='procesando', regenerar=False, actualizado_en=timezone.now()
+        )
+        if tomado:
+            trabajo.estado = 'procesando'
+            trabajo.regenerar = False
+            return trabajo
+
+
+def liberar_abandonados(minutos):
+    """
+    Devuelve a la cola los trabajos que quedaron 'procesando' (worker caído):
+    los que llevan `minutos` sin latido. Debe ser bastante mayor que LATIDO.
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TrabajoReporte.objects.filter(estado='procesando', actualizado_en__lt=limite).update(
+        estado='pendiente', actualizado_en=timezone.now()
+    )
+
+
+def latir(trabajo_id):
+    """Marca el trabajo como vivo (solo si sigue en proceso)"""
+    TrabajoReporte.objects.filter(id=trabajo_id, estado='procesando').update(actualizado_en=timezone.now())
+
+
+@contextmanager
+def latido(trabajo):
+    """
+    Renueva `actualizado_en` cada LATIDO segundos desde un hilo mientras dura
+    el bloque. Un reporte grande puede tardar más que el límite de
+    liberar_abandonados y no debe volver a la cola mientras se genera.
+    """
+    detener = threading.Event()
+
+    def latir_hasta_detener():
+        try:
+            while not detener.wait(LATIDO):
+                latir(trabajo.id)
+        finally:
+            # El hilo abre su propia conexión
+            connection.close()
+
+    hilo = threading.Thread(target=latir_hasta_detener, daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def procesar(trabajo):
+    """Genera el archivo del reporte y lo guarda en MEDIA_ROOT/reportes/"""
+    inicio, fin = rango_fechas(trabajo.fecha_inicio, trabajo.fecha_fin)
+    pedidos = Pedido.objects.filter(creado_en__gte=inicio, creado_en__lt=fin).order_by('-creado_en')
+
+    try:
+        with latido(trabajo), tempfile.TemporaryFile() as temporal:
+            getattr(exportaciones, GENERADORES[trabajo.tipo])(temporal, pedidos)
+            temporal.seek(0)
+
+            anterior = trabajo.archivo.name
+            nombre = f"pedidos_{trabajo.fecha_inicio}_{trabajo.fecha_fin}.{trabajo.tipo}"
+            trabajo.archivo.save(nombre, File(temporal), save=False)
+            if anterior and anterior != trabajo.archivo.name:
+                trabajo.archivo.storage.delete(anterior)
+    except Exception:
+        trabajo.estado = 'error'
+        trabajo.error = traceback.format_exc()
+    else:
+        trabajo.estado = 'listo'
+        trabajo.error = ''
+    # Sin `regenerar`: encolar_reporte puede haberlo marcado mientras tanto
+    trabajo.save(update_fields=['estado', 'error', 'archivo', 'actualizado_en'])
+
+    # Pedido otra vez mientras se generaba (rango con hoy): vuelve a la cola
+    if TrabajoReporte.objects.filter(id=trabajo.id, estado='listo', regenerar=True).update(
+        estado='pendiente', regenerar=False, actualizado_en=timezone.now()
+    ):
+        trabajo.estado = 'pendiente'
+    return trabajo
+
+
+def limpiar_vencidos(dias):
+    """
+    Borra los trabajos terminados (listo o error) sin cambios en `dias` días,
+    junto con su archivo. Retorna cuántos se borraron.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    vencidos = TrabajoReporte.objects.filter(estado__in=['listo', 'error'], actualizado_en__lt=limite)
+    borrados = 0
+    for trabajo in vencidos:
+        # Condicional: si alguien lo volvió a pedir, ya no está vencido
+        borrado = TrabajoReporte.objects.filter(
+            id=trabajo.id, estado=trabajo.estado, actualizado_en__lt=limite
+        ).delete()[0]
+        if borrado and trabajo.archivo:
+            trabajo.archivo.storage.delete(trabajo.archivo.name)
+        borrados += borrado
+    return borrados
@@ -1,22 +1,35 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
 from django.contrib.auth import views as auth_views
-from .views import (exportar_pedidos_pdf, exportar_pedidos_csv)
+from .views import (exportar_pedidos_pdf, exportar_pedidos_xlsx, exportar_pedidos_csv)
+
+
+def rutas_tienda(modulo):
+    """Páginas de lectura de la tienda, con las vistas de `views` o `views_async`"""
+    return [
+        path('', modulo.lista_productos, name='lista_productos'),
+        path('producto/<int:producto_id>/', modulo.detalle_producto, name='detalle_producto'),
+        path('carrito/', modulo.ver_carrito, name='ver_carrito'),
+        path('pedido/<int:pedido_id>/confirmacion/', modulo.confirmacion_pedido, name='confirmacion_pedido'),
+    ]
+
 
 urlpatterns = [
-    path('', views.lista_productos, name='lista_productos'),
-    path('producto/<int:producto_id>/', views.detalle_producto, name='detalle_producto'),
+    # Con ASGI (src/asgi.py) se usan las versiones asíncronas
+    *rutas_tienda(views_async if settings.VISTAS_ASYNC else views),
 # rutas de carrito
-    path('carrito/', views.ver_carrito, name='ver_carrito'),
     path('carrito/agregar/<int:producto_id>/', views.agregar_al_carrito, name='agregar_al_carrito'),
     path('checkout/', views.checkout, name='checkout'),
     path('carrito/mas/<int:producto_id>/', views.incrementar_cantidad, name='incrementar_cantidad'),
     path('carrito/menos/<int:producto_id>/', views.decrementar_cantidad, name='decrementar_cantidad'),
     path('carrito/eliminar/<int:producto_id>/', views.eliminar_item, name='eliminar_item'),
+    path('carrito/api/', views.api_carrito, name='api_carrito'),
+    path('carrito/api/actualizar/', views.api_carrito_actualizar, name='api_carrito_actualizar'),
     
 # rutas pagos
     path('pago/wompi/confirmacion/', views.wompi_confirmacion, name='wompi_confirmacion'),
-    path('pedido/<int:pedido_id>/confirmacion/', views.confirmacion_pedido, name='confirmacion_pedido'),
+    path('pago/wompi/eventos/', views.wompi_eventos, name='wompi_eventos'),
 
 # rutas del panel administrativo
     path('panel/', views.panel_inicio, name='panel_inicio'),
@@ -25,8 +38,12 @@ urlpatterns = [
     path('panel/inventario/', views.admin_inventario, name='admin_inventario'),
     path('inventario/editar/<int:producto_id>/', views.editar_inventario, name='editar_inventario'),
     path('panel/reportes/', views.reportes, name='admin_reportes'),
-    path('reportes/exportar-pedidos/', exportar_pedidos_csv, name='exportar_pedidos'), 
+    path('reportes/exportar-pedidos/', exportar_pedidos_xlsx, name='exportar_pedidos'), 
+    path('reportes/exportar-csv/', exportar_pedidos_csv, name='exportar_pedidos_csv'),
     path('reportes/exportar-pdf/', exportar_pedidos_pdf, name='exportar_pedidos_pdf'), 
+    path('panel/reportes/generados/', views.reportes_trabajos, name='reportes_trabajos'),
+    path('panel/reportes/generados/<int:trabajo_id>/descargar/', views.descargar_reporte, name='descargar_reporte'),
+    path('panel/rendimiento/', views.panel_rendimiento, name='panel_rendimiento'),
 
 # rutas para login
 
@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .fechas import ZONA_NEGOCIO, inicio_del_dia
+from .models import Pedido, DetallePedido, VentaDiaria, VentaDiariaProducto
+
+
+def fecha_de_venta(pedido):
+    return timezone.localdate(pedido.creado_en, timezone=ZONA_NEGOCIO)
+
+
+def _sumar_dia(fecha, cambios):
+    VentaDiaria.objects.get_or_create(fecha=fecha)
+    VentaDiaria.objects.filter(fecha=fecha).update(**{campo: F(campo) + valor for campo, valor in cambios.items()})
+
+
+def _sumar_producto(fecha, producto_id, unidades, total):
+    VentaDiariaProducto.objects.get_or_create(fecha=fecha, producto_id=producto_id)
+    VentaDiariaProducto.objects.filter(fecha=fecha, producto_id=producto_id).update(
+        unidades=F('unidades') + unidades,
+        total=F('total') + total,
+    )
+
+
+def _aporte(estado, total):
+    cancelado = estado == 'cancelado'
+    return {
+        'total': total,
+        'pedidos': 1,
+        'total_cancelado': total if cancelado else 0,
+        'pedidos_cancelados': 1 if cancelado else 0,
+    }
+
+
+def ajustar_pedido(pedido, anterior, actual):
+    """
+    Aplica al día del pedido la diferencia entre lo que sumaba antes y lo que
+    suma ahora. `anterior` y `actual` son (estado, total), o None si el pedido
+    no existía / ya no existe. Lo llaman las señales de Pedido.
+    """
+    antes = _aporte(*anterior) if anterior else {}
+    despues = _aporte(*actual) if actual else {}
+    cambios = {
+        campo: despues.get(campo, 0) - antes.get(campo, 0)
+        for campo in despues.keys() | antes.keys()
+        if despues.get(campo, 0) != antes.get(campo, 0)
+    }
+    if cambios:
+        _sumar_dia(fecha_de_venta(pedido), cambios)
+
+
+def ajustar_detalle(pedido, anterior, actual):
+    """Igual que ajustar_pedido para una línea: (producto_id, cantidad, subtotal) o None"""
+    fecha = fecha_de_venta(pedido)
+    if anterior:
+        producto_id, cantidad, subtotal = anterior
+        _sumar_producto(fecha, producto_id, -cantidad, -subtotal)
+    if actual:
+        _sumar_producto(fecha, *actual)
+
+
+def registrar_pedido(pedido, items):
+    """
+    Suma un pedido nuevo al resumen: sus líneas por producto (las crea
+    bulk_create, que no dispara señales) y los totales del día (el checkout
+    guarda el pedido con `_resumen_al_final` para que la señal no los sume).
+    Debe llamarse al final de la transacción del pedido.
+    """
+    fecha = fecha_de_venta(pedido)
+    lineas = sorted(items, key=lambda item: item['producto'].id)
+
+    # Crea las filas que falten y luego incrementa cada una. Siempre en orden
+    # de producto y la fila del día al final: todos los checkouts bloquean en
+    # el mismo orden y la fila más disputada (una por día) se retiene solo
+    # hasta el commit
+    VentaDiariaProducto.objects.bulk_create(
+        [VentaDiariaProducto(fecha=fecha, producto=item['producto']) for item in lineas],
+        ignore_conflicts=True,
+    )
+    for item in lineas:
+        VentaDiariaProducto.objects.filter(fecha=fecha, producto=item['producto']).update(
+            unidades=F('unidades') + item['cantidad'],
+            total=F('total') + item['subtotal'],
+        )
+    ajustar_pedido(pedido, None, (pedido.estado, pedido.total))
+
+
+@transaction.atomic
+def recalcular_ventas(desde=None, hasta=None):
+    """
+    Reconstruye el resumen diario desde los pedidos para el rango [desde, hasta]
+    (fechas locales, ambos opcionales). Retorna el número de días recalculados.
+    """
+    pedidos = Pedido.objects.all()
+    detalles = DetallePedido.objects.all()
+    dias = VentaDiaria.objects.all()
+    productos = VentaDiariaProducto.objects.all()
+
+    if desde:
+        inicio = inicio_del_dia(desde)
+        pedidos = pedidos.filter(creado_en__gte=inicio)
+        detalles = detalles.filter(pedido__creado_en__gte=inicio)
+        dias = dias.filter(fecha__gte=desde)
+        productos = productos.filter(fecha__gte=desde)
+    if hasta:
+        fin = inicio_del_dia(hasta + timedelta(days=1))
+        pedidos = pedidos.filter(creado_en__lt=fin)
+        detalles = detalles.filter(pedido__creado_en__lt=fin)
+        dias = dias.filter(fecha__lte=hasta)
+        productos = productos.filter(fecha__lte=hasta)
+
+    dias.delete()
+    productos.delete()
+
+    cancelados = Q(estado='cancelado')
+    por_dia = (
+        pedidos
+        .annotate(dia=TruncDate('creado_en', tzinfo=ZONA_NEGOCIO))
+        .values('dia')
+        .annotate(
+            ventas=Sum('total'),
+            cantidad=Count('id'),
+            ventas_canceladas=Sum('total', filter=cancelados),
+            cantidad_cancelados=Count('id', filter=cancelados),
+        )
+        .order_by()
+    )
+    nuevos_dias = VentaDiaria.objects.bulk_create([
+        VentaDiaria(
+            fecha=fila['dia'],
+            total=fila['ventas'] or 0,
+            pedidos=fila['cantidad'],
+            total_cancelado=fila['ventas_canceladas'] or 0,
+            pedidos_cancelados=fila['cantidad_cancelados'],
+        )
+        for fila in por_dia
+    ])
+
+    por_producto = (
+        detalles
+        .annotate(dia=TruncDate('pedido__creado_en', tzinfo=ZONA_NEGOCIO))
+        .values('dia', 'producto_id')
+        .annotate(vendidas=Sum('cantidad'), ventas=Sum('subtotal'))
+        .order_by()
+    )
+    VentaDiariaProducto.objects.bulk_create(
+        [
+            VentaDiariaProducto(
+                fecha=fila['dia'],
+                producto_id=fila['producto_id'],
+                unidades=fila['vendidas'],
+                total=fila['ventas'],
+            )
+            for fila in por_producto
+        ],
+        batch_size=1000,
+    )
+
+    return len(nuevos_dias)
@@ -1,38 +1,26 @@
-from decimal import Decimal
 from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from .cart import Cart
-from .models import Producto, Pedido, DetallePedido
-from django.db.models import Sum, Count, Avg
+from django.template.loader import render_to_string
+from .cart import get_cart, faltante_envio as calcular_faltante_envio
+from .models import Categoria, Producto, Pedido, DetallePedido, VentaDiaria, VentaDiariaProducto, TrabajoReporte
+from .trabajos import encolar_reporte
+from .pedidos import crear_pedido, descontar_pedidos_vistos, StockInsuficiente
+from .inventario import establecer_stock, con_stock, disponible_en_carrito, precargar_disponible
+from .paginacion import codificar_cursor, decodificar_cursor, paginar
+from .cache_catalogo import etag_catalogo, fragmento, insertar_stock, modificado_catalogo
+from .fechas import ZONA_NEGOCIO, rango_fechas
+from . import exportaciones, pagos, perfilador
+from django.db.models import Sum, Count, Prefetch, Q
+from django.db import transaction
 from django.contrib.auth.decorators import user_passes_test
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
 from datetime import datetime
-import csv 
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import urlencode
 from django.contrib import messages
-import openpyxl
-from reportlab.platypus import SimpleDocTemplate, Table
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Table,
-    TableStyle,
-    Paragraph,
-    Spacer,
-    Image
-)
-from reportlab.lib import colors
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from django.conf import settings
-import os
-from datetime import datetime
 from django.utils import timezone
-from django.db.models import Sum
-from datetime import timedelta
+from datetime import date, timedelta
 import json
 
 
@@ -46,28 +34,102 @@ def es_admin(user):
 # -------------------------------
 # LISTA DE PRODUCTOS
 # -------------------------------
+CAMPOS_CATALOGO = ('categoria_id', 'created_at', 'id')
+
+
+@condition(etag_func=etag_catalogo, last_modified_func=modificado_catalogo)
 def lista_productos(request):
-    # Obtiene todos los productos de la base de datos
-    productos = Producto.objects.all()
-    # Renderiza la plantilla con la lista de productos
-    return render(request, 'catalogo/lista_productos.html', {'productos': productos})
+    categoria_id, ocultar_agotados, despues = filtros_catalogo(request)
+
+    def construir():
+        productos, siguiente = paginar(
+            consulta_catalogo(categoria_id, ocultar_agotados), CAMPOS_CATALOGO, despues, settings.CATALOGO_POR_PAGINA
+        )
+        return html_catalogo(
+            productos, siguiente, Categoria.objects.order_by('nombre'), categoria_id, ocultar_agotados, despues
+        )
+
+    if ocultar_agotados:
+        # Qué productos aparecen depende del stock en vivo: no se cachea
+        contenido = construir()
+    else:
+        # El listado se renderiza una vez por versión del catálogo
+        contenido = fragmento(clave_catalogo(categoria_id, despues), construir)
+
+    # Renderiza la plantilla con la lista de productos y el stock en vivo
+    return render(request, 'catalogo/lista_productos.html', {'contenido': insertar_stock(contenido)})
+
+
+# Partes del catálogo compartidas con la versión asíncrona (views_async.py)
+
+def filtros_catalogo(request):
+    # Filtros: categoría, ocultar agotados y cursor de la página anterior
+    categoria_id = request.GET.get('categoria', '')
+    categoria_id = int(categoria_id) if categoria_id.isdigit() else None
+    ocultar_agotados = request.GET.get('disponibles') == '1'
+    despues = decodificar_cursor(request.GET.get('despues', ''), (int, datetime, int))
+    return categoria_id, ocultar_agotados, despues
+
+
+def consulta_catalogo(categoria_id, ocultar_agotados):
+    productos = Producto.objects.filter(disponible=True)
+    if categoria_id:
+        productos = productos.filter(categoria_id=categoria_id)
+    if ocultar_agotados:
+        productos = productos.filter(con_stock())
+    return productos
+
+
+def clave_catalogo(categoria_id, despues):
+    cursor = codificar_cursor(despues) if despues else ''
+    return f'lista:{categoria_id or ""}:{cursor}'
+
+
+def html_catalogo(productos, siguiente, categorias, categoria_id, ocultar_agotados, despues):
+    filtros = {'categoria': categoria_id or '', 'disponibles': '1' if ocultar_agotados else ''}
+    return render_to_string('catalogo/fragmentos/lista_productos.html', {
+        'productos': productos,
+        'categorias': categorias,
+        'categoria_actual': categoria_id,
+        'ocultar_agotados': ocultar_agotados,
+        'es_continuacion': despues is not None,
+        'filtros_todas': _query({**filtros, 'categoria': ''}),
+        'filtros_agotados': _query({**filtros, 'disponibles': '' if ocultar_agotados else '1'}),
+        'filtros_inicio': _query(filtros),
+        'filtros_siguiente': _query({**filtros, 'despues': siguiente}) if siguiente else '',
+    })
+
+
+def _query(parametros):
+    return urlencode({clave: valor for clave, valor in parametros.items() if valor})
 
 
 # -------------------------------
 # DETALLE DE PRODUCTO
 # -------------------------------
+@condition(etag_func=etag_catalogo, last_modified_func=modificado_catalogo)
 def detalle_producto(request, producto_id):
-    # Busca un producto por ID, si no existe lanza 404
-    producto = get_object_or_404(Producto, id=producto_id)
-    # Renderiza la plantilla con el detalle del producto
-    return render(request, 'catalogo/detalle_producto.html', {'producto': producto})
+    def construir():
+        # Busca un producto por ID, si no existe lanza 404
+        producto = get_object_or_404(Producto, id=producto_id)
+        return {
+            'nombre': producto.nombre,
+            'html': render_to_string('catalogo/fragmentos/detalle_producto.html', {'producto': producto}),
+        }
+
+    detalle = fragmento(f'detalle:{producto_id}', construir)
+    # Renderiza la plantilla con el detalle del producto y el stock en vivo
+    return render(request, 'catalogo/detalle_producto.html', {
+        'nombre': detalle['nombre'],
+        'contenido': insertar_stock(detalle['html']),
+    })
 
 
 # -------------------------------
 # AGREGAR PRODUCTO AL CARRITO
 # -------------------------------
 def agregar_al_carrito(request, producto_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     producto = Producto.objects.get(id=producto_id)
     # Añade el producto con cantidad = 1
     cart.add(producto, cantidad=1)
@@ -78,11 +140,11 @@ def agregar_al_carrito(request, producto_id):
 # VER CARRITO
 # -------------------------------
 def ver_carrito(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     items, total = cart.get_items()
 
-    # Calcula cuánto falta para envío gratis (ejemplo: 60.000 COP)
-    faltante_envio = 60000 - total if total < 60000 else 0
+    # Calcula cuánto falta para envío gratis (ENVIO_GRATIS_DESDE en cart.py)
+    faltante_envio = calcular_faltante_envio(total)
 
     return render(request, 'catalogo/carrito.html', {
         'items': items,
@@ -95,16 +157,16 @@ def ver_carrito(request):
 # INCREMENTAR CANTIDAD DE UN PRODUCTO
 # -------------------------------
 def incrementar_cantidad(request, producto_id):
-    cart = Cart(request)
-    producto = Producto.objects.get(id=producto_id)
+    cart = get_cart(request)
+    producto = Producto.objects.select_related('inventario').get(id=producto_id)
 
     # Validar stock antes de incrementar
-    if hasattr(producto, 'inventario'):
-        if cart.get_quantity(producto) < producto.inventario.cantidad:
-            cart.add(producto, cantidad=1)
-        else:
-            # Mensaje de error si se intenta pasar del stock
-            request.session['error'] = f"Solo quedan {producto.inventario.cantidad} unidades de {producto.nombre}."
+    disponible = disponible_en_carrito(producto)
+    if cart.get_quantity(producto) < disponible:
+        cart.add(producto, cantidad=1)
+    else:
+        # Mensaje de error si se intenta pasar del stock
+        request.session['error'] = f"Solo quedan {disponible} unidades de {producto.nombre}."
     return redirect('ver_carrito')
 
 
@@ -113,7 +175,7 @@ def incrementar_cantidad(request, producto_id):
 # DECREMENTAR CANTIDAD DE UN PRODUCTO
 # -------------------------------
 def decrementar_cantidad(request, producto_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     producto = Producto.objects.get(id=producto_id)
     # Resta 1 unidad del producto
     cart.decrement(producto)
@@ -124,26 +186,79 @@ def decrementar_cantidad(request, producto_id):
 # ELIMINAR PRODUCTO DEL CARRITO
 # -------------------------------
 def eliminar_item(request, producto_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     producto = Producto.objects.get(id=producto_id)
     # Elimina completamente el producto del carrito
     cart.remove(producto)
     return redirect('ver_carrito')
 
 
+# -------------------------------
+# API JSON DEL CARRITO
+# -------------------------------
+# El carrito se actualiza en la página sin recargar: los clics se agrupan en
+# el navegador y se envían juntos; cada respuesta trae los totales nuevos.
+
+@require_GET
+def api_carrito(request):
+    return JsonResponse(get_cart(request).resumen())
+
+
+@require_POST
+def api_carrito_actualizar(request):
+    """
+    Recibe {"producto_id": cantidad, ...} con las cantidades finales (0 quita
+    el producto). Valida todo contra el inventario con una sola consulta y
+    aplica los cambios solo si todos son válidos.
+    """
+    try:
+        cambios = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': "El cuerpo no es JSON válido."}, status=400)
+    if not isinstance(cambios, dict) or not cambios:
+        return JsonResponse({'error': "Se esperaba un objeto {producto_id: cantidad}."}, status=400)
+
+    cantidades = {}
+    for producto_id, cantidad in cambios.items():
+        if not str(producto_id).isdigit() or type(cantidad) is not int or cantidad < 0:
+            return JsonResponse({'error': f"Cambio inválido: {producto_id}={cantidad!r}."}, status=400)
+        cantidades[int(producto_id)] = cantidad
+
+    productos = Producto.objects.select_related('inventario', 'categoria').in_bulk(cantidades)
+    faltantes = sorted(set(cantidades) - set(productos))
+    if faltantes:
+        return JsonResponse({'error': "Productos inexistentes.", 'productos': faltantes}, status=404)
+    precargar_disponible([p.inventario for p in productos.values() if hasattr(p, 'inventario')])
+
+    errores = {}
+    for producto_id, cantidad in cantidades.items():
+        producto = productos[producto_id]
+        # Las mismas reglas que incrementar_cantidad (sin inventario: 0)
+        disponible = disponible_en_carrito(producto)
+        if cantidad > disponible:
+            errores[producto_id] = f"Solo quedan {disponible} unidades de {producto.nombre}."
+    if errores:
+        return JsonResponse({'errores': errores}, status=409)
+
+    cart = get_cart(request)
+    cart.set_quantities({productos[producto_id]: cantidad for producto_id, cantidad in cantidades.items()})
+    # Los productos ya cargados se reutilizan; solo se consultan los demás del carrito
+    return JsonResponse(cart.resumen(productos))
+
+
 # -------------------------------
 # CHECKOUT (FINALIZAR PEDIDO)
 # -------------------------------
 def checkout(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     items, total = cart.get_items()
 
     # Si el carrito está vacío, redirige a la lista de productos
     if not items:
         return redirect('lista_productos')
 
-    # Calcular cuánto falta para envío gratis (ejemplo: 60.000 COP)
-    faltante_envio = 60000 - total if total < 60000 else 0
+    # Calcular cuánto falta para envío gratis (ENVIO_GRATIS_DESDE en cart.py)
+    faltante_envio = calcular_faltante_envio(total)
 
     if request.method == 'POST':
         # Captura datos del formulario
@@ -161,45 +276,26 @@ def checkout(request):
                 'error': "Todos los campos son obligatorios."
             })
 
-        # Crear el pedido
-        pedido = Pedido.objects.create(
-            nombre_cliente=nombre,
-            telefono=telefono,
-            direccion=direccion,
-            total=total,
-            metodo_pago=metodo_pago,
-            estado_pago="pendiente",
-            visto_por_admin=False,
-        )
-
-        # Crear detalles del pedido y actualizar inventario
-        for item in items:
-            producto = item['producto']
-            cantidad = item['cantidad']
-            subtotal = item['subtotal']
-
-            # Validar stock antes de restar
-            if hasattr(producto, 'inventario'):
-                if producto.inventario.cantidad >= cantidad:
-                    producto.inventario.cantidad -= cantidad
-                    producto.inventario.save()
-                else:
-                    # Si no hay stock suficiente, mostrar error y no crear pedido
-                    return render(request, 'catalogo/checkout.html', {
-                        'items': items,
-                        'total': total,
-                        'faltante_envio': faltante_envio,
-                        'error': f"No hay suficiente stock de {producto.nombre}. Disponible: {producto.inventario.cantidad}"
-                    })
-
-            # Crear detalle del pedido
-            DetallePedido.objects.create(
-                pedido=pedido,
-                producto=producto,
-                cantidad=cantidad,
-                precio_unitario=producto.precio,
-                subtotal=subtotal
+        # Crear el pedido validando y descontando el stock en una transacción
+        try:
+            pedido = crear_pedido(
+                items,
+                total,
+                nombre_cliente=nombre,
+                telefono=telefono,
+                direccion=direccion,
+                metodo_pago=metodo_pago,
+                estado_pago="pendiente",
+                visto_por_admin=False,
             )
+        except StockInsuficiente as error:
+            # Si no hay stock suficiente, mostrar error y no crear pedido
+            return render(request, 'catalogo/checkout.html', {
+                'items': items,
+                'total': total,
+                'faltante_envio': faltante_envio,
+                'error': str(error)
+            })
 
         # Vaciar carrito
         cart.clear()
@@ -230,24 +326,34 @@ def reportes(request):
     fecha_inicio = request.GET.get("fecha_inicio")
     fecha_fin = request.GET.get("fecha_fin")
 
-    # Base de datos de pedidos 
-    pedidos = Pedido.objects.all().order_by('-creado_en') 
-    
-    # Aplicar filtros si existen 
-    if fecha_inicio and fecha_fin: 
-        pedidos = pedidos.filter(creado_en__date__range=[fecha_inicio, fecha_fin]) 
-        
+    # Resumen diario de ventas: el costo depende de los días, no de los pedidos
+    dias = VentaDiaria.objects.all()
+    productos_vendidos = VentaDiariaProducto.objects.all()
+
+    # Aplicar filtros si existen; una fecha mal escrita en la URL se informa
+    # en el formulario en vez de llegar a la consulta (ValidationError → 500)
+    error_fechas = None
+    if fecha_inicio and fecha_fin:
+        try:
+            rango = [date.fromisoformat(fecha_inicio), date.fromisoformat(fecha_fin)]
+        except ValueError:
+            error_fechas = "Las fechas deben tener el formato AAAA-MM-DD."
+        else:
+            dias = dias.filter(fecha__range=rango)
+            productos_vendidos = productos_vendidos.filter(fecha__range=rango)
+
     # Cálculos principales 
-    total_ventas = pedidos.aggregate(total=Sum('total'))['total'] or 0 
-    total_pedidos = pedidos.count() 
-    promedio_pedido = pedidos.aggregate(promedio=Avg('total'))['promedio'] or 0 
+    resumen = dias.aggregate(ventas=Sum('total'), pedidos=Sum('pedidos'), cancelados=Sum('pedidos_cancelados'))
+    total_ventas = resumen['ventas'] or 0 
+    total_pedidos = resumen['pedidos'] or 0 
+    promedio_pedido = total_ventas / total_pedidos if total_pedidos else 0 
     promedio_pedido = round(promedio_pedido, 2) 
     
     # Top 5 productos más vendidos 
     productos_mas_vendidos = ( 
-        DetallePedido.objects.filter(pedido__in=pedidos) 
+        productos_vendidos
         .values('producto__nombre') 
-        .annotate(total_vendido=Sum('cantidad')) 
+        .annotate(total_vendido=Sum('unidades')) 
         .order_by('-total_vendido')[:5] 
         ) 
     
@@ -255,175 +361,87 @@ def reportes(request):
         'total_ventas': total_ventas, 
         'total_pedidos': total_pedidos, 
         'promedio_pedido': promedio_pedido, 
+        'pedidos_cancelados': resumen['cancelados'] or 0,
         'productos_mas_vendidos': productos_mas_vendidos, 
         'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 
+        'error_fechas': error_fechas,
         } 
     
     
     return render(request, 'catalogo/admin_reportes.html', contexto)
 
+def _pedidos_a_exportar(request):
+    """Pedidos del rango de fechas pedido, o None si falta alguna fecha"""
+    try:
+        inicio, fin = rango_fechas(request.GET.get("fecha_inicio"), request.GET.get("fecha_fin"))
+    except ValueError:
+        return None
+
+    return Pedido.objects.filter(creado_en__gte=inicio, creado_en__lt=fin).order_by('-creado_en')
+
+
 @user_passes_test(es_admin)
 def exportar_pedidos_csv(request):
-
-    fecha_inicio = request.GET.get("fecha_inicio")
-    fecha_fin = request.GET.get("fecha_fin")
+    pedidos = _pedidos_a_exportar(request)
 
     # Validación obligatoria
-    if not fecha_inicio or not fecha_fin:
+    if pedidos is None:
         return HttpResponse("Debe seleccionar un rango de fechas antes de exportar.")
 
-    pedidos = Pedido.objects.all().order_by('-creado_en')
-
-    if fecha_inicio and fecha_fin:
-        pedidos = pedidos.filter(creado_en__date__range=[fecha_inicio, fecha_fin])
-    
-    total = pedidos.aggregate(total=Sum("total"))["total"] or 0
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte de Pedidos"
-
-    headers = ["ID", "Cliente", "Fecha", "Total", "Estado"]
-    ws.append(headers)
-
-    for pedido in pedidos:
-        ws.append([
-            pedido.id,
-            pedido.nombre_cliente,
-            str(pedido.creado_en),
-            float(pedido.total),
-            pedido.estado
-        ])
+    # ?detalle=1 exporta las líneas de los pedidos en vez de los pedidos
+    if request.GET.get("detalle") == "1":
+        filas, nombre = exportaciones.csv_detalles(pedidos), "Reporte_detalle_pedidos.csv"
+    else:
+        filas, nombre = exportaciones.csv_pedidos(pedidos), "Reporte_pedidos.csv"
 
-    ws.append(["", "", "", "TOTAL:", float(total)])
+    response = StreamingHttpResponse(filas, content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+    return response
 
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = 'attachment; filename="Reporte_pedidos.xlsx"'
 
-    wb.save(response)
-    return response
 
+@user_passes_test(es_admin)
+def exportar_pedidos_xlsx(request):
+    return _encolar_exportacion(request, 'xlsx')
 
 
 @user_passes_test(es_admin)
 def exportar_pedidos_pdf(request):
+    return _encolar_exportacion(request, 'pdf')
 
-    fecha_inicio = request.GET.get("fecha_inicio")
-    fecha_fin = request.GET.get("fecha_fin")
 
-    # Validación obligatoria
-    if not fecha_inicio or not fecha_fin:
+def _encolar_exportacion(request, tipo):
+    # Los reportes pesados se generan en segundo plano (manage.py procesar_reportes)
+    try:
+        fecha_inicio = date.fromisoformat(request.GET.get("fecha_inicio", ""))
+        fecha_fin = date.fromisoformat(request.GET.get("fecha_fin", ""))
+    except ValueError:
+        # Validación obligatoria
         return HttpResponse("Debe seleccionar un rango de fechas antes de exportar.")
 
-    pedidos = Pedido.objects.all().order_by('-creado_en')
-
-    if fecha_inicio and fecha_fin:
-        pedidos = pedidos.filter(creado_en__date__range=[fecha_inicio, fecha_fin])
-    
-    total = pedidos.aggregate(total=Sum("total"))["total"] or 0
-    
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = 'attachment; filename="Reporte_pedidos.pdf"'
-
-    doc = SimpleDocTemplate(response, pagesize=letter)
-
-    elements = []
-
-    styles = getSampleStyleSheet()
-
-    # =====================
-    # LOGO
-    # =====================
-    logo_path = os.path.join(settings.BASE_DIR, "catalogo/static/cliente/img/logo.png")
-    if os.path.exists(logo_path):
-        logo = Image(logo_path, width=1*inch, height=0.5*inch)
-        logo.hAlign = 'LEFT'
-        elements.append(logo)
-
-    elements.append(Spacer(1, 12))
-
-    # =====================
-    # DATOS NEGOCIO
-    # =====================
-    negocio = Paragraph(
-        "<b>Sr. Cheesecake, inc.</b><br/>"
-        "Dirección: Calle 71 SUR 45A - 43, Sabaneta Antioquia <br/>"
-        "Teléfono: 3222336338 <br/>"
-        "Email: contacto@srcheesecake.com",
-        styles["Normal"]
-    )
-    elements.append(negocio)
-
-    elements.append(Spacer(1, 20))
-
-    # =====================
-    # TÍTULO REPORTE
-    # =====================
-    titulo = Paragraph(
-        "<b>REPORTE DE PEDIDOS</b>",
-        styles["Heading1"]
-    )
-    elements.append(titulo)
-
-    elements.append(Spacer(1, 12))
+    trabajo = encolar_reporte(tipo, fecha_inicio, fecha_fin)
+    if trabajo.estado == 'listo':
+        messages.success(request, "El reporte ya estaba generado y está listo para descargar.")
+    else:
+        messages.info(request, "El reporte se está generando. Esta página se actualiza sola.")
+    return redirect('reportes_trabajos')
 
-    fecha_generacion = datetime.now().strftime("%d/%m/%Y %H:%M")
 
-    rango = Paragraph(
-        f"Fecha de generación: {fecha_generacion}",
-        styles["Normal"]
-    )
-    elements.append(rango)
-
-    elements.append(Spacer(1, 20))
-
-    # =====================
-    # TABLA DATOS
-    # =====================
-    data = [["ID", "Cliente", "Fecha", "Estado", "Total"]]
-
-    for pedido in pedidos:
-        data.append([
-            str(pedido.id),
-            pedido.nombre_cliente,
-            pedido.creado_en.strftime("%d/%m/%Y"),
-            pedido.estado,
-            f"${pedido.total}"
-        ])
-
-    data.append(["", "", "", "TOTAL GENERAL:", f"${total}"])
-
-    table = Table(data, repeatRows=1)
-
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.grey),
-        ("TEXTCOLOR", (0,0), (-1,0), colors.white),
-        ("ALIGN", (4,1), (4,-1), "RIGHT"),
-        ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-        ("FONTNAME", (0,0), (-1,-1), "Helvetica"),
-        ("FONTSIZE", (0,0), (-1,-1), 9),
-        ("BOTTOMPADDING", (0,0), (-1,0), 10),
-        ("BACKGROUND", (0,-1), (-1,-1), colors.lightgrey),
-    ]))
-
-    elements.append(table)
-
-    elements.append(Spacer(1, 30))
-
-    # =====================
-    # PIE DE PÁGINA
-    # =====================
-    footer = Paragraph(
-        "Documento generado automáticamente por el sistema administrativo. Sr. Cheesecake, inc. © 2026 Todos los derechos reservados.",
-        styles["Italic"]
-    )
+@user_passes_test(es_admin)
+def reportes_trabajos(request):
+    trabajos = TrabajoReporte.objects.order_by('-actualizado_en')[:50]
+    en_curso = any(trabajo.estado in ('pendiente', 'procesando') for trabajo in trabajos)
+    return render(request, 'catalogo/admin_reportes_trabajos.html', {
+        'trabajos': trabajos,
+        'en_curso': en_curso,
+    })
 
-    elements.append(footer)
 
-    doc.build(elements)
-    return response
+@user_passes_test(es_admin)
+def descargar_reporte(request, trabajo_id):
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, estado='listo')
+    nombre = f"Reporte_pedidos_{trabajo.fecha_inicio}_{trabajo.fecha_fin}.{trabajo.tipo}"
+    return FileResponse(trabajo.archivo.open('rb'), as_attachment=True, filename=nombre)
 
 # -------------------------------
  #PAGOS (WOMPI)
@@ -445,29 +463,38 @@ def redirigir_a_wompi(pedido):
     return redirect(wompi_url)
 
 def wompi_confirmacion(request):
-    reference = request.GET.get("reference")
-    status = request.GET.get("status")
+    # Redirección del navegador al terminar el pago. El `status` de la URL no
+    # es confiable: el estado de pago lo fija el evento firmado (wompi_eventos)
+    reference = request.GET.get("reference", "")
+    pedido_id = reference.removeprefix("PEDIDO")
 
-    if not reference:
+    if not pedido_id.isdigit():
         # Mostrar un error
         return redirect('lista_productos')
 
-    pedido_id = reference.replace("PEDIDO", "")
-    pedido = get_object_or_404(Pedido, id=pedido_id)
-
-    if status == "APPROVED":
-        pedido.estado_pago = "pagado"
-    elif status == "DECLINED":
-        pedido.estado_pago = "rechazado"
-    else:
-        pedido.estado_pago = "pendiente"
+    return redirect('confirmacion_pedido', pedido_id=int(pedido_id))
 
-    pedido.save()
 
-    return redirect('confirmacion_pedido', pedido_id=pedido.id)
+@csrf_exempt
+@require_POST
+def wompi_eventos(request):
+    # Notificación servidor a servidor de Wompi (ver catalogo/pagos.py).
+    # Cualquier respuesta distinta de 200 hace que Wompi reintente.
+    try:
+        evento = json.loads(request.body)
+        resultado = pagos.procesar_evento(evento)
+    except (ValueError, pagos.EventoInvalido) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({'resultado': resultado})
 
 def confirmacion_pedido(request, pedido_id):
-    pedido = get_object_or_404(Pedido, id=pedido_id)
+    # Los detalles y sus productos se traen en una sola consulta adicional
+    pedido = get_object_or_404(
+        Pedido.objects.prefetch_related(
+            Prefetch('detalles', queryset=DetallePedido.objects.select_related('producto'))
+        ),
+        id=pedido_id,
+    )
     return render(request, 'catalogo/confirmacion_pedido.html', {'pedido': pedido})
 
 
@@ -477,46 +504,49 @@ def confirmacion_pedido(request, pedido_id):
 
 @user_passes_test(es_admin)
 def panel_inicio(request):
-    hoy = timezone.now().date()
-    # Total de ventas
-    total_ventas = Pedido.objects.aggregate(total=Sum('total'))['total'] or 0
-    # Número de pedidos
-    total_pedidos = Pedido.objects.count()
+    hoy = timezone.localdate(timezone=ZONA_NEGOCIO)
+    # Total de ventas y número de pedidos desde el resumen diario
+    resumen = VentaDiaria.objects.aggregate(ventas=Sum('total'), pedidos=Sum('pedidos'))
+    total_ventas = resumen['ventas'] or 0
+    total_pedidos = resumen['pedidos'] or 0
     # Promedio de pedido
-    promedio_pedido = Pedido.objects.aggregate(promedio=Avg('total'))['promedio'] or 0
+    promedio_pedido = total_ventas / total_pedidos if total_pedidos else 0
 
     # Top 5 productos más vendidos
     productos_mas_vendidos = (
-        DetallePedido.objects
+        VentaDiariaProducto.objects
         .values('producto__nombre')
-        .annotate(total_vendido=Sum('cantidad'))
+        .annotate(total_vendido=Sum('unidades'))
         .order_by('-total_vendido')[:5]
     )
-    # Últimos 7 días
-    labels_7, ventas_7 = [], []
-    for i in range(7):
-        dia = hoy - timedelta(days=6-i)
-        total = Pedido.objects.filter(creado_en__date=dia).aggregate(Sum('total'))['total__sum'] or 0
-        labels_7.append(dia.strftime("%d/%m"))
-        ventas_7.append(float(total)) 
-
-    # Último mes (por semana)
-    labels_30, ventas_30 = [], []
-    for i in range(4):
-        inicio = hoy - timedelta(days=(3-i)*7)
-        fin = hoy - timedelta(days=(4-i)*7)
-        total = Pedido.objects.filter(creado_en__date__range=[fin, inicio]).aggregate(Sum('total'))['total__sum'] or 0
-        labels_30.append(f"Semana {i+1}")
-        ventas_30.append(float(total))
-
-    # Últimos 6 meses (por mes)
-    labels_6m, ventas_6m = [], []
+
+    # Periodos de las gráficas: 7 días, 4 semanas (de lunes a domingo) y 6 meses
+    dias = [hoy - timedelta(days=6 - i) for i in range(7)]
+    lunes = hoy - timedelta(days=hoy.weekday())
+    semanas = [lunes - timedelta(weeks=3 - i) for i in range(4)]
+    meses = []
     for i in range(6):
         mes = (hoy.month - i - 1) % 12 + 1
         año = hoy.year if hoy.month - i > 0 else hoy.year - 1
-        total = Pedido.objects.filter(creado_en__year=año, creado_en__month=mes).aggregate(Sum('total'))['total__sum'] or 0
-        labels_6m.insert(0, f"{mes}/{año}")
-        ventas_6m.insert(0, float(total))
+        meses.insert(0, date(año, mes, 1))
+
+    # Una sola consulta al resumen diario cubre las tres gráficas;
+    # los periodos sin ventas quedan en 0
+    por_dia, por_semana, por_mes = {}, {}, {}
+    for fecha, total in VentaDiaria.objects.filter(fecha__gte=min(meses[0], semanas[0])).values_list('fecha', 'total'):
+        por_dia[fecha] = total
+        semana = fecha - timedelta(days=fecha.weekday())
+        por_semana[semana] = por_semana.get(semana, 0) + total
+        por_mes[fecha.replace(day=1)] = por_mes.get(fecha.replace(day=1), 0) + total
+
+    labels_7 = [dia.strftime("%d/%m") for dia in dias]
+    ventas_7 = [float(por_dia.get(dia, 0)) for dia in dias]
+
+    labels_30 = [f"Semana {i+1}" for i in range(4)]
+    ventas_30 = [float(por_semana.get(semana, 0)) for semana in semanas]
+
+    labels_6m = [f"{mes.month}/{mes.year}" for mes in meses]
+    ventas_6m = [float(por_mes.get(mes, 0)) for mes in meses]
 
     context = {
         'total_ventas': total_ventas,
@@ -534,43 +564,87 @@ def panel_inicio(request):
 
 
     
+# Orden del listado de pedidos (más recientes primero), usado por el cursor
+CAMPOS_PEDIDOS = ('creado_en', 'id')
+
+
 @user_passes_test(es_admin)
 def admin_pedidos(request):
-    # Marcar todos los pedidos como vistos 
-    Pedido.objects.filter(visto_por_admin=False).update(visto_por_admin=True)
     fecha_inicio = request.GET.get("fecha_inicio")
     fecha_fin = request.GET.get("fecha_fin")
-    estado_pago = request.GET.get("estado_pago")
-    estado = request.GET.get("estado")
-    pedidos = Pedido.objects.order_by('-creado_en')
-    
+    estado_pago = request.GET.get("estado_pago", "")
+    estado = request.GET.get("estado", "")
+    despues = decodificar_cursor(request.GET.get("despues", ""), (datetime, int))
+    pedidos = Pedido.objects.all()
+
 
     # FILTROS
     if fecha_inicio and fecha_fin:
-        pedidos = pedidos.filter(creado_en__date__range=[fecha_inicio, fecha_fin])
-    
-    
-    if estado_pago:
-        pedidos = pedidos.filter(estado_pago=estado_pago)
+        try:
+            inicio, fin = rango_fechas(fecha_inicio, fecha_fin)
+            pedidos = pedidos.filter(creado_en__gte=inicio, creado_en__lt=fin)
+        except ValueError:
+            pass
+
+    # Conteos para los filtros rápidos, en una sola consulta: cada grupo
+    # respeta el filtro del otro (p. ej. estados de los pedidos ya pagados)
+    filtro_estado = Q(estado=estado) if estado else Q()
+    filtro_pago = Q(estado_pago=estado_pago) if estado_pago else Q()
+    conteos = pedidos.aggregate(
+        estado_todos=Count('id', filter=filtro_pago),
+        pago_todos=Count('id', filter=filtro_estado),
+        **{f'estado_{valor}': Count('id', filter=Q(estado=valor) & filtro_pago) for valor, _ in Pedido.ESTADOS},
+        **{f'pago_{valor}': Count('id', filter=Q(estado_pago=valor) & filtro_estado) for valor, _ in Pedido.ESTADOS_PAGO},
+    )
+
+    pedidos = pedidos.filter(filtro_estado & filtro_pago)
+    pedidos, siguiente = paginar(
+        pedidos, CAMPOS_PEDIDOS, despues, settings.PANEL_PEDIDOS_POR_PAGINA, descendente=True
+    )
 
-    if estado:
-        pedidos = pedidos.filter(estado=estado)
+    # Solo se marcan como vistos los pedidos que el admin tiene en pantalla
+    no_vistos = [pedido.id for pedido in pedidos if not pedido.visto_por_admin]
+    if no_vistos:
+        marcados = Pedido.objects.filter(id__in=no_vistos, visto_por_admin=False).update(visto_por_admin=True)
+        descontar_pedidos_vistos(marcados)
+
+    filtros = {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 'estado': estado, 'estado_pago': estado_pago}
+
+    def facetas(campo, opciones, prefijo):
+        return [
+            {
+                'nombre': nombre,
+                'cantidad': conteos[f'{prefijo}_{valor or "todos"}'],
+                'activo': filtros[campo] == valor,
+                'query': _query({**filtros, campo: valor}),
+            }
+            for valor, nombre in [('', 'Todos'), *opciones]
+        ]
 
     return render(request, 'catalogo/admin_pedidos.html', {
         'pedidos': pedidos,
         'estado_pago': estado_pago,
         'estado': estado,
         'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin, })
+        'fecha_fin': fecha_fin,
+        'facetas_estado': facetas('estado', Pedido.ESTADOS, 'estado'),
+        'facetas_pago': facetas('estado_pago', Pedido.ESTADOS_PAGO, 'pago'),
+        'es_continuacion': despues is not None,
+        'filtros_inicio': _query(filtros),
+        'filtros_siguiente': _query({**filtros, 'despues': siguiente}) if siguiente else '',
+    })
 
 @user_passes_test(es_admin)
 def admin_detalle_pedido(request, pedido_id):
     pedido = get_object_or_404(Pedido, id=pedido_id)
-    detalles = pedido.detalles.all()
+    detalles = pedido.detalles.select_related('producto')
 
     if request.method == "POST":
-        pedido.estado = request.POST.get("estado")
-        pedido.save()
+        with transaction.atomic():
+            pedido = Pedido.objects.select_for_update().get(id=pedido.id)
+            pedido.estado = request.POST.get("estado")
+            # Los cancelados del resumen diario se ajustan en la misma transacción (signals.py)
+            pedido.save()
         messages.success(request, f"El estado del pedido #{pedido.id} fue actualizado correctamente a {pedido.estado} ")
         return redirect('admin_pedidos')
     
@@ -581,19 +655,20 @@ def admin_detalle_pedido(request, pedido_id):
 
 @user_passes_test(es_admin)
 def admin_inventario(request):
-    productos = Producto.objects.all()
+    productos = list(Producto.objects.select_related('inventario'))
+    precargar_disponible(producto.inventario for producto in productos if hasattr(producto, 'inventario'))
     return render(request, 'catalogo/admin_inventario.html', {'productos': productos})
 
 @user_passes_test(es_admin)
 def editar_inventario(request, producto_id):
-    producto = get_object_or_404(Producto, id=producto_id)
+    producto = get_object_or_404(Producto.objects.select_related('inventario'), id=producto_id)
 
     if request.method == "POST":
         nueva_cantidad = request.POST.get("cantidad")
 
         if nueva_cantidad.isdigit():
-            producto.inventario.cantidad = int(nueva_cantidad)
-            producto.inventario.save()
+            # Con stock fragmentado la cantidad se reparte entre los fragmentos
+            establecer_stock(producto.inventario, int(nueva_cantidad))
             messages.success(request, f"La cantidad del producto {producto.nombre} fue actualizada correctamente a {nueva_cantidad} unidades.")
         return redirect('admin_inventario') 
     
@@ -602,3 +677,19 @@ def editar_inventario(request, producto_id):
     })
 
 
+
+
+# -------------------------------
+# PANEL ADMINISTRATIVO - RENDIMIENTO
+# -------------------------------
+@user_passes_test(es_admin)
+def panel_rendimiento(request):
+    # Muestras del perfilador de este worker (cada proceso tiene las suyas)
+    if request.method == "POST":
+        perfilador.limpiar()
+        return redirect('panel_rendimiento')
+
+    return render(request, 'catalogo/admin_rendimiento.html', {
+        'vistas': perfilador.resumen(),
+        'muestreo': settings.PERFILADOR_MUESTREO * 100,
+    })
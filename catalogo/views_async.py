@@ -0,0 +1,118 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.shortcuts import aget_object_or_404, render
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache_catalogo import afragmento, ainsertar_stock, aetag_catalogo, amodificado_catalogo
+from .cart import get_cart, faltante_envio as calcular_faltante_envio
+from .models import Categoria, Producto, Pedido, DetallePedido
+from .paginacion import apaginar
+from .views import CAMPOS_CATALOGO, clave_catalogo, consulta_catalogo, filtros_catalogo, html_catalogo
+
+# Vistas de lectura de la tienda en versión asíncrona, para servir con ASGI
+# (src/asgi.py las activa con VISTAS_ASYNC). Mientras una consulta espera a
+# la BD el worker atiende otras peticiones. Todo lo que toca la BD (usuario,
+# sesión, carrito, productos) se carga antes de renderizar: las plantillas y
+# los context processors no deben consultar nada en un contexto async.
+
+
+async def preparar(request):
+    """Carga el usuario y el carrito de la petición sin bloquear"""
+    request.user = await request.auser()
+    await get_cart(request).acargar()
+
+
+def condicion_async(vista):
+    """@condition con ETag y Last-Modified calculados de forma asíncrona"""
+
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        await preparar(request)
+        etag = await aetag_catalogo(request, *args, **kwargs)
+        if etag is None:
+            # Sin cache compartida o producto inexistente: sin GET condicional
+            return await vista(request, *args, **kwargs)
+        etag = quote_etag(etag)
+        modificado = int((await amodificado_catalogo(request, *args, **kwargs)).timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if response is None:
+            response = await vista(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            response.headers.setdefault('Last-Modified', http_date(modificado))
+            response.headers.setdefault('ETag', etag)
+        return response
+
+    return envoltura
+
+
+# -------------------------------
+# LISTA DE PRODUCTOS
+# -------------------------------
+@condicion_async
+async def lista_productos(request):
+    categoria_id, ocultar_agotados, despues = filtros_catalogo(request)
+
+    async def construir():
+        productos, siguiente = await apaginar(
+            consulta_catalogo(categoria_id, ocultar_agotados), CAMPOS_CATALOGO, despues, settings.CATALOGO_POR_PAGINA
+        )
+        categorias = [categoria async for categoria in Categoria.objects.order_by('nombre')]
+        return html_catalogo(productos, siguiente, categorias, categoria_id, ocultar_agotados, despues)
+
+    if ocultar_agotados:
+        contenido = await construir()
+    else:
+        contenido = await afragmento(clave_catalogo(categoria_id, despues), construir)
+
+    return render(request, 'catalogo/lista_productos.html', {'contenido': await ainsertar_stock(contenido)})
+
+
+# -------------------------------
+# DETALLE DE PRODUCTO
+# -------------------------------
+@condicion_async
+async def detalle_producto(request, producto_id):
+    async def construir():
+        producto = await aget_object_or_404(Producto, id=producto_id)
+        return {
+            'nombre': producto.nombre,
+            'html': render_to_string('catalogo/fragmentos/detalle_producto.html', {'producto': producto}),
+        }
+
+    detalle = await afragmento(f'detalle:{producto_id}', construir)
+    return render(request, 'catalogo/detalle_producto.html', {
+        'nombre': detalle['nombre'],
+        'contenido': await ainsertar_stock(detalle['html']),
+    })
+
+
+# -------------------------------
+# VER CARRITO
+# -------------------------------
+async def ver_carrito(request):
+    await preparar(request)
+    items, total = await get_cart(request).aget_items()
+
+    return render(request, 'catalogo/carrito.html', {
+        'items': items,
+        'total': total,
+        'faltante_envio': calcular_faltante_envio(total),
+    })
+
+
+# -------------------------------
+# CONFIRMACIÓN DEL PEDIDO
+# -------------------------------
+async def confirmacion_pedido(request, pedido_id):
+    await preparar(request)
+    pedido = await aget_object_or_404(
+        Pedido.objects.prefetch_related(
+            Prefetch('detalles', queryset=DetallePedido.objects.select_related('producto'))
+        ),
+        id=pedido_id,
+    )
+    return render(request, 'catalogo/confirmacion_pedido.html', {'pedido': pedido})
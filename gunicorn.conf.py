@@ -0,0 +1,27 @@
+# Configuración de gunicorn (se lee sola al correr `gunicorn src.wsgi` desde
+# esta carpeta). La aplicación se carga una vez en el proceso maestro y los
+# workers nacen con el código, el URLconf y las plantillas ya compiladas
+# (TEMPLATES no define 'loaders', así que Django usa el cargador en caché
+# con cualquier valor de DEBUG).
+import os
+
+wsgi_app = "src.wsgi:application"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = 30
+
+# Importar Django y la app antes del fork: el arranque de cada worker es
+# casi inmediato y la memoria se comparte (copy-on-write)
+preload_app = True
+# Reinicia cada worker de vez en cuando para acotar fugas de memoria
+max_requests = 1000
+max_requests_jitter = 100
+
+
+def when_ready(server):
+    # Con preload_app la aplicación ya está importada en el maestro
+    from catalogo.arranque import calentar
+
+    calentar()
+    server.log.info("URLconf y plantillas cargados antes de crear los workers")
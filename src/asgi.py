@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.settings')
+# Con un servidor ASGI (p. ej. `uvicorn src.asgi:application`) la tienda
+# usa las vistas de catalogo/views_async.py
+os.environ.setdefault('VISTAS_ASYNC', 'True')
 
 application = get_asgi_application()
@@ -56,7 +56,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'catalogo.middleware.PerfiladorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'catalogo.middleware.CarritoMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -69,7 +71,8 @@ ROOT_URLCONF = 'src.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS':[],
+        # La carpeta de plantillas de la app es 'Templates' (con mayúscula)
+        'DIRS': [BASE_DIR / 'catalogo' / 'Templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -113,6 +116,51 @@ else:
 
 
 
+# Cache
+# Por defecto en memoria del proceso; con CACHE_DIR se usa un cache en disco
+# compartido por todos los workers de la máquina. Lo que debe verse igual en
+# todos los workers (contador de pedidos no vistos, ETag del catálogo) solo
+# se guarda en cache si es compartido (cache_catalogo.cache_compartida).
+
+if os.environ.get("CACHE_DIR"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ["CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Segundos que vive un fragmento del catálogo (además de la invalidación por versión)
+CATALOGO_CACHE_TIMEOUT = 300
+
+# Productos por página en el catálogo público
+CATALOGO_POR_PAGINA = 24
+
+# Pedidos por página en el panel administrativo
+PANEL_PEDIDOS_POR_PAGINA = 50
+
+# Fracción de peticiones que mide el perfilador (0 = desactivado, 0.05 = 5 %)
+# y muestras que guarda cada worker en memoria; ver /panel/rendimiento/
+PERFILADOR_MUESTREO = float(os.environ.get("PERFILADOR_MUESTREO", "0"))
+PERFILADOR_CAPACIDAD = 1000
+PERFILADOR_CONSULTAS_LENTAS = 3
+
+# Dónde se guarda el carrito: "sesion" (tabla django_session) o "cookie"
+# (cookie firmada con producto:cantidad, sin escrituras en la BD)
+CARRITO_ALMACENAMIENTO = os.environ.get("CARRITO_ALMACENAMIENTO", "sesion")
+
+# Vistas asíncronas para las páginas de lectura de la tienda (catálogo,
+# detalle, carrito, confirmación). src/asgi.py lo activa; con WSGI conviene
+# dejarlo apagado, porque cada vista async correría en su propio event loop
+VISTAS_ASYNC = os.environ.get("VISTAS_ASYNC", "") == "True"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -163,8 +211,25 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic escribe nombres con hash (manifiesto) y versiones .gz/.br;
+# catalogo.estaticos.servir_estatico las entrega con caché de un año
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'catalogo.estaticos.EstaticosComprimidos',
+    },
+}
+
 WOMPI_PUBLIC_KEY = "pub_test_xxxxxxxx"
 WOMPI_CHECKOUT_URL = "https://checkout.wompi.co/l/abc123"
+# Secreto de eventos (panel de Wompi → Desarrolladores); firma las
+# notificaciones que llegan a /pago/wompi/eventos/
+WOMPI_EVENTS_SECRET = os.environ.get("WOMPI_EVENTS_SECRET", "test_events_xxxxxxxx")
+# API de transacciones, usada por `manage.py conciliar_pagos`
+WOMPI_API_URL = os.environ.get("WOMPI_API_URL", "https://sandbox.wompi.co/v1")
+WOMPI_PRIVATE_KEY = os.environ.get("WOMPI_PRIVATE_KEY", "prv_test_xxxxxxxx")
 
 LOGIN_URL = 'admin_login'
 LOGIN_REDIRECT_URL = 'panel_inicio'
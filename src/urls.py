@@ -16,12 +16,16 @@ Including another URLconf
 
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from catalogo.estaticos import servir_estatico
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # En desarrollo runserver sirve los estáticos antes de llegar aquí
+    re_path(r'^%s(?P<ruta>.+)$' % settings.STATIC_URL.lstrip('/'), servir_estatico),
     path('', include('catalogo.urls')),
 ]
 